@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import List, Tuple
+from app.database import get_db
+from app.models.lecture import Lecture
+from app.schemas.ask import AskRequest, AskResponse, AskSource
+from app.services.question_answering import qa_service
+
+router = APIRouter()
+
+
+async def load_lectures(request: AskRequest, db: AsyncSession) -> List[Tuple[str, str, str]]:
+    """(id, title, transcript) of the lectures in scope that have a transcript."""
+    if request.scope == "lecture":
+        query = select(Lecture.id, Lecture.title, Lecture.transcript).where(Lecture.id == request.id)
+    else:
+        query = (
+            select(Lecture.id, Lecture.title, Lecture.transcript)
+            .where(Lecture.folder_id == request.id)
+            .order_by(Lecture.created_at)
+        )
+    rows = (await db.execute(query)).all()
+
+    if not rows:
+        raise HTTPException(
+            status_code=404,
+            detail="Lecture not found" if request.scope == "lecture" else "No lectures found in folder"
+        )
+
+    lectures = [tuple(row) for row in rows if row.transcript]
+    if not lectures:
+        raise HTTPException(status_code=400, detail="No transcripts available")
+
+    return lectures
+
+
+@router.post("/ask", response_model=AskResponse)
+async def ask_question(
+    request: AskRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Answer a question about a lecture or folder. Only the transcript
+    passages most similar to the question are sent to the model.
+    """
+    lectures = await load_lectures(request, db)
+    titles = {lecture_id: title for lecture_id, title, _ in lectures}
+
+    try:
+        answer, passages = await qa_service.answer(
+            db,
+            question=request.question,
+            scope_key=f"{request.scope}:{request.id}",
+            lectures=lectures,
+            top_k=request.top_k
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Question answering failed: {str(e)}")
+
+    return AskResponse(
+        answer=answer,
+        sources=[
+            AskSource(lecture_id=p.lecture_id, title=titles[p.lecture_id], text=p.text, score=p.score)
+            for p in passages
+        ]
+    )
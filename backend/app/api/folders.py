@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update
 from typing import List
 from app.database import get_db
 from app.models.folder import Folder
@@ -13,27 +13,23 @@ router = APIRouter()
 @router.get("/folders", response_model=List[FolderResponse])
 async def get_folders(db: AsyncSession = Depends(get_db)):
     """Get all folders with lecture counts."""
-    result = await db.execute(select(Folder).order_by(Folder.created_at.desc()))
-    folders = result.scalars().all()
+    # One grouped query instead of a count per folder
+    result = await db.execute(
+        select(Folder, func.count(Lecture.id))
+        .outerjoin(Lecture, Lecture.folder_id == Folder.id)
+        .group_by(Folder.id)
+        .order_by(Folder.created_at.desc())
+    )
     
-    # Get lecture counts for each folder
-    folder_responses = []
-    for folder in folders:
-        count_result = await db.execute(
-            select(func.count(Lecture.id)).where(Lecture.folder_id == folder.id)
-        )
-        count = count_result.scalar() or 0
-        
-        folder_responses.append(
-            FolderResponse(
-                id=folder.id,
-                name=folder.name,
-                count=count,
-                created_at=folder.created_at
-            )
+    return [
+        FolderResponse(
+            id=folder.id,
+            name=folder.name,
+            count=count,
+            created_at=folder.created_at
         )
-    
-    return folder_responses
+        for folder, count in result.all()
+    ]
 
 
 @router.post("/folders", response_model=FolderResponse)
@@ -64,13 +60,13 @@ async def delete_folder(folder_id: str, db: AsyncSession = Depends(get_db)):
     if not folder:
         raise HTTPException(status_code=404, detail="Folder not found")
     
-    # Unassign lectures from this folder
-    lectures_result = await db.execute(
-        select(Lecture).where(Lecture.folder_id == folder_id)
+    # Unassign lectures from this folder in one statement
+    await db.execute(
+        update(Lecture)
+        .where(Lecture.folder_id == folder_id)
+        .values(folder_id=None)
+        .execution_options(synchronize_session=False)
     )
-    lectures = lectures_result.scalars().all()
-    for lecture in lectures:
-        lecture.folder_id = None
     
     await db.delete(folder)
     await db.commit()
@@ -1,60 +1,279 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from app.database import get_db
+from typing import Dict, List, Union
+import asyncio
+import json
+import logging
+from app.config import settings
+from app.database import get_db, AsyncSessionLocal
 from app.models.lecture import Lecture
-from app.schemas.generation import GenerateRequest, GenerateResponse
-from app.services.generation import generation_service
+from app.schemas.generation import (
+    GenerateRequest,
+    GenerateResponse,
+    CombinedGenerateRequest,
+    CombinedGenerateResponse,
+    BulkGenerateRequest,
+)
+from app.services.generation import generation_service, cache_key, FORMAT_ERROR_CONTENT
+from app.services.material_cache import material_cache
+from app.services.llm import Priority
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
-@router.post("/generate", response_model=GenerateResponse)
-async def generate_study_materials(
-    request: GenerateRequest,
-    db: AsyncSession = Depends(get_db)
-):
-    """Generate study materials (notes, flashcards, or quiz) from lecture(s)."""
-    
-    # Fetch transcript(s) based on scope
+async def load_transcripts(
+    request: Union[GenerateRequest, CombinedGenerateRequest],
+    db: AsyncSession
+) -> List[str]:
+    """Fetch transcript(s) based on scope."""
     if request.scope == "lecture":
         result = await db.execute(select(Lecture).where(Lecture.id == request.id))
         lecture = result.scalar_one_or_none()
-        
+
         if not lecture:
             raise HTTPException(status_code=404, detail="Lecture not found")
-        
+
         if not lecture.transcript:
             raise HTTPException(status_code=400, detail="Lecture has no transcript")
-        
-        transcript = lecture.transcript
-    
-    else:  # scope == "folder"
-        result = await db.execute(
-            select(Lecture).where(Lecture.folder_id == request.id)
-        )
-        lectures = result.scalars().all()
-        
-        if not lectures:
-            raise HTTPException(status_code=404, detail="No lectures found in folder")
-        
-        # Combine transcripts
-        transcripts = [l.transcript for l in lectures if l.transcript]
-        if not transcripts:
-            raise HTTPException(status_code=400, detail="No transcripts available in folder")
-        
-        transcript = "\n\n---\n\n".join(transcripts)
-    
+
+        return [lecture.transcript]
+
+    # scope == "folder"
+    result = await db.execute(
+        select(Lecture)
+        .where(Lecture.folder_id == request.id)
+        .order_by(Lecture.created_at)
+    )
+    lectures = result.scalars().all()
+
+    if not lectures:
+        raise HTTPException(status_code=404, detail="No lectures found in folder")
+
+    transcripts = [l.transcript for l in lectures if l.transcript]
+    if not transcripts:
+        raise HTTPException(status_code=400, detail="No transcripts available in folder")
+
+    return transcripts
+
+
+@router.post("/generate", response_model=GenerateResponse)
+async def generate_study_materials(
+    request: GenerateRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Generate study materials (notes, flashcards, or quiz) from lecture(s)."""
+    transcripts = await load_transcripts(request, db)
+
     # Generate content
     try:
-        content = await generation_service.generate_study_material(
-            transcript=transcript,
-            material_type=request.type
+        if request.scope == "lecture":
+            content, cached, fitted = await generation_service.generate_cached(
+                db,
+                transcript=transcripts[0],
+                material_type=request.type
+            )
+        else:
+            content, cached, fitted = await generation_service.generate_folder_cached(
+                db,
+                transcripts=transcripts,
+                material_type=request.type
+            )
+
+        return GenerateResponse(
+            type=request.type,
+            content=content,
+            cached=cached,
+            input_tokens=fitted.original_tokens,
+            condensed=fitted.over_budget
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
+
+
+@router.post("/generate/combined", response_model=CombinedGenerateResponse)
+async def generate_combined_study_materials(
+    request: CombinedGenerateRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Generate several material types from lecture(s) with a single model call.
+    Types that are already cached or being generated are not requested again.
+    """
+    transcripts = await load_transcripts(request, db)
+
+    try:
+        text, summaries_cached = await generation_service.prepare_folder_input(db, transcripts)
+        results, fitted = await generation_service.generate_combined_cached(
+            db,
+            transcript=text,
+            material_types=request.types
         )
-        
-        return GenerateResponse(type=request.type, content=content)
-    
+
+        return CombinedGenerateResponse(materials=[
+            GenerateResponse(
+                type=material_type,
+                content=content,
+                cached=cached and summaries_cached,
+                input_tokens=fitted.original_tokens,
+                condensed=fitted.over_budget
+            )
+            for material_type, (content, cached) in results.items()
+        ])
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
+
+
+@router.post("/generate/stream")
+async def stream_study_materials(
+    request: GenerateRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Stream study materials while they are generated.
+
+    notes: server-sent events, {"type": "token", "text": ...} per delta.
+    flashcards/quiz: NDJSON, {"type": "item", "item": {...}} per validated item.
+    Both end with {"type": "done", "cached": bool, "input_tokens": int, "condensed": bool}
+    or {"type": "error", "message": ...}. Identical requests in flight share
+    one generation; a later one first receives what was already streamed.
+    """
+    transcripts = await load_transcripts(request, db)
+
+    try:
+        text, _ = await generation_service.prepare_folder_input(db, transcripts)
+        key = cache_key(text, request.type)
+        cached_content = await material_cache.get(db, key)
+        measured = await generation_service.measure_input(text, request.type)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
+    if request.type == "notes":
+        media_type = "text/event-stream"
+
+        def frame(event: dict) -> str:
+            return f"data: {json.dumps(event)}\n\n"
+    else:
+        media_type = "application/x-ndjson"
+
+        def frame(event: dict) -> str:
+            return json.dumps(event) + "\n"
+
+    usage = {"input_tokens": measured.original_tokens, "condensed": measured.over_budget}
+
+    def replay(content: str):
+        if request.type == "notes":
+            yield frame({"type": "token", "text": content})
+        else:
+            for item in json.loads(content):
+                yield frame({"type": "item", "item": item})
+
+    async def events():
+        if cached_content is not None:
+            for event in replay(cached_content):
+                yield event
+            yield frame({"type": "done", "cached": True, **usage})
+            return
+
+        try:
+            # Joins an identical generation already running instead of paying for another
+            task, broadcast = generation_service.start_stream(key, text, request.type)
+            if broadcast is None:
+                # Generated without streaming (e.g. pre-generation): wait for it, then replay
+                content, _ = await generation_service.attach(task)
+            else:
+                async for piece in generation_service.follow(task, broadcast):
+                    if request.type == "notes":
+                        yield frame({"type": "token", "text": piece})
+                    else:
+                        yield frame({"type": "item", "item": piece})
+                content, _ = task.result()
+
+            if content == FORMAT_ERROR_CONTENT:
+                raise ValueError(f"Failed to generate valid {request.type}")
+            if broadcast is None:
+                for event in replay(content):
+                    yield event
+            yield frame({"type": "done", "cached": False, **usage})
+        except Exception as e:
+            logger.exception("Error streaming %s", request.type)
+            yield frame({"type": "error", "message": f"Generation failed: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/generate/bulk")
+async def bulk_generate_study_materials(
+    request: BulkGenerateRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Generate one material type for many lectures, a few at a time.
+
+    Streams NDJSON in completion order: {"type": "item", "lecture_id", "content",
+    "cached", "input_tokens", "condensed"} or {"type": "error", "lecture_id", "message"} per lecture, then
+    {"type": "done", "count": n}.
+    """
+    ids = list(dict.fromkeys(request.lecture_ids))
+
+    result = await db.execute(
+        select(Lecture.id, Lecture.transcript).where(Lecture.id.in_(ids))
+    )
+    transcripts = dict(result.all())
+    semaphore = asyncio.Semaphore(settings.generation_max_concurrency)
+
+    async def generate_one(lecture_id: str) -> Dict:
+        if lecture_id not in transcripts:
+            return {"type": "error", "lecture_id": lecture_id, "message": "Lecture not found"}
+        if not transcripts[lecture_id]:
+            return {"type": "error", "lecture_id": lecture_id, "message": "Lecture has no transcript"}
+
+        async with semaphore:
+            try:
+                # Each item gets its own session; sessions can't be shared across tasks
+                async with AsyncSessionLocal() as item_db:
+                    content, cached, fitted = await generation_service.generate_cached(
+                        item_db,
+                        transcript=transcripts[lecture_id],
+                        material_type=request.type,
+                        priority=Priority.background
+                    )
+            except Exception as e:
+                print(f"Error generating {request.type} for lecture {lecture_id}: {e}")
+                return {"type": "error", "lecture_id": lecture_id, "message": f"Generation failed: {str(e)}"}
+
+        return {
+            "type": "item",
+            "lecture_id": lecture_id,
+            "content": content,
+            "cached": cached,
+            "input_tokens": fitted.original_tokens,
+            "condensed": fitted.over_budget
+        }
+
+    async def events():
+        tasks = [asyncio.create_task(generate_one(lecture_id)) for lecture_id in ids]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+            yield json.dumps({"type": "done", "count": len(ids)}) + "\n"
+        finally:
+            # Client went away: stop the remaining work, including generations
+            # nobody else is waiting on
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,29 +1,83 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Query, Request, Response
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List, Optional
+from sqlalchemy import select, update, delete, or_, and_
+from sqlalchemy.orm import defer
+from datetime import datetime
+from typing import List, Optional, Tuple
+import base64
 import os
+from pathlib import Path
+from app.config import settings
 from app.database import get_db
+from app.models.folder import Folder
 from app.models.lecture import Lecture
-from app.schemas.lecture import LectureResponse, LectureCreate, LectureUpdate, LectureDetailResponse
-from app.services.storage import storage_service
+from app.models.transcription_job import TranscriptionJob
+from app.models.transcript_chunk import TranscriptChunk
+from app.models.glossary_term import GlossaryTerm
+from app.schemas.lecture import (
+    LectureResponse, LectureCreate, LectureUpdate, LectureDetailResponse,
+    LectureBulkMove, LectureBulkDelete
+)
+from app.services.storage import storage_service, UploadTooLargeError
+from app.services.search import search_service
+from app.services.embedding_index import embedding_index
+from app.services.audio_pipeline import audio_pipeline
+from app.responses import RangeFileResponse, detect_audio_type
 
 router = APIRouter()
 
 
+def encode_cursor(lecture: Lecture) -> str:
+    raw = f"{lecture.created_at.isoformat()}|{lecture.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, lecture_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), lecture_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/lectures", response_model=List[LectureResponse])
 async def get_lectures(
+    response: Response,
     folder_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.lecture_page_size, ge=1, le=settings.lecture_page_size_max),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all lectures, optionally filtered by folder."""
-    query = select(Lecture)
+    """
+    Get lectures newest first, optionally filtered by folder.
+    Keyset-paginated on (created_at, id): when more results exist the
+    X-Next-Cursor response header holds the cursor for the next page.
+    """
+    # The listing never returns transcripts or insights, so don't load them
+    query = select(Lecture).options(defer(Lecture.transcript), defer(Lecture.ai_insights))
     if folder_id:
         query = query.where(Lecture.folder_id == folder_id)
     
-    result = await db.execute(query.order_by(Lecture.created_at.desc()))
+    if cursor:
+        created_at, lecture_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                Lecture.created_at < created_at,
+                and_(Lecture.created_at == created_at, Lecture.id < lecture_id)
+            )
+        )
+    
+    result = await db.execute(
+        query.order_by(Lecture.created_at.desc(), Lecture.id.desc()).limit(limit + 1)
+    )
     lectures = result.scalars().all()
+    
+    if len(lectures) > limit:
+        lectures = lectures[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(lectures[-1])
+    
     return lectures
 
 
@@ -47,6 +101,8 @@ async def create_lecture(
     """Create a new lecture record."""
     lecture = Lecture(**lecture_data.model_dump())
     db.add(lecture)
+    await db.flush()
+    await search_service.index_lecture(db, lecture)
     await db.commit()
     await db.refresh(lecture)
     return lecture
@@ -70,6 +126,8 @@ async def update_lecture(
     for field, value in update_data.items():
         setattr(lecture, field, value)
     
+    if "title" in update_data:
+        await search_service.index_lecture(db, lecture)
     await db.commit()
     await db.refresh(lecture)
     return lecture
@@ -90,17 +148,35 @@ async def upload_lecture_audio(
     
     # Save audio file
     try:
-        audio_path = await storage_service.save_audio_file(file)
-        lecture.audio_path = audio_path
-        await db.commit()
+        saved = await storage_service.save_audio_file(file)
+        async with storage_service.publish(saved) as audio_path:
+            old_paths = {lecture.audio_path, lecture.compact_audio_path} - {None, audio_path}
+            lecture.audio_path = audio_path
+            lecture.audio_hash = saved.content_hash
+            lecture.compact_audio_path = None
+            lecture.audio_time_map = None
+            await db.commit()
+        # Outside the block: an old variant may share the new blob's lock
+        for old_path in old_paths:
+            await storage_service.release_blob(db, old_path)
+        audio_pipeline.schedule(lecture_id)
         return {"message": "Audio uploaded successfully", "audio_path": audio_path}
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save audio: {str(e)}")
 
 
-@router.get("/lectures/{lecture_id}/audio")
-async def get_lecture_audio(lecture_id: str, db: AsyncSession = Depends(get_db)):
-    """Stream the audio file for a lecture."""
+@router.api_route("/lectures/{lecture_id}/audio", methods=["GET", "HEAD"])
+async def get_lecture_audio(
+    lecture_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Stream the audio file for a lecture.
+    Supports Range requests (206) for seeking and ETag revalidation (304).
+    """
     result = await db.execute(select(Lecture).where(Lecture.id == lecture_id))
     lecture = result.scalar_one_or_none()
     
@@ -110,14 +186,41 @@ async def get_lecture_audio(lecture_id: str, db: AsyncSession = Depends(get_db))
     if not lecture.audio_path or not os.path.exists(lecture.audio_path):
         raise HTTPException(status_code=404, detail="Audio file not found")
     
-    # Return the audio file
-    return FileResponse(
+    media_type = await run_in_threadpool(detect_audio_type, lecture.audio_path)
+    extension = os.path.splitext(lecture.audio_path)[1]
+    
+    # The original content-addressed blob (<hash><ext>) has a natural strong
+    # ETag. A derived variant served after the original was retired does not
+    # match audio_hash, so it falls back to the size/mtime ETag of the file.
+    served_original = lecture.audio_hash and Path(lecture.audio_path).stem == lecture.audio_hash
+    etag = f'"{lecture.audio_hash}"' if served_original else None
+    
+    return await run_in_threadpool(
+        RangeFileResponse,
         lecture.audio_path,
-        media_type="audio/webm",
-        filename=f"{lecture.title}.webm"
+        request.headers,
+        method=request.method,
+        media_type=media_type,
+        filename=f"{lecture.title}{extension}",
+        etag=etag
     )
 
 
+async def delete_lecture_rows(db: AsyncSession, ids: List[str]):
+    """
+    Delete the rows that belong to lectures, in the caller's transaction.
+    SQLite doesn't enforce the ON DELETE CASCADE foreign keys by default.
+    """
+    await search_service.remove_lectures(db, ids)
+    await embedding_index.remove_lectures(db, ids)
+    for model in (TranscriptionJob, TranscriptChunk, GlossaryTerm):
+        await db.execute(
+            delete(model)
+            .where(model.lecture_id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+
+
 @router.delete("/lectures/{lecture_id}")
 async def delete_lecture(lecture_id: str, db: AsyncSession = Depends(get_db)):
     """Delete a lecture and its audio file."""
@@ -127,11 +230,66 @@ async def delete_lecture(lecture_id: str, db: AsyncSession = Depends(get_db)):
     if not lecture:
         raise HTTPException(status_code=404, detail="Lecture not found")
     
-    # Delete audio file if exists
-    if lecture.audio_path:
-        storage_service.delete_audio_file(lecture.audio_path)
+    audio_paths = {lecture.audio_path, lecture.compact_audio_path} - {None}
     
+    await delete_lecture_rows(db, [lecture.id])
     await db.delete(lecture)
     await db.commit()
     
+    # Delete audio files once no other lecture references them
+    for audio_path in audio_paths:
+        await storage_service.release_blob(db, audio_path)
+    
     return {"message": "Lecture deleted successfully"}
+
+
+@router.post("/lectures/bulk/move")
+async def bulk_move_lectures(
+    request: LectureBulkMove,
+    db: AsyncSession = Depends(get_db)
+):
+    """Move many lectures into a folder (or out of one) in a single statement."""
+    ids = list(dict.fromkeys(request.lecture_ids))
+    
+    if request.folder_id and not await db.get(Folder, request.folder_id):
+        raise HTTPException(status_code=404, detail="Folder not found")
+    
+    result = await db.execute(
+        update(Lecture)
+        .where(Lecture.id.in_(ids))
+        .values(folder_id=request.folder_id)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    
+    return {"message": "Lectures moved successfully", "count": result.rowcount}
+
+
+@router.post("/lectures/bulk/delete")
+async def bulk_delete_lectures(
+    request: LectureBulkDelete,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Delete many lectures in one transaction. Audio files no longer
+    referenced by any lecture are removed after the response is sent.
+    """
+    ids = list(dict.fromkeys(request.lecture_ids))
+    
+    result = await db.execute(
+        select(Lecture.audio_path, Lecture.compact_audio_path).where(Lecture.id.in_(ids))
+    )
+    audio_paths = {path for row in result.all() for path in row}
+    
+    await delete_lecture_rows(db, ids)
+    result = await db.execute(
+        delete(Lecture)
+        .where(Lecture.id.in_(ids))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    
+    background_tasks.add_task(storage_service.release_blobs, audio_paths)
+    
+    return {"message": "Lectures deleted successfully", "count": result.rowcount}
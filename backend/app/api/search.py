@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.database import get_db
+from app.schemas.search import SearchResponse, SearchHit
+from app.services.search import search_service
+
+router = APIRouter()
+
+
+@router.get("/search", response_model=SearchResponse)
+async def search_lectures(
+    q: str = Query(..., min_length=1),
+    folder_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    """Full-text search over lecture titles and transcripts, ranked with highlighted snippets."""
+    try:
+        hits = await search_service.search(db, q, folder_id=folder_id, limit=limit + 1, offset=offset)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+    
+    next_offset = offset + limit if len(hits) > limit else None
+    
+    return SearchResponse(
+        query=q,
+        results=[SearchHit(**hit) for hit in hits[:limit]],
+        next_offset=next_offset
+    )
@@ -1,67 +1,145 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, WebSocket, WebSocketDisconnect
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from app.config import settings
 from app.database import get_db, AsyncSessionLocal
 from app.models.lecture import Lecture, LectureStatus
-from app.schemas.lecture import TranscriptionStartResponse, TranscriptionCompleteResponse
-from app.services.storage import storage_service
-from app.services.whisper import whisper_service
-from app.services.lecture_buddy import lecture_buddy_service
+from app.models.transcript_cache import TranscriptCache
+from app.schemas.lecture import TranscriptionStartResponse, TranscriptionJobResponse, TranscriptionStatusResponse
+from app.services.storage import storage_service, UploadTooLargeError
+from app.services.transcription_queue import transcription_queue, ACTIVE_STATUSES
+from app.services.live_analysis import LiveAnalyzer
+from app.services.search import search_service
+from app.services.audio_pipeline import audio_pipeline
+from app.metrics import WS_ACTIVE_SESSIONS, WS_MESSAGES, WS_MESSAGE_SECONDS, WS_SESSION_MESSAGE_RATE
+from app.services.transcript_checkpoint import TranscriptCheckpointer
+from app.services.streaming_asr import StreamingTranscriber, SUPPORTED_SAMPLE_RATES
+from app.services.generation import generation_service
+from app.services.embedding_index import embedding_index
+from typing import List, Optional
+import asyncio
 import json
+import time
 
 router = APIRouter()
 
 
-@router.post("/transcriptions", response_model=TranscriptionCompleteResponse)
+@router.post("/transcriptions", response_model=TranscriptionJobResponse)
 async def transcribe_audio_file(
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Upload an audio file for batch transcription.
-    This endpoint handles the complete transcription process.
+    Returns the lecture id right away; transcription runs on the background
+    worker pool. Poll /transcriptions/{lecture_id}/status for progress.
     """
     # Save audio file
     try:
-        audio_path = await storage_service.save_audio_file(file)
+        saved = await storage_service.save_audio_file(file)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save audio file: {str(e)}")
     
-    # Create lecture record
-    lecture = Lecture(
-        title=file.filename or "Untitled Lecture",
-        audio_path=audio_path,
-        status=LectureStatus.processing
-    )
-    db.add(lecture)
-    await db.commit()
+    # The lecture referencing the blob is committed while the blob is locked
+    async with storage_service.publish(saved) as audio_path:
+        # Reuse the transcript if this exact recording was transcribed before
+        cached = await db.get(TranscriptCache, saved.content_hash)
+        if cached:
+            lecture = Lecture(
+                title=file.filename or "Untitled Lecture",
+                audio_path=audio_path,
+                audio_hash=saved.content_hash,
+                transcript=cached.transcript,
+                ai_insights=cached.ai_insights or [],
+                status=LectureStatus.ready
+            )
+            db.add(lecture)
+            await db.flush()
+            await search_service.index_lecture(db, lecture)
+        else:
+            # Create lecture record
+            lecture = Lecture(
+                title=file.filename or "Untitled Lecture",
+                audio_path=audio_path,
+                audio_hash=saved.content_hash,
+                status=LectureStatus.processing
+            )
+            db.add(lecture)
+        await db.commit()
     await db.refresh(lecture)
     
-    # Transcribe audio
-    try:
-        transcript = await whisper_service.transcribe_audio_file(audio_path)
-        
-        # Analyze with lecture buddy
-        ai_insights = await lecture_buddy_service.analyze_transcript_chunk(transcript)
+    if cached:
+        audio_pipeline.schedule(lecture.id)
+        generation_service.schedule_pregeneration(lecture.transcript)
+        embedding_index.schedule(lecture.id, lecture.transcript)
         
-        # Update lecture
-        lecture.transcript = transcript
-        lecture.ai_insights = ai_insights
-        lecture.status = LectureStatus.ready
-        
-        await db.commit()
-        await db.refresh(lecture)
-        
-        return TranscriptionCompleteResponse(
+        return TranscriptionJobResponse(
             id=lecture.id,
-            transcript=transcript,
-            ai_insights=ai_insights
+            status=lecture.status.value,
+            transcript=lecture.transcript,
+            ai_insights=lecture.ai_insights
         )
     
-    except Exception as e:
-        lecture.status = LectureStatus.error
-        await db.commit()
-        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+    job = await transcription_queue.enqueue(db, lecture.id)
+    
+    return TranscriptionJobResponse(
+        id=lecture.id,
+        status=lecture.status.value,
+        job_id=job.id
+    )
+
+
+@router.get("/transcriptions/{lecture_id}/status", response_model=TranscriptionStatusResponse)
+async def get_transcription_status(lecture_id: str, db: AsyncSession = Depends(get_db)):
+    """Get the lecture status and the progress of its latest transcription job."""
+    lecture = await db.get(Lecture, lecture_id)
+    if not lecture:
+        raise HTTPException(status_code=404, detail="Lecture not found")
+    
+    job = await transcription_queue.get_latest_job(db, lecture_id)
+    if not job:
+        return TranscriptionStatusResponse(id=lecture.id, status=lecture.status.value)
+    
+    return TranscriptionStatusResponse(
+        id=lecture.id,
+        status=lecture.status.value,
+        job_id=job.id,
+        job_status=job.status.value,
+        progress=job.progress,
+        attempts=job.attempts,
+        error=job.error
+    )
+
+
+@router.post("/transcriptions/{lecture_id}/cancel", response_model=TranscriptionStatusResponse)
+async def cancel_transcription(lecture_id: str, db: AsyncSession = Depends(get_db)):
+    """Cancel the queued or running transcription job for a lecture."""
+    job = await transcription_queue.get_latest_job(db, lecture_id)
+    if not job or job.status not in ACTIVE_STATUSES:
+        raise HTTPException(status_code=409, detail="No active transcription job")
+    
+    await transcription_queue.cancel(db, job)
+    return await get_transcription_status(lecture_id, db)
+
+
+@router.post("/transcriptions/{lecture_id}/requeue", response_model=TranscriptionStatusResponse)
+async def requeue_transcription(lecture_id: str, db: AsyncSession = Depends(get_db)):
+    """Requeue transcription for a lecture in the error state."""
+    lecture = await db.get(Lecture, lecture_id)
+    if not lecture:
+        raise HTTPException(status_code=404, detail="Lecture not found")
+    
+    if lecture.status != LectureStatus.error:
+        raise HTTPException(status_code=409, detail="Only failed lectures can be requeued")
+    
+    if not lecture.audio_path:
+        raise HTTPException(status_code=400, detail="Lecture has no audio file")
+    
+    lecture.status = LectureStatus.processing
+    await transcription_queue.enqueue(db, lecture.id)
+    return await get_transcription_status(lecture_id, db)
 
 
 @router.post("/transcriptions/start", response_model=TranscriptionStartResponse)
@@ -82,12 +160,29 @@ async def start_transcription(db: AsyncSession = Depends(get_db)):
 
 
 @router.websocket("/transcriptions/{lecture_id}/stream")
-async def transcription_stream(websocket: WebSocket, lecture_id: str):
+async def transcription_stream(
+    websocket: WebSocket,
+    lecture_id: str,
+    last_seq: Optional[int] = None
+):
     """
     WebSocket endpoint for real-time transcription streaming.
     
     Client sends: audio chunks (binary data) or text messages
-    Server sends: JSON events with types: transcript_chunk, ai_chunk, done, error
+    Server sends: JSON events with types: resume, transcript_chunk, ai_chunk, done, error
+    
+    Binary frames are 16-bit little-endian mono PCM, at 16 kHz unless the
+    client first sends {"type": "audio_config", "sample_rate": N}. The server
+    splits the audio into utterances and sends each one's text as a
+    transcript_chunk with "source": "server". Once audio is streamed the
+    server numbers the transcript, so client transcript_chunks must not
+    carry a seq.
+    
+    transcript_chunk messages may carry a client-assigned, increasing "seq";
+    the echo carries the seq the server stored. On connect the server sends
+    {"type": "resume", "last_seq": N} with the last checkpointed seq. A
+    reconnecting client passes ?last_seq=<last acknowledged seq> to have any
+    later stored chunks replayed, and re-sends only chunks after N.
     """
     await websocket.accept()
     
@@ -101,46 +196,127 @@ async def transcription_stream(websocket: WebSocket, lecture_id: str):
             await websocket.close()
             return
         
-        accumulated_transcript = ""
-        last_analysis_length = 0
+        checkpointer = TranscriptCheckpointer(lecture_id)
+        await checkpointer.load()
+        
+        if checkpointer.chunks and lecture.status == LectureStatus.ready:
+            # Resuming a session that was interrupted
+            lecture.status = LectureStatus.recording
+            await db.commit()
+        
+        # Only text arriving in this connection is sent for analysis
+        analysis_buffer: List[str] = []
+        analysis_length = 0
+        send_lock = asyncio.Lock()
+        
+        async def send_event(event: dict):
+            # Echoes and background ai_chunk events share the socket
+            async with send_lock:
+                await websocket.send_json(event)
+        
+        def queue_analysis(text: str):
+            # Queue lecture buddy analysis every ~250 characters
+            nonlocal analysis_buffer, analysis_length
+            analysis_buffer.append(text)
+            analysis_length += len(text)
+            if analysis_length > 250:
+                analyzer.submit("".join(analysis_buffer))
+                analysis_buffer = []
+                analysis_length = 0
+        
+        async def on_server_transcript(text: str):
+            # Utterances arrive stripped; keep words of consecutive ones apart
+            if checkpointer.chunks and not checkpointer.chunks[-1][1][-1:].isspace():
+                text = " " + text
+            seq = checkpointer.append(text)
+            await send_event({"type": "transcript_chunk", "text": text, "seq": seq, "source": "server"})
+            queue_analysis(text)
+        
+        analyzer = LiveAnalyzer(send_event, lecture.id, lecture.folder_id)
+        analyzer.start()
+        checkpointer.start()
+        transcriber: Optional[StreamingTranscriber] = None
+        audio_sample_rate = settings.live_asr_sample_rate
+        
+        WS_ACTIVE_SESSIONS.inc()
+        session_start = time.perf_counter()
+        message_count = 0
+        finalized = False
         
         try:
+            await send_event({"type": "resume", "last_seq": checkpointer.durable_seq})
+            if last_seq is not None:
+                for seq, text in checkpointer.chunks_after(last_seq):
+                    await send_event({"type": "transcript_chunk", "text": text, "seq": seq})
+            
             while True:
                 # Receive data from client
                 data = await websocket.receive()
                 
-                if "text" in data:
+                if data.get("type") == "websocket.disconnect":
+                    raise WebSocketDisconnect(data.get("code", 1000))
+                
+                if data.get("bytes") is not None:
+                    # Raw audio: segment and transcribe on the server
+                    if transcriber is None:
+                        transcriber = StreamingTranscriber(on_server_transcript, audio_sample_rate)
+                        transcriber.start()
+                    transcriber.feed(data["bytes"])
+                    message_count += 1
+                    WS_MESSAGES.labels("audio").inc()
+                
+                elif data.get("text") is not None:
                     # Handle text messages (e.g., transcript chunks from client)
+                    received_at = time.perf_counter()
                     message = json.loads(data["text"])
+                    message_count += 1
+                    WS_MESSAGES.labels(str(message.get("type"))).inc()
                     
                     if message.get("type") == "transcript_chunk":
                         # Client is sending us transcript chunks
                         text = message.get("text", "")
-                        accumulated_transcript += text
+                        if transcriber is not None and message.get("seq") is not None:
+                            # Client seqs would collide with the server-numbered utterances
+                            await send_event({
+                                "type": "error",
+                                "message": "transcript_chunk seq is not supported while streaming audio"
+                            })
+                            continue
+                        seq = checkpointer.append(text, message.get("seq"))
+                        if seq is None:
+                            # Already stored before a reconnect
+                            continue
                         
                         # Echo back
-                        await websocket.send_json({
+                        await send_event({
                             "type": "transcript_chunk",
-                            "text": text
+                            "text": text,
+                            "seq": seq
                         })
                         
-                        # Run lecture buddy analysis every ~250 characters
-                        if len(accumulated_transcript) - last_analysis_length > 250:
-                            chunk_to_analyze = accumulated_transcript[last_analysis_length:]
-                            insights = await lecture_buddy_service.analyze_transcript_chunk(chunk_to_analyze)
-                            
-                            for insight in insights:
-                                await websocket.send_json({
-                                    "type": "ai_chunk",
-                                    "subtype": insight["subtype"],
-                                    "term": insight["term"],
-                                    "text": insight["text"]
+                        queue_analysis(text)
+                        
+                        WS_MESSAGE_SECONDS.observe(time.perf_counter() - received_at)
+                    
+                    elif message.get("type") == "audio_config":
+                        if transcriber is not None:
+                            await send_event({"type": "error", "message": "audio_config must precede audio"})
+                        else:
+                            try:
+                                sample_rate = int(message.get("sample_rate"))
+                            except (TypeError, ValueError):
+                                sample_rate = None
+                            if sample_rate in SUPPORTED_SAMPLE_RATES:
+                                audio_sample_rate = sample_rate
+                            else:
+                                await send_event({
+                                    "type": "error",
+                                    "message": f"sample_rate must be one of {', '.join(map(str, SUPPORTED_SAMPLE_RATES))}"
                                 })
-                            
-                            last_analysis_length = len(accumulated_transcript)
                     
                     elif message.get("type") == "finalize":
                         # Client is done recording
+                        finalized = True
                         break
         
         except WebSocketDisconnect:
@@ -149,29 +325,51 @@ async def transcription_stream(websocket: WebSocket, lecture_id: str):
         except Exception as e:
             print(f"Error in WebSocket: {e}")
             try:
-                await websocket.send_json({"type": "error", "message": str(e)})
+                await send_event({"type": "error", "message": str(e)})
             except:
                 pass
         
         finally:
+            WS_ACTIVE_SESSIONS.dec()
+            session_seconds = time.perf_counter() - session_start
+            if session_seconds > 0:
+                WS_SESSION_MESSAGE_RATE.observe(message_count / session_seconds)
+            
+            # Transcribe the audio still in flight before the transcript is saved
+            if transcriber is not None:
+                try:
+                    await transcriber.close()
+                except Exception as e:
+                    print(f"Error finishing live transcription for lecture {lecture_id}: {e}")
+            
+            try:
+                await checkpointer.close()
+            except Exception as e:
+                print(f"Error checkpointing transcript for lecture {lecture_id}: {e}")
+            
+            if finalized:
+                # The client is still listening: analyze the tail and let queued analysis finish
+                if analysis_buffer:
+                    analyzer.submit("".join(analysis_buffer))
+                await analyzer.close(settings.live_analysis_drain_timeout)
+            else:
+                # Nobody is left to receive cards; stop analysis instead of waiting for it
+                await analyzer.close()
+            
             # Finalize lecture
-            if accumulated_transcript:
-                lecture.transcript = accumulated_transcript
+            if checkpointer.chunks:
+                lecture.transcript = checkpointer.text
                 lecture.status = LectureStatus.ready
-                
-                # Run final analysis if needed
-                if len(accumulated_transcript) > last_analysis_length:
-                    final_insights = await lecture_buddy_service.analyze_transcript_chunk(
-                        accumulated_transcript[last_analysis_length:]
-                    )
-                    lecture.ai_insights = (lecture.ai_insights or []) + final_insights
-                
+                lecture.ai_insights = (lecture.ai_insights or []) + analyzer.insights
+                await search_service.index_lecture(db, lecture)
                 await db.commit()
+                generation_service.schedule_pregeneration(lecture.transcript)
+                embedding_index.schedule(lecture.id, lecture.transcript)
             
             # Only send if WebSocket is still connected
             try:
                 if websocket.client_state.value == 1:  # WebSocketState.CONNECTED
-                    await websocket.send_json({"type": "done"})
+                    await send_event({"type": "done"})
             except:
                 pass
             
@@ -7,10 +7,100 @@ class Settings(BaseSettings):
     upload_dir: str = "./uploads"
     cors_origins: str = "http://localhost:5173"
     
+    # Uploads
+    upload_chunk_size: int = 1024 * 1024  # 1 MiB
+    max_upload_bytes: int = 500 * 1024 * 1024  # 500 MiB
+    
+    # Lecture listing
+    lecture_page_size: int = 100
+    lecture_page_size_max: int = 200
+    bulk_max_items: int = 500  # lectures per bulk request
+    
+    # Background transcription
+    transcription_workers: int = 2
+    
+    # Shared OpenAI client
+    llm_max_connections: int = 20
+    llm_max_concurrency: int = 8
+    llm_requests_per_minute: int = 500
+    llm_tokens_per_minute: int = 80000
+    llm_max_retries: int = 5
+    llm_backoff_base: float = 1.0
+    llm_backoff_max: float = 60.0
+    llm_timeout: float = 300.0
+    llm_context_tokens: int = 0  # 0 = known window of the model
+    llm_context_margin: int = 256  # tokens left for message framing
+    
+    # Transcription engine: "openai" (hosted whisper-1) or "local" (faster-whisper on CPU)
+    transcription_engine: str = "openai"
+    local_whisper_model: str = "small"
+    local_whisper_compute_type: str = "int8"
+    local_whisper_workers: int = 2
+    local_whisper_cpu_threads: int = 0  # per worker; 0 = split the cores evenly
+    local_whisper_interactive_workers: int = 1  # reserved for live audio, started on first use
+    local_whisper_beam_size: int = 1
+    local_whisper_language: str = ""  # empty = detect
+    
+    # Segmented Whisper transcription for long recordings
+    whisper_segment_sec: int = 600
+    whisper_segment_overlap_sec: int = 5
+    whisper_max_concurrency: int = 4
+    whisper_max_file_bytes: int = 25 * 1024 * 1024  # Whisper API upload limit
+    
+    # Post-upload audio pipeline (transcode + silence trim for Whisper)
+    audio_pipeline_enabled: bool = True
+    audio_pipeline_workers: int = 2
+    audio_speech_bitrate: str = "24k"
+    audio_silence_noise_db: float = -35.0
+    audio_silence_min_sec: float = 2.0  # shorter pauses are kept
+    audio_silence_padding_sec: float = 0.3
+    audio_retire_original: bool = False  # serve the compact variant and delete the upload
+    
+    # Study material generation
+    generation_model: str = "gpt-4"
+    material_cache_size: int = 256  # in-memory LRU entries
+    generation_max_concurrency: int = 4
+    pregenerate_materials: bool = False  # generate all types once a lecture is ready
+    
+    # Embedding index and question answering
+    embedding_model: str = "text-embedding-3-small"
+    embedding_dimensions: int = 512  # shortened vectors; 0 = the model's full size
+    embedding_chunk_tokens: int = 300  # transcript tokens per passage
+    embedding_batch_size: int = 96  # passages per embeddings request
+    embedding_index_cache_size: int = 32  # folder matrices kept in memory
+    qa_top_k: int = 6  # passages sent to the model per question
+    
+    # Live lecture buddy analysis
+    live_analysis_queue_size: int = 4
+    live_analysis_drain_timeout: float = 30.0  # to analyze the tail after finalize
+    
+    # Server-side ASR for binary audio on the live WebSocket (16-bit mono PCM)
+    live_asr_sample_rate: int = 16000  # unless the client sends audio_config
+    live_asr_frame_ms: int = 30
+    live_asr_preroll_ms: int = 300
+    live_asr_drain_timeout: float = 30.0  # to transcribe queued audio after a disconnect
+    live_asr_end_silence_ms: int = 600
+    live_asr_min_speech_ms: int = 250
+    live_asr_max_utterance_sec: float = 15.0  # bounds latency per utterance
+    live_asr_energy_threshold: float = 300.0  # minimum RMS counted as speech
+    live_asr_queue_size: int = 4
+    
+    # Lecture buddy glossary
+    glossary_cache_size: int = 5000  # cross-lecture terms kept in memory
+    glossary_max_exclusions: int = 50  # known terms listed in the prompt
+    
+    # Live transcript checkpointing
+    live_checkpoint_interval_sec: float = 5.0
+    live_checkpoint_chars: int = 2000
+    
+    # Tracing
+    slow_request_threshold_ms: int = 5000
+    trace_dir: str = "./traces"
+    trace_profile_enabled: bool = False
+    trace_profile_interval_ms: int = 10
+    
     class Config:
         env_file = ".env"
 
 
 settings = Settings()
-
-
@@ -1,6 +1,9 @@
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.config import settings
+from app.tracing import add_span
+import time
 
 engine = create_async_engine(settings.database_url, echo=True)
 AsyncSessionLocal = async_sessionmaker(
@@ -11,12 +14,39 @@ Base = declarative_base()
 
 
 async def get_db():
-    async with AsyncSessionLocal() as session:
-        yield session
+    start = time.perf_counter()
+    try:
+        async with AsyncSessionLocal() as session:
+            yield session
+    finally:
+        add_span("db.session", start, time.perf_counter())
+
+
+# Columns added to tables that existed before; create_all never alters a table
+ADDED_COLUMNS = {
+    "lectures": ["audio_hash", "compact_audio_path", "audio_time_map"],
+}
+
+
+def upgrade_schema(conn):
+    """Add missing columns and indexes to tables created by an older version."""
+    inspector = inspect(conn)
+    for table_name, column_names in ADDED_COLUMNS.items():
+        table = Base.metadata.tables[table_name]
+        existing = {column["name"] for column in inspector.get_columns(table_name)}
+        for name in column_names:
+            if name not in existing:
+                column_type = table.c[name].type.compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {column_type}"))
+    
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
 
 
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
 
 
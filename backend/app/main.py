@@ -1,8 +1,19 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from app.config import settings
-from app.database import init_db
-from app.api import transcriptions, lectures, folders, generate
+from app.database import init_db, engine
+from app.api import transcriptions, lectures, folders, generate, search, ask
+from app.services.search import search_service
+from app.services.transcription_queue import transcription_queue
+from app.services.transcript_checkpoint import recover_interrupted_recordings
+from app.services.audio_pipeline import audio_pipeline
+from app.services.whisper import whisper_service
+from app.services.live_analysis import pending_analysis_chunks
+from app.services.llm import llm_client
+from app.metrics import HTTP_REQUEST_SECONDS, QUEUE_DEPTH, instrument_engine
+from app.tracing import start_trace, dump_slow_trace, start_profiler, stop_profiler
 
 app = FastAPI(title="PyroNotes API")
 
@@ -13,18 +24,71 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Request-ID"],
 )
 
+# Metrics
+instrument_engine(engine)
+QUEUE_DEPTH.labels("transcription_jobs").set_function(transcription_queue.queue_depth)
+QUEUE_DEPTH.labels("llm_scheduler").set_function(lambda: llm_client.scheduler.queue_depth)
+QUEUE_DEPTH.labels("live_analysis").set_function(pending_analysis_chunks)
+
+
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    """Record request latency, trace the request and dump it if it was slow."""
+    start = time.perf_counter()
+    trace_id = request.headers.get("x-request-id")
+    with start_trace(f"{request.method} {request.url.path}", trace_id) as trace:
+        response = await call_next(request)
+    duration = time.perf_counter() - start
+    
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.labels(
+        request.method,
+        route.path if route else "unmatched",
+        response.status_code
+    ).observe(duration)
+    
+    response.headers["X-Request-ID"] = trace.trace_id
+    if duration * 1000 >= settings.slow_request_threshold_ms:
+        try:
+            dump_slow_trace(trace, duration)
+        except Exception as e:
+            print(f"Error writing slow request trace: {e}")
+    return response
+
+
 # Include routers
 app.include_router(transcriptions.router, prefix="/api", tags=["transcriptions"])
 app.include_router(lectures.router, prefix="/api", tags=["lectures"])
 app.include_router(folders.router, prefix="/api", tags=["folders"])
 app.include_router(generate.router, prefix="/api", tags=["generate"])
+app.include_router(search.router, prefix="/api", tags=["search"])
+app.include_router(ask.router, prefix="/api", tags=["ask"])
 
 
 @app.on_event("startup")
 async def startup_event():
     await init_db()
+    async with engine.begin() as conn:
+        await search_service.init(conn)
+    await recover_interrupted_recordings()
+    await transcription_queue.start()
+    start_profiler()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await transcription_queue.stop()
+    audio_pipeline.shutdown()
+    whisper_service.shutdown()
+    stop_profiler()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 @app.get("/")
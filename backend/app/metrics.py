@@ -0,0 +1,134 @@
+import time
+from contextlib import asynccontextmanager
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.tracing import span, add_span
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# HTTP
+HTTP_REQUEST_SECONDS = Histogram(
+    "pyronotes_http_request_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# External model calls
+EXTERNAL_CALL_SECONDS = Histogram(
+    "pyronotes_external_call_seconds",
+    "Latency of OpenAI-backed operations",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+EXTERNAL_CALL_ERRORS = Counter(
+    "pyronotes_external_call_errors_total",
+    "Failed OpenAI-backed operations",
+    ["operation"],
+)
+LLM_RETRIES = Counter(
+    "pyronotes_llm_retries_total",
+    "Retried OpenAI requests by error type",
+    ["error"],
+)
+PROMPT_TOKENS = Histogram(
+    "pyronotes_prompt_input_tokens",
+    "Tokens of transcript input sent to the model, after budgeting",
+    ["operation"],
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072),
+)
+PROMPT_REDUCTIONS = Counter(
+    "pyronotes_prompt_reductions_total",
+    "Inputs trimmed or condensed to fit the model context",
+    ["operation"],
+)
+
+# Database
+DB_QUERY_SECONDS = Histogram(
+    "pyronotes_db_query_seconds",
+    "Database statement execution time",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+# Uploads
+UPLOAD_BYTES = Counter("pyronotes_upload_bytes_total", "Bytes received in audio uploads")
+UPLOAD_SECONDS = Histogram(
+    "pyronotes_upload_seconds",
+    "Time to stream an audio upload to disk",
+    buckets=LATENCY_BUCKETS,
+)
+UPLOAD_THROUGHPUT = Histogram(
+    "pyronotes_upload_bytes_per_second",
+    "Audio upload throughput",
+    buckets=(2**16, 2**18, 2**20, 2**22, 2**24, 2**26, 2**28),
+)
+
+# WebSocket sessions
+WS_ACTIVE_SESSIONS = Gauge("pyronotes_ws_active_sessions", "Open live transcription sessions")
+WS_MESSAGES = Counter(
+    "pyronotes_ws_messages_total",
+    "Messages received on live transcription sessions",
+    ["type"],
+)
+WS_MESSAGE_SECONDS = Histogram(
+    "pyronotes_ws_message_seconds",
+    "Time to handle one live transcription message",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+WS_SESSION_MESSAGE_RATE = Histogram(
+    "pyronotes_ws_session_messages_per_second",
+    "Average message rate of a live transcription session, observed at close",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50),
+)
+LIVE_ASR_LATENCY = Histogram(
+    "pyronotes_live_asr_latency_seconds",
+    "Time from the end of a live utterance to its transcript being sent",
+    buckets=(0.25, 0.5, 1, 2, 3, 5, 10, 20, 30),
+)
+LIVE_ASR_DROPPED = Counter(
+    "pyronotes_live_asr_dropped_utterances_total",
+    "Live utterances dropped because transcription fell behind",
+)
+
+# Queues
+QUEUE_DEPTH = Gauge("pyronotes_queue_depth", "Items waiting in internal queues", ["queue"])
+
+
+@asynccontextmanager
+async def track_call(operation: str):
+    """Time an external call (also as a trace span) and count it as an error if it raises."""
+    start = time.perf_counter()
+    try:
+        with span(operation):
+            yield
+    except BaseException:
+        EXTERNAL_CALL_ERRORS.labels(operation).inc()
+        raise
+    finally:
+        EXTERNAL_CALL_SECONDS.labels(operation).observe(time.perf_counter() - start)
+
+
+def instrument_engine(engine: AsyncEngine):
+    """Record execution time of every statement run through the engine, and trace it."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if starts:
+            start = starts.pop()
+            end = time.perf_counter()
+            DB_QUERY_SECONDS.observe(end - start)
+            add_span("db.query", start, end, statement=statement[:200])
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        conn = context.connection
+        starts = conn.info.get("query_start") if conn is not None else None
+        if starts:
+            starts.pop()
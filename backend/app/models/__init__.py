@@ -1,6 +1,21 @@
 from app.models.lecture import Lecture
 from app.models.folder import Folder
+from app.models.transcript_cache import TranscriptCache
+from app.models.transcription_job import TranscriptionJob
+from app.models.transcript_segment import TranscriptSegment
+from app.models.generated_material import GeneratedMaterial
+from app.models.transcript_chunk import TranscriptChunk
+from app.models.glossary_term import GlossaryTerm
+from app.models.lecture_embedding import LectureEmbedding
 
-__all__ = ["Lecture", "Folder"]
-
-
+__all__ = [
+    "Lecture",
+    "Folder",
+    "TranscriptCache",
+    "TranscriptionJob",
+    "TranscriptSegment",
+    "GeneratedMaterial",
+    "TranscriptChunk",
+    "GlossaryTerm",
+    "LectureEmbedding",
+]
@@ -13,6 +13,7 @@ class Folder(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     # Relationship
-    lectures = relationship("Lecture", back_populates="folder")
+    # Lectures are unassigned with a bulk UPDATE before a folder is deleted
+    lectures = relationship("Lecture", back_populates="folder", passive_deletes=True)
 
 
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, DateTime, Text, UniqueConstraint
+from datetime import datetime
+from app.database import Base
+import uuid
+
+
+class GeneratedMaterial(Base):
+    """Cached study material keyed by transcript hash, type, prompt version and model."""
+    __tablename__ = "generated_materials"
+    __table_args__ = (
+        UniqueConstraint("content_hash", "material_type", "prompt_version", "model"),
+    )
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    content_hash = Column(String, nullable=False, index=True)
+    material_type = Column(String, nullable=False)
+    prompt_version = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text
+from datetime import datetime
+from app.database import Base
+import uuid
+
+
+class GlossaryTerm(Base):
+    """A term the lecture buddy has already explained in a lecture."""
+    __tablename__ = "glossary_terms"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    lecture_id = Column(
+        String, ForeignKey("lectures.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    normalized_term = Column(String, nullable=False, index=True)
+    term = Column(String, nullable=False)
+    subtype = Column(String, nullable=False)
+    text = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -18,13 +18,18 @@ class Lecture(Base):
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     title = Column(String, nullable=False)
-    folder_id = Column(String, ForeignKey("folders.id"), nullable=True)
+    folder_id = Column(String, ForeignKey("folders.id"), nullable=True, index=True)
     duration_sec = Column(Integer, nullable=True)
     audio_path = Column(String, nullable=True)
+    audio_hash = Column(String, nullable=True, index=True)
+    # Mono Opus with long silences trimmed, fed to Whisper
+    compact_audio_path = Column(String, nullable=True)
+    # [{"out", "src", "dur"}] spans mapping compact audio time to the original
+    audio_time_map = Column(JSON, nullable=True)
     transcript = Column(Text, nullable=True)
     ai_insights = Column(JSON, nullable=True, default=list)
     status = Column(Enum(LectureStatus), default=LectureStatus.processing, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     
     # Relationship
     folder = relationship("Folder", back_populates="lectures")
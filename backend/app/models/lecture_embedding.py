@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, JSON, LargeBinary
+from datetime import datetime
+from app.database import Base
+
+
+class LectureEmbedding(Base):
+    """A lecture's transcript passages and their embeddings, one float32 row per passage."""
+    __tablename__ = "lecture_embeddings"
+    
+    lecture_id = Column(String, ForeignKey("lectures.id", ondelete="CASCADE"), primary_key=True)
+    # Hash of the transcript, embedding model and chunking; a mismatch means re-embed
+    content_hash = Column(String, nullable=False)
+    dimensions = Column(Integer, nullable=False)
+    passages = Column(JSON, nullable=False)
+    # len(passages) x dimensions float32, L2-normalized, row-major
+    vectors = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime, Text, JSON
+from datetime import datetime
+from app.database import Base
+
+
+class TranscriptCache(Base):
+    """Transcript and lecture buddy insights keyed by audio content hash."""
+    __tablename__ = "transcript_cache"
+    
+    content_hash = Column(String, primary_key=True)
+    transcript = Column(Text, nullable=False)
+    ai_insights = Column(JSON, nullable=True, default=list)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
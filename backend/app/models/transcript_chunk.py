@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Text, UniqueConstraint
+from datetime import datetime
+from app.database import Base
+import uuid
+
+
+class TranscriptChunk(Base):
+    """Checkpointed piece of a live transcript, ordered by seq."""
+    __tablename__ = "transcript_chunks"
+    __table_args__ = (UniqueConstraint("lecture_id", "seq"),)
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    lecture_id = Column(
+        String, ForeignKey("lectures.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    seq = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer, Float, DateTime, Text, UniqueConstraint
+from datetime import datetime
+from app.database import Base
+import uuid
+
+
+class TranscriptSegment(Base):
+    """Partial Whisper result for one time segment of a long recording."""
+    __tablename__ = "transcript_segments"
+    __table_args__ = (UniqueConstraint("source_key", "segment_index"),)
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    source_key = Column(String, nullable=False, index=True)  # audio hash or path
+    segment_index = Column(Integer, nullable=False)
+    start_sec = Column(Float, nullable=False)
+    end_sec = Column(Float, nullable=False)
+    text = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Text, Enum
+from datetime import datetime
+from app.database import Base
+import uuid
+import enum
+
+
+class JobStatus(enum.Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    error = "error"
+    cancelled = "cancelled"
+
+
+class TranscriptionJob(Base):
+    __tablename__ = "transcription_jobs"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    lecture_id = Column(
+        String, ForeignKey("lectures.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    status = Column(Enum(JobStatus), default=JobStatus.queued, nullable=False, index=True)
+    progress = Column(Integer, default=0, nullable=False)  # 0-100
+    attempts = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
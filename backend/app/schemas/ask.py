@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal
+from app.config import settings
+
+
+class AskRequest(BaseModel):
+    question: str = Field(min_length=1, max_length=2000)
+    scope: Literal["lecture", "folder"]
+    id: str
+    top_k: int = Field(default=settings.qa_top_k, ge=1, le=20)
+
+
+class AskSource(BaseModel):
+    lecture_id: str
+    title: str
+    text: str
+    score: float
+
+
+class AskResponse(BaseModel):
+    answer: str
+    sources: List[AskSource]
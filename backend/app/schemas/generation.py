@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Literal
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from app.config import settings
 
 
 class GenerateRequest(BaseModel):
@@ -11,5 +12,23 @@ class GenerateRequest(BaseModel):
 class GenerateResponse(BaseModel):
     type: str
     content: str
+    cached: bool = False
+    input_tokens: Optional[int] = None  # transcript tokens before budgeting
+    condensed: bool = False  # input was over the prompt budget and was reduced
 
 
+class CombinedGenerateRequest(BaseModel):
+    types: List[Literal["notes", "flashcards", "quiz"]] = Field(
+        default=["notes", "flashcards", "quiz"], min_length=1
+    )
+    scope: Literal["lecture", "folder"]
+    id: str
+
+
+class CombinedGenerateResponse(BaseModel):
+    materials: List[GenerateResponse]
+
+
+class BulkGenerateRequest(BaseModel):
+    type: Literal["notes", "flashcards", "quiz"]
+    lecture_ids: List[str] = Field(min_length=1, max_length=settings.bulk_max_items)
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
+from app.config import settings
 from datetime import datetime
 
 
@@ -23,6 +24,15 @@ class LectureUpdate(BaseModel):
     folder_id: Optional[str] = None
 
 
+class LectureBulkMove(BaseModel):
+    lecture_ids: List[str] = Field(min_length=1, max_length=settings.bulk_max_items)
+    folder_id: Optional[str] = None  # None moves lectures out of their folder
+
+
+class LectureBulkDelete(BaseModel):
+    lecture_ids: List[str] = Field(min_length=1, max_length=settings.bulk_max_items)
+
+
 class LectureResponse(LectureBase):
     id: str
     duration_sec: Optional[int] = None
@@ -35,6 +45,7 @@ class LectureResponse(LectureBase):
 
 class LectureDetailResponse(LectureResponse):
     audio_path: Optional[str] = None
+    audio_time_map: Optional[List[Dict]] = None
     transcript: Optional[str] = None
     ai_insights: Optional[List[LectureBuddyCard]] = None
     
@@ -46,9 +57,21 @@ class TranscriptionStartResponse(BaseModel):
     id: str
 
 
-class TranscriptionCompleteResponse(BaseModel):
+class TranscriptionJobResponse(BaseModel):
     id: str
-    transcript: str
-    ai_insights: List[LectureBuddyCard]
+    status: str
+    job_id: Optional[str] = None
+    transcript: Optional[str] = None
+    ai_insights: Optional[List[LectureBuddyCard]] = None
+
+
+class TranscriptionStatusResponse(BaseModel):
+    id: str
+    status: str
+    job_id: Optional[str] = None
+    job_status: Optional[str] = None
+    progress: int = 0
+    attempts: int = 0
+    error: Optional[str] = None
 
 
@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import datetime
+
+
+class SearchHit(BaseModel):
+    id: str
+    title: str
+    folder_id: Optional[str] = None
+    created_at: datetime
+    rank: float
+    snippet: Optional[str] = None
+
+
+class SearchResponse(BaseModel):
+    query: str
+    results: List[SearchHit]
+    next_offset: Optional[int] = None
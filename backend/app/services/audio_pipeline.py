@@ -0,0 +1,234 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import subprocess
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy.orm.exc import StaleDataError
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.lecture import Lecture
+from app.services.storage import storage_service
+from app.tracing import span, create_detached_task
+
+SILENCE_START = re.compile(r"silence_start: (-?[\d.]+)")
+SILENCE_END = re.compile(r"silence_end: (-?[\d.]+)")
+
+
+def probe_duration(path: str) -> Optional[float]:
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+         "-of", "default=noprint_wrappers=1:nokey=1", path],
+        capture_output=True, text=True
+    )
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+
+def detect_silences(path: str, noise_db: float, min_silence: float) -> List[Tuple[float, float]]:
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-i", path,
+         "-af", f"silencedetect=noise={noise_db}dB:d={min_silence}",
+         "-f", "null", "-"],
+        capture_output=True, text=True
+    )
+    starts = [float(m) for m in SILENCE_START.findall(result.stderr)]
+    ends = [float(m) for m in SILENCE_END.findall(result.stderr)]
+    # A silence running to the end of the file has no silence_end
+    return list(zip(starts, ends + [float("inf")] * (len(starts) - len(ends))))
+
+
+def keep_intervals(
+    duration: float,
+    silences: List[Tuple[float, float]],
+    padding: float
+) -> List[Tuple[float, float]]:
+    """Audible (start, end) intervals, keeping `padding` seconds around each cut."""
+    keep = []
+    cursor = 0.0
+    for start, end in silences:
+        start = max(start, 0.0)
+        end = min(end, duration)
+        cut_start = start + padding if start > 0 else 0.0
+        cut_end = end - padding if end < duration else duration
+        if cut_end <= cut_start:
+            continue
+        if cut_start > cursor:
+            keep.append((cursor, cut_start))
+        cursor = cut_end
+    if cursor < duration:
+        keep.append((cursor, duration))
+    return keep
+
+
+def transcode_for_speech(src: str, dest: str, params: Dict) -> Dict:
+    """
+    Runs in a worker process. Probes duration, trims long silences and
+    transcodes to mono Opus at a speech bitrate. Returns the duration and a
+    map from output time back to source time.
+    """
+    duration = probe_duration(src)
+    if duration is None:
+        raise RuntimeError("Could not probe audio duration")
+
+    silences = detect_silences(src, params["noise_db"], params["min_silence"])
+    keep = keep_intervals(duration, silences, params["padding"]) or [(0.0, duration)]
+
+    filters = []
+    if len(keep) > 1 or keep[0] != (0.0, duration):
+        select = "+".join(f"between(t,{start:.3f},{end:.3f})" for start, end in keep)
+        filters = ["-af", f"aselect='{select}',asetpts=N/SR/TB"]
+
+    # Unique per run, so two processes working on the same blob never share a file
+    tmp = f"{dest}.{uuid.uuid4().hex}.part"
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-y", "-v", "error", "-i", src, *filters,
+             "-ac", "1", "-ar", "16000", "-c:a", "libopus",
+             "-b:a", params["bitrate"], "-application", "voip",
+             "-f", "ogg", tmp],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {result.stderr.strip()}")
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    time_map = []
+    out = 0.0
+    for start, end in keep:
+        time_map.append({"out": round(out, 3), "src": round(start, 3), "dur": round(end - start, 3)})
+        out += end - start
+
+    return {"duration": duration, "speech_duration": out, "time_map": time_map}
+
+
+def read_json(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_json(path: str, data: Dict):
+    tmp = f"{path}.{uuid.uuid4().hex}.part"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class AudioPipeline:
+    """Post-upload audio processing in a process pool."""
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Transcodes running now by content hash, so duplicates share one
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, like the local transcription engine: forking a threaded server is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def process(self, audio_path: str, content_hash: str) -> Optional[Dict]:
+        """
+        Produce (or reuse) the compact speech variant of a stored upload.
+        Returns {"path", "duration", "speech_duration", "time_map"}, or None
+        when the pipeline is disabled or ffmpeg is unavailable.
+        """
+        if not settings.audio_pipeline_enabled:
+            return None
+
+        task = self._inflight.get(content_hash)
+        if task is None:
+            task = create_detached_task(self._process(audio_path, content_hash))
+            self._inflight[content_hash] = task
+            task.add_done_callback(lambda t: self._inflight.pop(content_hash, None))
+        return await asyncio.shield(task)
+
+    async def _process(self, audio_path: str, content_hash: str) -> Optional[Dict]:
+        dest = storage_service.derived_path(content_hash, ".speech.ogg")
+        sidecar = storage_service.derived_path(content_hash, ".speech.json")
+        if os.path.exists(dest) and os.path.exists(sidecar):
+            return {"path": str(dest), **await run_in_threadpool(read_json, str(sidecar))}
+
+        params = {
+            "noise_db": settings.audio_silence_noise_db,
+            "min_silence": settings.audio_silence_min_sec,
+            "padding": settings.audio_silence_padding_sec,
+            "bitrate": settings.audio_speech_bitrate,
+        }
+        loop = asyncio.get_running_loop()
+        try:
+            with span("audio_pipeline.transcode"):
+                result = await loop.run_in_executor(
+                    self._pool(), transcode_for_speech, audio_path, str(dest), params
+                )
+        except FileNotFoundError:
+            print("ffmpeg not found; skipping audio pipeline")
+            return None
+
+        await run_in_threadpool(write_json, str(sidecar), result)
+        return {"path": str(dest), **result}
+
+    async def process_lecture(self, db, lecture: Lecture) -> Optional[Dict]:
+        """
+        Run the pipeline for a lecture and record both variants on it.
+        Returns None if the lecture was deleted while its audio was processed.
+        """
+        if not lecture.audio_path or not lecture.audio_hash:
+            return None
+        result = await self.process(lecture.audio_path, lecture.audio_hash)
+        if not result:
+            return None
+
+        lecture.duration_sec = int(round(result["duration"]))
+        lecture.compact_audio_path = result["path"]
+        lecture.audio_time_map = result["time_map"]
+        try:
+            # The UPDATE matches no row if the lecture was deleted meanwhile
+            await db.commit()
+        except StaleDataError:
+            await db.rollback()
+            # Its delete could not see the variant; drop it unless another lecture uses it
+            await storage_service.release_blob(db, result["path"])
+            return None
+
+        if settings.audio_retire_original:
+            await storage_service.retire_original(db, lecture)
+        return result
+
+    def schedule(self, lecture_id: str):
+        """Process a lecture's audio in the background."""
+        async def run():
+            try:
+                async with AsyncSessionLocal() as db:
+                    lecture = await db.get(Lecture, lecture_id)
+                    if lecture:
+                        await self.process_lecture(db, lecture)
+            except Exception as e:
+                print(f"Audio pipeline failed for lecture {lecture_id}: {e}")
+
+        task = create_detached_task(run())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+
+audio_pipeline = AudioPipeline(settings.audio_pipeline_workers)
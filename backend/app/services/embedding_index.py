@@ -0,0 +1,258 @@
+import asyncio
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.lecture import Lecture
+from app.models.lecture_embedding import LectureEmbedding
+from app.services.llm import llm_client, Priority
+from app.services.material_cache import hash_text
+from app.services.token_budget import chunk_text
+from app.metrics import track_call
+from app.tracing import create_detached_task
+
+
+def content_hash(transcript: str) -> str:
+    """Key of a lecture's embeddings: the transcript and everything that shapes the vectors."""
+    spec = json.dumps([
+        settings.embedding_model, settings.embedding_dimensions, settings.embedding_chunk_tokens
+    ])
+    return hash_text(spec + "\n" + transcript)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length so a dot product is the cosine similarity."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.maximum(norms, 1e-12)).astype(np.float32, copy=False)
+
+
+def top_k(matrix: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Row indices and scores of the k rows most similar to query, best first."""
+    scores = matrix @ query
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float32)
+    # O(n) selection of the k best, then sort only those
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best])]
+    return best, scores[best]
+
+
+@dataclass
+class Passage:
+    lecture_id: str
+    text: str
+    score: float
+
+
+@dataclass
+class PassageIndex:
+    """All passages of a set of lectures as one contiguous float32 matrix."""
+    signature: Tuple[Tuple[str, str], ...]  # (lecture_id, content_hash) per lecture
+    matrix: np.ndarray  # (passages, dimensions)
+    owners: np.ndarray  # index into lecture_ids per row
+    lecture_ids: List[str]
+    passages: List[str]
+
+    def search(self, query: np.ndarray, k: int) -> List[Passage]:
+        rows, scores = top_k(self.matrix, query, k)
+        return [
+            Passage(
+                lecture_id=self.lecture_ids[self.owners[row]],
+                text=self.passages[row],
+                score=float(score)
+            )
+            for row, score in zip(rows, scores)
+        ]
+
+
+def build_index(signature: Tuple[Tuple[str, str], ...], rows: Sequence[LectureEmbedding]) -> PassageIndex:
+    lecture_ids, passages, blocks, owners = [], [], [], []
+    for owner, row in enumerate(rows):
+        block = np.frombuffer(row.vectors, dtype=np.float32).reshape(len(row.passages), row.dimensions)
+        lecture_ids.append(row.lecture_id)
+        passages.extend(row.passages)
+        blocks.append(block)
+        owners.append(np.full(len(row.passages), owner, dtype=np.int32))
+
+    dimensions = rows[0].dimensions if rows else 0
+    matrix = np.concatenate(blocks) if blocks else np.zeros((0, dimensions), dtype=np.float32)
+    return PassageIndex(
+        signature=signature,
+        matrix=np.ascontiguousarray(matrix, dtype=np.float32),
+        owners=np.concatenate(owners) if owners else np.zeros(0, dtype=np.int32),
+        lecture_ids=lecture_ids,
+        passages=passages
+    )
+
+
+class EmbeddingIndex:
+    """
+    Embedded transcript passages for retrieval. Each lecture is chunked and
+    embedded once per transcript version and stored in the database; the
+    passages of a folder (or lecture) are searched as one in-memory matrix
+    that is rebuilt only when a lecture in it changes.
+    """
+
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+        self._indexes: "OrderedDict[str, PassageIndex]" = OrderedDict()
+        # Embedding runs in progress, so a lecture is never embedded twice at once
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    async def embed(self, texts: List[str], priority: Priority) -> np.ndarray:
+        """Unit-length float32 embeddings, one row per text."""
+        extra = {"dimensions": settings.embedding_dimensions} if settings.embedding_dimensions else {}
+        rows: List[List[float]] = []
+        for start in range(0, len(texts), settings.embedding_batch_size):
+            batch = texts[start:start + settings.embedding_batch_size]
+            async with track_call("embed_passages"):
+                response = await llm_client.embed(
+                    priority=priority,
+                    model=settings.embedding_model,
+                    input=batch,
+                    **extra
+                )
+            rows.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return normalize_rows(np.asarray(rows, dtype=np.float32))
+
+    async def index_lecture(self, lecture_id: str, transcript: str, priority: Priority = Priority.background):
+        """Embed a lecture's transcript unless its current version is already stored."""
+        key = await run_in_threadpool(content_hash, transcript)
+        task = self._inflight.get((lecture_id, key))
+        if task is None:
+            task = create_detached_task(self._index(lecture_id, transcript, key, priority))
+            self._inflight[(lecture_id, key)] = task
+            task.add_done_callback(lambda t: self._inflight.pop((lecture_id, key), None))
+        await asyncio.shield(task)
+
+    async def _index(self, lecture_id: str, transcript: str, key: str, priority: Priority):
+        async with AsyncSessionLocal() as db:
+            stored = await db.scalar(
+                select(LectureEmbedding.content_hash).where(LectureEmbedding.lecture_id == lecture_id)
+            )
+        if stored == key:
+            return
+
+        passages = await run_in_threadpool(
+            chunk_text, transcript, settings.embedding_chunk_tokens, settings.embedding_model
+        )
+        passages = [p for p in passages if p.strip()]
+        vectors = await self.embed(passages, priority) if passages else None
+
+        async with AsyncSessionLocal() as db:
+            # The lecture may have been deleted while it was being embedded
+            if not await db.get(Lecture, lecture_id):
+                return
+            await db.merge(LectureEmbedding(
+                lecture_id=lecture_id,
+                content_hash=key,
+                dimensions=vectors.shape[1] if vectors is not None else 0,
+                passages=passages,
+                vectors=vectors.tobytes() if vectors is not None else b""
+            ))
+            await db.commit()
+
+    def schedule(self, lecture_id: str, transcript: Optional[str]):
+        """Embed a new or changed transcript in the background."""
+        if not transcript:
+            return
+
+        async def run():
+            try:
+                await self.index_lecture(lecture_id, transcript)
+            except Exception as e:
+                print(f"Error embedding lecture {lecture_id}: {e}")
+
+        task = create_detached_task(run())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def remove_lectures(self, db: AsyncSession, lecture_ids: List[str]):
+        """Drop stored embeddings in the caller's transaction; cached matrices notice on next use."""
+        if lecture_ids:
+            await db.execute(delete(LectureEmbedding).where(LectureEmbedding.lecture_id.in_(lecture_ids)))
+
+    async def ensure_indexed(
+        self,
+        db: AsyncSession,
+        lectures: List[Tuple[str, str]],
+        priority: Priority = Priority.interactive
+    ):
+        """Embed any of (lecture_id, transcript) whose stored embeddings are missing or stale."""
+        ids = [lecture_id for lecture_id, _ in lectures]
+        result = await db.execute(
+            select(LectureEmbedding.lecture_id, LectureEmbedding.content_hash)
+            .where(LectureEmbedding.lecture_id.in_(ids))
+        )
+        stored = dict(result.all())
+        keys = await run_in_threadpool(lambda: [content_hash(t) for _, t in lectures])
+        stale = [
+            (lecture_id, transcript)
+            for (lecture_id, transcript), key in zip(lectures, keys)
+            if stored.get(lecture_id) != key
+        ]
+        if not stale:
+            return
+
+        semaphore = asyncio.Semaphore(settings.generation_max_concurrency)
+
+        async def index(lecture_id: str, transcript: str):
+            async with semaphore:
+                await self.index_lecture(lecture_id, transcript, priority)
+
+        await asyncio.gather(*(index(lecture_id, transcript) for lecture_id, transcript in stale))
+
+    async def load(self, db: AsyncSession, scope_key: str, lecture_ids: List[str]) -> PassageIndex:
+        """The passage matrix for these lectures, reused while none of them has changed."""
+        result = await db.execute(
+            select(LectureEmbedding.lecture_id, LectureEmbedding.content_hash)
+            .where(LectureEmbedding.lecture_id.in_(lecture_ids))
+            .order_by(LectureEmbedding.lecture_id)
+        )
+        signature = tuple((lecture_id, key) for lecture_id, key in result.all())
+
+        index = self._indexes.get(scope_key)
+        if index is not None and index.signature == signature:
+            self._indexes.move_to_end(scope_key)
+            return index
+
+        result = await db.execute(
+            select(LectureEmbedding)
+            .where(LectureEmbedding.lecture_id.in_(lecture_ids))
+            .order_by(LectureEmbedding.lecture_id)
+        )
+        rows = [row for row in result.scalars().all() if row.passages]
+        index = await run_in_threadpool(build_index, signature, rows)
+
+        self._indexes[scope_key] = index
+        self._indexes.move_to_end(scope_key)
+        while len(self._indexes) > self.cache_size:
+            self._indexes.popitem(last=False)
+        return index
+
+    async def search(
+        self,
+        db: AsyncSession,
+        scope_key: str,
+        lectures: List[Tuple[str, str]],
+        query: str,
+        k: int
+    ) -> List[Passage]:
+        """Top-k passages for query among (lecture_id, transcript), embedding stale lectures first."""
+        await self.ensure_indexed(db, lectures)
+        index = await self.load(db, scope_key, [lecture_id for lecture_id, _ in lectures])
+        if not index.passages:
+            return []
+        query_vector = (await self.embed([query], Priority.interactive))[0]
+        return index.search(query_vector, k)
+
+
+embedding_index = EmbeddingIndex(settings.embedding_index_cache_size)
@@ -1,29 +1,34 @@
+import asyncio
 import json
-from openai import AsyncOpenAI
+import re
+from functools import lru_cache
 from app.config import settings
-from typing import Literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from typing import AsyncIterator, Dict, List, Literal, Optional, Sequence, Set, Tuple, Union
+from app.database import AsyncSessionLocal
+from app.services.material_cache import material_cache, hash_text, CacheKey
+from app.services.json_stream import JSONArrayStreamParser
+from app.services.llm import llm_client, Priority
+from app.services.token_budget import (
+    BudgetedText, count_tokens, chunk_text, fit_text, input_budget, report_usage
+)
+from app.metrics import track_call
+from app.tracing import create_detached_task
 
-client = AsyncOpenAI(api_key=settings.openai_api_key)
+SYSTEM_PROMPT = "You are an expert educational content creator."
+TEMPERATURE = 0.7
+MAX_TOKENS = 2000
 
-
-class GenerationService:
-    async def generate_study_material(
-        self,
-        transcript: str,
-        material_type: Literal["notes", "flashcards", "quiz"]
-    ) -> str:
-        """
-        Generate study materials from a transcript using GPT-4.
-        """
-        prompts = {
-            "notes": """Create comprehensive study notes from this lecture transcript.
+PROMPTS = {
+    "notes": """Create comprehensive study notes from this lecture transcript.
 Format as markdown with clear headings, key concepts, and summaries.
 Include important details and organize information logically.
 
 Transcript:
 {transcript}
 """,
-            "flashcards": """Create flashcard pairs from this lecture transcript.
+    "flashcards": """Create flashcard pairs from this lecture transcript.
 Return a JSON array of objects with "question" and "answer" fields.
 Focus on key concepts and important information.
 Create 10-15 flashcards.
@@ -33,7 +38,7 @@ Format: [{{"question": "...", "answer": "..."}}, ...]
 Transcript:
 {transcript}
 """,
-            "quiz": """Create a multiple-choice quiz from this lecture transcript.
+    "quiz": """Create a multiple-choice quiz from this lecture transcript.
 Return a JSON array of objects with:
 - "question": the question text
 - "options": array of 4 possible answers
@@ -46,20 +51,250 @@ Format: [{{"question": "...", "options": ["A", "B", "C", "D"], "correct": 0}}, .
 Transcript:
 {transcript}
 """
-        }
+}
+
+# Single-pass generation: several types from one structured response
+COMBINED_PROMPT = """Create study materials from this lecture transcript.
+Return ONLY a JSON object with exactly these keys: {keys}. No other text.
+{sections}
+
+Transcript:
+{transcript}
+"""
+COMBINED_SECTIONS = {
+    "notes": '- "notes": comprehensive study notes as one markdown string, with clear headings, key concepts, and summaries, organized logically.',
+    "flashcards": '- "flashcards": an array of 10-15 objects with "question" and "answer" fields covering key concepts.',
+    "quiz": '- "quiz": an array of 8-10 multiple-choice questions, each an object with "question", "options" (array of 4 possible answers) and "correct" (index 0-3 of the correct answer).',
+}
+
+# Map step for folder generation: one condensed summary per lecture
+SUMMARY_TYPE = "lecture_summary"
+SUMMARY_MAX_TOKENS = 1200
+SUMMARY_PROMPT = """Condense this lecture transcript into detailed study notes.
+Keep every key concept, definition, formula, example and conclusion, in the order they were covered.
+Write plain markdown. These notes will later be combined with notes from other lectures.
+
+Transcript:
+{transcript}
+"""
+
+# Separator between lecture summaries in the reduce step
+SUMMARY_SEPARATOR = "\n\n---\n\n"
+
+FORMAT_ERROR_CONTENT = json.dumps([{"error": "Failed to generate valid format"}])
+
+
+def clean_flashcard(item) -> Optional[Dict]:
+    """Each flashcard should have question + answer."""
+    if (
+        isinstance(item, dict)
+        and isinstance(item.get("question"), str)
+        and isinstance(item.get("answer"), str)
+    ):
+        return {"question": item["question"], "answer": item["answer"]}
+    return None
+
+
+def clean_quiz_question(item) -> Optional[Dict]:
+    """Each question should have question, options (list), and optional correct index."""
+    if not isinstance(item, dict):
+        return None
+    question = item.get("question")
+    options = item.get("options")
+    correct = item.get("correct")
+    if not isinstance(question, str) or not isinstance(options, list):
+        return None
+    return {
+        "question": question,
+        "options": options,
+        "correct": correct if isinstance(correct, int) else None,
+    }
+
+
+ITEM_CLEANERS = {
+    "flashcards": clean_flashcard,
+    "quiz": clean_quiz_question,
+}
+
+
+def clean_material(material_type: str, value) -> Optional[str]:
+    """Stored content for one material type, or None if the model output is unusable."""
+    if material_type == "notes":
+        return value.strip() if isinstance(value, str) and value.strip() else None
+    if not isinstance(value, list):
+        return None
+    # Very lightweight schema validation to keep the frontend logic robust
+    clean_item = ITEM_CLEANERS[material_type]
+    cleaned = [c for c in (clean_item(item) for item in value) if c]
+    return json.dumps(cleaned) if cleaned else None
+
+
+def parse_json_object(content: str) -> Optional[Dict]:
+    """The JSON object in a model reply, tolerating code fences or stray text around it."""
+    content = re.sub(r"^```(?:json)?\s*|\s*```$", "", content.strip())
+    start, end = content.find("{"), content.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(content[start:end + 1])
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def combined_prompt(material_types: Sequence[str], transcript: str) -> str:
+    return COMBINED_PROMPT.format(
+        keys=", ".join(f'"{t}"' for t in material_types),
+        sections="\n".join(COMBINED_SECTIONS[t] for t in material_types),
+        transcript=transcript
+    )
+
+
+def prompt_version(material_type: str) -> str:
+    """Short hash of everything that shapes the output for a material type."""
+    if material_type == SUMMARY_TYPE:
+        spec = json.dumps([SUMMARY_PROMPT, SYSTEM_PROMPT, TEMPERATURE, SUMMARY_MAX_TOKENS])
+    else:
+        # Either prompt may have produced the cached content
+        spec = json.dumps([
+            PROMPTS[material_type], SYSTEM_PROMPT, TEMPERATURE, MAX_TOKENS,
+            COMBINED_PROMPT, COMBINED_SECTIONS[material_type]
+        ])
+    return hash_text(spec)[:12]
+
+
+def cache_key(text: str, material_type: str) -> CacheKey:
+    return (hash_text(text), material_type, prompt_version(material_type), settings.generation_model)
+
+
+@lru_cache(maxsize=None)
+def material_budget(material_type: str) -> int:
+    """Transcript tokens that fit in the prompt for a material type."""
+    if material_type == SUMMARY_TYPE:
+        return input_budget(settings.generation_model, SUMMARY_MAX_TOKENS, SYSTEM_PROMPT, SUMMARY_PROMPT)
+    return input_budget(settings.generation_model, MAX_TOKENS, SYSTEM_PROMPT, PROMPTS[material_type])
+
+
+def combined_max_tokens(material_types: Sequence[str]) -> int:
+    """Output tokens for a combined response: what each type gets on its own."""
+    return MAX_TOKENS * len(material_types)
+
+
+@lru_cache(maxsize=None)
+def combined_budget(material_types: Tuple[str, ...]) -> int:
+    """Transcript tokens that fit in a combined prompt for these types."""
+    return input_budget(
+        settings.generation_model,
+        combined_max_tokens(material_types),
+        SYSTEM_PROMPT,
+        combined_prompt(material_types, "")
+    )
+
+
+class StreamBroadcast:
+    """Pieces of a streaming generation, kept so late followers can catch up."""
+    
+    def __init__(self):
+        self.pieces: List[Union[str, Dict]] = []
+        self.finished = False
+        self._changed: Optional[asyncio.Future] = None
+    
+    def publish(self, piece: Union[str, Dict]):
+        self.pieces.append(piece)
+        self._notify()
+    
+    def close(self):
+        self.finished = True
+        self._notify()
+    
+    def _notify(self):
+        if self._changed is not None and not self._changed.done():
+            self._changed.set_result(None)
+        self._changed = None
+    
+    async def wait(self):
+        """Return once a piece is published or the stream ends."""
+        if self._changed is None:
+            self._changed = asyncio.get_running_loop().create_future()
+        # Shielded: one follower leaving must not wake the others with an error
+        await asyncio.shield(self._changed)
+
+
+class GenerationService:
+    def __init__(self):
+        # Generations running now, so identical requests share one model call
+        self._inflight: Dict[CacheKey, asyncio.Task] = {}
+        # Callers awaiting each shared task; the last one to leave cancels it
+        self._waiters: Dict[asyncio.Task, int] = {}
+        # Broadcasts of streaming generations, so /generate/stream requests share them
+        self._broadcasts: Dict[asyncio.Task, StreamBroadcast] = {}
+        self._background: Set[asyncio.Task] = set()
+    
+    async def measure_input(self, text: str, material_type: str) -> BudgetedText:
+        """Token count of an input against the prompt budget for a material type."""
+        return await self._measure(text, material_budget(material_type))
+    
+    async def _measure(self, text: str, budget: int) -> BudgetedText:
+        tokens = await run_in_threadpool(count_tokens, text, settings.generation_model)
+        return BudgetedText(text=text, tokens=tokens, original_tokens=tokens, budget=budget)
+    
+    async def fit_input(
+        self,
+        text: str,
+        material_type: Literal["notes", "flashcards", "quiz"],
+        priority: Priority = Priority.default
+    ) -> BudgetedText:
+        """
+        Make an input fit the prompt for a material type. Oversize input is
+        condensed with the summary prompt, chunk by chunk, and trimmed on
+        sentence boundaries if it is still too long.
+        """
+        return await self._fit(text, material_budget(material_type), "generate_study_material", priority)
+    
+    async def _fit(self, text: str, budget: int, operation: str, priority: Priority) -> BudgetedText:
+        measured = await self._measure(text, budget)
+        if not measured.over_budget:
+            report_usage(operation, measured)
+            return measured
         
-        prompt = prompts[material_type].format(transcript=transcript)
+        condensed = await self.summarize_lecture(text, priority)
+        fitted = await run_in_threadpool(fit_text, condensed, budget, settings.generation_model)
+        fitted.original_tokens = measured.original_tokens
+        report_usage(operation, fitted)
+        return fitted
+    
+    async def generate_study_material(
+        self,
+        transcript: str,
+        material_type: Literal["notes", "flashcards", "quiz"],
+        priority: Priority = Priority.default
+    ) -> str:
+        """
+        Generate study materials from a transcript using GPT-4.
+        """
+        fitted = await self.fit_input(transcript, material_type, priority)
+        return await self._complete(fitted.text, material_type, priority)
+    
+    async def _complete(
+        self,
+        transcript: str,
+        material_type: Literal["notes", "flashcards", "quiz"],
+        priority: Priority
+    ) -> str:
+        prompt = PROMPTS[material_type].format(transcript=transcript)
         
         try:
-            response = await client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are an expert educational content creator."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=2000
-            )
+            async with track_call("generate_study_material"):
+                response = await llm_client.chat(
+                    priority=priority,
+                    model=settings.generation_model,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=TEMPERATURE,
+                    max_tokens=MAX_TOKENS
+                )
             
             content = response.choices[0].message.content.strip()
             
@@ -67,65 +302,401 @@ Transcript:
             if material_type in ["flashcards", "quiz"]:
                 try:
                     data = json.loads(content)
-                    if not isinstance(data, list):
-                        raise ValueError("Expected a list of items")
-
-                    # Very lightweight schema validation to keep the frontend logic robust
-                    if material_type == "flashcards":
-                        # Each item should have question + answer
-                        cleaned = []
-                        for item in data:
-                            if (
-                                isinstance(item, dict)
-                                and isinstance(item.get("question"), str)
-                                and isinstance(item.get("answer"), str)
-                            ):
-                                cleaned.append(
-                                    {
-                                        "question": item["question"],
-                                        "answer": item["answer"],
-                                    }
-                                )
-                        if not cleaned:
-                            raise ValueError("No valid flashcards in response")
-                        content = json.dumps(cleaned)
-
-                    elif material_type == "quiz":
-                        # Each item should have question, options (list), and optional correct index
-                        cleaned = []
-                        for item in data:
-                            if not isinstance(item, dict):
-                                continue
-                            question = item.get("question")
-                            options = item.get("options")
-                            correct = item.get("correct")
-                            if not isinstance(question, str) or not isinstance(
-                                options, list
-                            ):
-                                continue
-                            cleaned.append(
-                                {
-                                    "question": question,
-                                    "options": options,
-                                    "correct": correct
-                                    if isinstance(correct, int)
-                                    else None,
-                                }
-                            )
-                        if not cleaned:
-                            raise ValueError("No valid quiz questions in response")
-                        content = json.dumps(cleaned)
-
-                except Exception:
-                    # If not valid JSON or wrong structure, wrap it in a simple error object
-                    content = json.dumps([{"error": "Failed to generate valid format"}])
+                except ValueError:
+                    data = None
+                # If not valid JSON or wrong structure, wrap it in a simple error object
+                content = clean_material(material_type, data) or FORMAT_ERROR_CONTENT
             
             return content
         
         except Exception as e:
             print(f"Error generating {material_type}: {e}")
             raise
-
+    
+    async def generate_cached(
+        self,
+        db: AsyncSession,
+        transcript: str,
+        material_type: Literal["notes", "flashcards", "quiz"],
+        priority: Priority = Priority.default
+    ) -> Tuple[str, bool, BudgetedText]:
+        """
+        Return (content, cached, input). Serves from the material cache when
+        the same transcript was generated with the current prompt and model.
+        input carries the token count of the transcript and whether it had
+        to be reduced to fit.
+        """
+        key = cache_key(transcript, material_type)
+        content = await material_cache.get(db, key)
+        if content is not None:
+            return content, True, await self.measure_input(transcript, material_type)
+        
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._track(
+                key, create_detached_task(self._generate_and_store(key, transcript, material_type, priority))
+            )
+        
+        content, fitted = await self.attach(task)
+        return content, False, fitted
+    
+    async def attach(self, task: asyncio.Task):
+        """
+        Await a shared generation. It is shielded, so a caller going away
+        doesn't cancel work others are waiting on; once the last waiter is
+        cancelled the generation is cancelled too, so abandoned work stops
+        using quota.
+        
+        The generation keeps the priority it was started with: a user who
+        attaches to a background pre-generation waits at background
+        priority rather than paying for a second call.
+        """
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1:
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+    
+    def _track(self, key: CacheKey, task: asyncio.Task) -> asyncio.Task:
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._finish_inflight(key, t))
+        return task
+    
+    def _finish_inflight(self, key: CacheKey, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every waiter left
+    
+    async def _generate_and_store(
+        self,
+        key: CacheKey,
+        transcript: str,
+        material_type: Literal["notes", "flashcards", "quiz"],
+        priority: Priority
+    ) -> Tuple[str, BudgetedText]:
+        fitted = await self.fit_input(transcript, material_type, priority)
+        content = await self._complete(fitted.text, material_type, priority)
+        if content != FORMAT_ERROR_CONTENT:
+            # Outlives the request that started it, so it uses its own session
+            async with AsyncSessionLocal() as db:
+                await material_cache.set(db, key, content)
+        return content, fitted
+    
+    async def generate_combined_cached(
+        self,
+        db: AsyncSession,
+        transcript: str,
+        material_types: List[Literal["notes", "flashcards", "quiz"]],
+        priority: Priority = Priority.default
+    ) -> Tuple[Dict[str, Tuple[str, bool]], BudgetedText]:
+        """
+        Generate several material types with one model call. Cached types
+        are served from the cache and types already being generated are
+        awaited; the rest are requested together as one JSON object, then
+        split and validated per type. A transcript too long for the combined
+        prompt gets one call per type instead, so the cached materials are
+        the same as /generate would produce. Returns ({type: (content, cached)}, input).
+        """
+        types = list(dict.fromkeys(material_types))
+        keys = {t: cache_key(transcript, t) for t in types}
+        
+        results: Dict[str, Tuple[str, bool]] = {}
+        for t in types:
+            content = await material_cache.get(db, keys[t])
+            if content is not None:
+                results[t] = (content, True)
+        missing = [t for t in types if t not in results]
+        if not missing:
+            return results, await self._measure(transcript, combined_budget(tuple(types)))
+        
+        tokens = await run_in_threadpool(count_tokens, transcript, settings.generation_model)
+        to_start = [t for t in missing if keys[t] not in self._inflight]
+        own: Optional[asyncio.Task] = None  # the call this request started, if any
+        if len(to_start) > 1 and tokens <= combined_budget(tuple(to_start)):
+            own = create_detached_task(
+                self._generate_combined_and_store(transcript, tuple(to_start), keys, priority)
+            )
+            # Register each type so single-type requests attach to the combined call
+            for t in to_start:
+                self._track(keys[t], create_detached_task(self._pick(own, t)))
+        else:
+            # A combined prompt leaves less room for the transcript; rather than
+            # condense a long one harder than /generate would (and cache that),
+            # give each type a call of its own
+            for t in to_start:
+                task = self._track(
+                    keys[t], create_detached_task(self._generate_and_store(keys[t], transcript, t, priority))
+                )
+                own = own or task
+        
+        tasks = [self._inflight[keys[t]] for t in missing]
+        outcomes = await asyncio.gather(*(self.attach(task) for task in tasks))
+        for t, (content, _) in zip(missing, outcomes):
+            results[t] = (content, False)
+        if own is not None:
+            # Everything attached to it has finished, so it has too
+            fitted = own.result()[1]
+        else:
+            fitted = await self._measure(transcript, combined_budget(tuple(types)))
+        return {t: results[t] for t in types}, fitted
+    
+    async def _pick(self, combined: asyncio.Task, material_type: str) -> Tuple[str, BudgetedText]:
+        # Each type attaches separately; the combined call stops once none is wanted
+        contents, fitted = await self.attach(combined)
+        return contents[material_type], fitted
+    
+    async def _generate_combined_and_store(
+        self,
+        transcript: str,
+        material_types: Tuple[str, ...],
+        keys: Dict[str, CacheKey],
+        priority: Priority
+    ) -> Tuple[Dict[str, str], BudgetedText]:
+        fitted = await self._fit(transcript, combined_budget(material_types), "generate_combined", priority)
+        
+        async with track_call("generate_combined"):
+            response = await llm_client.chat(
+                priority=priority,
+                model=settings.generation_model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": combined_prompt(material_types, fitted.text)}
+                ],
+                temperature=TEMPERATURE,
+                max_tokens=combined_max_tokens(material_types)
+            )
+        data = parse_json_object(response.choices[0].message.content or "") or {}
+        
+        contents: Dict[str, str] = {}
+        async with AsyncSessionLocal() as db:
+            for t in material_types:
+                content = clean_material(t, data.get(t))
+                if content is None:
+                    # Section missing or malformed: give that type a call of its own
+                    print(f"Combined generation returned no valid {t}; generating it separately")
+                    content, _ = await self._generate_and_store(keys[t], transcript, t, priority)
+                else:
+                    await material_cache.set(db, keys[t], content)
+                contents[t] = content
+        return contents, fitted
+    
+    def schedule_pregeneration(self, transcript: Optional[str]):
+        """
+        Generate every material type for a finished transcript at background
+        priority, so the first /generate call is a cache hit (or attaches to
+        the running generation). Types are combined into one call only when
+        the transcript fits the combined prompt, so what is cached matches
+        /generate. Off unless PREGENERATE_MATERIALS is set.
+        """
+        if not settings.pregenerate_materials or not transcript:
+            return
+        task = create_detached_task(self._pregenerate(transcript))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+    
+    async def _pregenerate(self, transcript: str):
+        try:
+            async with AsyncSessionLocal() as db:
+                await self.generate_combined_cached(db, transcript, list(PROMPTS), Priority.background)
+        except Exception as e:
+            print(f"Error pre-generating study materials: {e}")
+    
+    async def summarize_lecture(self, transcript: str, priority: Priority = Priority.default) -> str:
+        """
+        Condense one lecture transcript for the folder map step. Transcripts
+        over the summary prompt budget are summarized chunk by chunk.
+        """
+        chunks = await run_in_threadpool(
+            chunk_text, transcript, material_budget(SUMMARY_TYPE), settings.generation_model
+        )
+        summaries = await asyncio.gather(*(self._summarize_chunk(c, priority) for c in chunks))
+        return "\n\n".join(summaries)
+    
+    async def _summarize_chunk(self, transcript: str, priority: Priority) -> str:
+        async with track_call("summarize_lecture"):
+            response = await llm_client.chat(
+                priority=priority,
+                model=settings.generation_model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": SUMMARY_PROMPT.format(transcript=transcript)}
+                ],
+                temperature=TEMPERATURE,
+                max_tokens=SUMMARY_MAX_TOKENS
+            )
+        return response.choices[0].message.content.strip()
+    
+    async def prepare_folder_input(
+        self,
+        db: AsyncSession,
+        transcripts: List[str],
+        priority: Priority = Priority.default
+    ) -> Tuple[str, bool]:
+        """
+        Map step of folder generation. Each lecture is condensed into a cached
+        summary and the summaries are joined for the reduce step.
+        Returns (reduce_input, all_summaries_cached).
+        """
+        if len(transcripts) == 1:
+            return transcripts[0], True
+        
+        # Cache lookups share the session, so they run sequentially
+        keys = [cache_key(t, SUMMARY_TYPE) for t in transcripts]
+        summaries = [await material_cache.get(db, key) for key in keys]
+        missing = [i for i, summary in enumerate(summaries) if summary is None]
+        
+        semaphore = asyncio.Semaphore(settings.generation_max_concurrency)
+        
+        async def summarize(index: int):
+            async with semaphore:
+                summary = await self.summarize_lecture(transcripts[index], priority)
+            # Cached as soon as it is done, so a failure elsewhere doesn't lose it;
+            # the request session can't be shared between concurrent tasks
+            async with AsyncSessionLocal() as summary_db:
+                await material_cache.set(summary_db, keys[index], summary)
+            summaries[index] = summary
+        
+        results = await asyncio.gather(*(summarize(i) for i in missing), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            print(f"Error summarizing {len(errors)} of {len(missing)} folder lectures: {errors[0]}")
+            raise errors[0]
+        
+        return SUMMARY_SEPARATOR.join(summaries), not missing
+    
+    async def generate_folder_cached(
+        self,
+        db: AsyncSession,
+        transcripts: List[str],
+        material_type: Literal["notes", "flashcards", "quiz"],
+        priority: Priority = Priority.default
+    ) -> Tuple[str, bool, BudgetedText]:
+        """
+        Map-reduce generation over a folder: the material is generated from
+        the per-lecture summaries. Editing or adding one lecture only
+        recomputes its summary and the reduce step.
+        """
+        text, summaries_cached = await self.prepare_folder_input(db, transcripts, priority)
+        content, cached, fitted = await self.generate_cached(db, text, material_type, priority)
+        return content, cached and summaries_cached, fitted
+    
+    def start_stream(
+        self,
+        key: CacheKey,
+        transcript: str,
+        material_type: Literal["notes", "flashcards", "quiz"]
+    ) -> Tuple[asyncio.Task, Optional["StreamBroadcast"]]:
+        """
+        The generation for key and its broadcast, starting a streaming one if
+        none is running. A generation started without streaming (e.g.
+        pre-generation) has no broadcast; attach() to it instead.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            broadcast = StreamBroadcast()
+            task = self._track(key, create_detached_task(
+                self._stream_and_store(key, transcript, material_type, broadcast)
+            ))
+            self._broadcasts[task] = broadcast
+            task.add_done_callback(lambda t: self._broadcasts.pop(t, None))
+        return task, self._broadcasts.get(task)
+    
+    async def follow(self, task: asyncio.Task, broadcast: "StreamBroadcast") -> AsyncIterator[Union[str, Dict]]:
+        """
+        Yield the pieces of a streaming generation, starting with those
+        already sent, then raise its error if it failed. Followers count as
+        waiters, as in attach().
+        """
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            sent = 0
+            while True:
+                while sent < len(broadcast.pieces):
+                    yield broadcast.pieces[sent]
+                    sent += 1
+                if broadcast.finished:
+                    break
+                await broadcast.wait()
+            await asyncio.shield(task)
+        except (asyncio.CancelledError, GeneratorExit):
+            if self._waiters[task] == 1:
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+    
+    async def _stream_and_store(
+        self,
+        key: CacheKey,
+        transcript: str,
+        material_type: Literal["notes", "flashcards", "quiz"],
+        broadcast: "StreamBroadcast"
+    ) -> Tuple[str, BudgetedText]:
+        """
+        Generate with a streaming call, publishing notes text deltas, or
+        each flashcard/quiz item once its JSON object is complete and valid.
+        Returns (content, input) like _generate_and_store; no valid items
+        at all is a FORMAT_ERROR_CONTENT result, which is not cached.
+        """
+        try:
+            fitted = await self.fit_input(transcript, material_type)
+            prompt = PROMPTS[material_type].format(transcript=fitted.text)
+            parts: List[str] = []
+            cleaned: List[Dict] = []
+            parser = JSONArrayStreamParser()
+            clean_item = ITEM_CLEANERS.get(material_type)
+            
+            async with track_call("generate_study_material_stream"):
+                stream = await llm_client.chat(
+                    model=settings.generation_model,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=TEMPERATURE,
+                    max_tokens=MAX_TOKENS,
+                    stream=True
+                )
+                
+                # Closing the stream frees its scheduler slot, also when every follower leaves
+                async with stream:
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if not delta:
+                            continue
+                        
+                        if material_type == "notes":
+                            parts.append(delta)
+                            broadcast.publish(delta)
+                            continue
+                        
+                        for item in parser.feed(delta):
+                            item = clean_item(item)
+                            if item:
+                                cleaned.append(item)
+                                broadcast.publish(item)
+        finally:
+            broadcast.close()
+        
+        if material_type == "notes":
+            content = "".join(parts).strip()
+        else:
+            content = json.dumps(cleaned) if cleaned else FORMAT_ERROR_CONTENT
+        
+        if content and content != FORMAT_ERROR_CONTENT:
+            # Outlives the request that started it, so it uses its own session
+            async with AsyncSessionLocal() as db:
+                await material_cache.set(db, key, content)
+        return content, fitted
 
 generation_service = GenerationService()
 
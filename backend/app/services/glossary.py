@@ -0,0 +1,151 @@
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import select, or_
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.glossary_term import GlossaryTerm
+from app.models.lecture import Lecture
+
+# Longest glossary term, in words, matched against transcript text
+MAX_TERM_WORDS = 4
+LEADING_ARTICLES = ("the ", "a ", "an ")
+
+
+def normalize_term(term: str) -> str:
+    """Case-, punctuation- and plural-insensitive form of a term."""
+    term = re.sub(r"[^\w\s]", " ", term.lower())
+    term = " ".join(term.split())
+    for article in LEADING_ARTICLES:
+        if term.startswith(article):
+            term = term[len(article):]
+    words = term.split(" ")
+    last = words[-1]
+    if len(last) > 3 and last.endswith("s") and not last.endswith("ss"):
+        words[-1] = last[:-1]
+    return " ".join(words)
+
+
+class LectureGlossary:
+    """Terms already explained for one lecture (and its folder)."""
+
+    def __init__(self, lecture_id: str, folder_id: Optional[str]):
+        self.lecture_id = lecture_id
+        self.folder_id = folder_id
+        self.terms: "OrderedDict[str, str]" = OrderedDict()  # normalized -> display term
+
+    def knows(self, term: str) -> bool:
+        return normalize_term(term) in self.terms
+
+    def add(self, term: str):
+        normalized = normalize_term(term)
+        self.terms.pop(normalized, None)
+        self.terms[normalized] = term
+
+    def exclusions(self) -> List[str]:
+        """Most recently explained terms, for the prompt."""
+        return list(self.terms.values())[-settings.glossary_max_exclusions:]
+
+    def filter_new(self, cards: Iterable[Dict]) -> List[Dict]:
+        """Drop cards for known terms (and duplicates within the batch)."""
+        fresh = []
+        for card in cards:
+            if self.knows(card["term"]):
+                continue
+            self.add(card["term"])
+            fresh.append(card)
+        return fresh
+
+
+class GlossaryService:
+    """
+    Glossary of explained terms. Per-lecture/folder term sets drive prompt
+    exclusions and duplicate suppression; a cross-lecture in-memory index
+    serves definitions explained before without another LLM call.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._index: "OrderedDict[str, Dict]" = OrderedDict()
+        self._loaded = False
+
+    def _remember(self, normalized: str, card: Dict):
+        self._index[normalized] = card
+        self._index.move_to_end(normalized)
+        while len(self._index) > self.capacity:
+            self._index.popitem(last=False)
+
+    async def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(GlossaryTerm)
+                .order_by(GlossaryTerm.created_at.desc())
+                .limit(self.capacity)
+            )
+            rows = result.scalars().all()
+        for row in reversed(rows):
+            self._remember(row.normalized_term, {
+                "subtype": row.subtype, "term": row.term, "text": row.text
+            })
+
+    async def load(self, lecture_id: str, folder_id: Optional[str]) -> LectureGlossary:
+        """Glossary for a lecture, seeded with terms explained in it or its folder."""
+        await self._ensure_loaded()
+        glossary = LectureGlossary(lecture_id, folder_id)
+
+        async with AsyncSessionLocal() as db:
+            scope = GlossaryTerm.lecture_id == lecture_id
+            if folder_id:
+                scope = or_(scope, Lecture.folder_id == folder_id)
+            result = await db.execute(
+                select(GlossaryTerm.term)
+                .join(Lecture, Lecture.id == GlossaryTerm.lecture_id)
+                .where(scope)
+                .order_by(GlossaryTerm.created_at)
+            )
+            for (term,) in result.all():
+                glossary.add(term)
+
+        return glossary
+
+    def match_cached(self, text: str, glossary: LectureGlossary, limit: int) -> List[Dict]:
+        """Cached cards for terms mentioned in text that this lecture hasn't covered."""
+        words = normalize_term(text).split(" ")
+        cards = []
+        for size in range(MAX_TERM_WORDS, 0, -1):
+            for i in range(len(words) - size + 1):
+                normalized = normalize_term(" ".join(words[i:i + size]))
+                card = self._index.get(normalized)
+                if card and normalized not in glossary.terms:
+                    glossary.add(card["term"])
+                    cards.append(dict(card))
+                    if len(cards) >= limit:
+                        return cards
+        return cards
+
+    async def record(self, lecture_id: str, cards: List[Dict]):
+        """Persist newly explained terms and add them to the shared index."""
+        if not cards:
+            return
+        rows = []
+        for card in cards:
+            normalized = normalize_term(card["term"])
+            self._remember(normalized, {
+                "subtype": card["subtype"], "term": card["term"], "text": card["text"]
+            })
+            rows.append(GlossaryTerm(
+                lecture_id=lecture_id,
+                normalized_term=normalized,
+                term=card["term"],
+                subtype=card["subtype"],
+                text=card["text"]
+            ))
+        async with AsyncSessionLocal() as db:
+            db.add_all(rows)
+            await db.commit()
+
+
+glossary_service = GlossaryService(settings.glossary_cache_size)
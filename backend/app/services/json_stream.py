@@ -0,0 +1,69 @@
+import json
+from typing import Any, List, Optional
+
+
+class JSONArrayStreamParser:
+    """
+    Incremental parser for a streamed top-level JSON array.
+    feed() returns each object/array element as soon as its closing
+    bracket arrives. Text before the opening '[' (e.g. a ```json fence)
+    and scalar elements are ignored.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._current: Optional[List[str]] = None
+
+    def feed(self, text: str) -> List[Any]:
+        items = []
+        for ch in text:
+            if self.done:
+                break
+
+            if not self.started:
+                if ch == "[":
+                    self.started = True
+                continue
+
+            # Between elements of the top-level array
+            if self._depth == 0 and not self._in_string:
+                if ch == "]":
+                    self.done = True
+                elif ch in "{[":
+                    self._depth = 1
+                    self._current = [ch]
+                elif ch == '"':
+                    # Scalar string element: skip it, but respect its quoting
+                    self._in_string = True
+                continue
+
+            if self._current is not None:
+                self._current.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        items.append(json.loads("".join(self._current)))
+                    except ValueError:
+                        pass
+                    self._current = None
+
+        return items
@@ -1,21 +1,15 @@
 import json
-from openai import AsyncOpenAI
-from app.config import settings
-from typing import List, Dict
+from typing import List, Dict, Optional
+from starlette.concurrency import run_in_threadpool
+from app.services.llm import llm_client, Priority
+from app.services.token_budget import fit_text, input_budget, report_usage
+from app.metrics import track_call
 
-client = AsyncOpenAI(api_key=settings.openai_api_key)
+MODEL = "gpt-4"
+MAX_TOKENS = 500
+SYSTEM_PROMPT = "You are a helpful lecture buddy. Always respond with valid JSON only."
 
-
-class LectureBuddyService:
-    async def analyze_transcript_chunk(self, transcript_chunk: str) -> List[Dict]:
-        """
-        Analyze a transcript chunk and return lecture buddy insights.
-        Returns a list of cards with definitions and explanations.
-        """
-        if not transcript_chunk or len(transcript_chunk.strip()) < 50:
-            return []
-        
-        prompt = f"""You are a helpful lecture buddy assisting a student during a lecture.
+PROMPT = """You are a helpful lecture buddy assisting a student during a lecture.
 Analyze this transcript and identify terms or concepts that would benefit from explanation.
 
 For each item, provide:
@@ -25,20 +19,53 @@ For each item, provide:
 
 Return ONLY a JSON array with 2-3 of the most important items. No other text.
 Format: [{{"type": "definition", "term": "example", "text": "explanation here"}}]
-
-Transcript: "{transcript_chunk}"
+{exclusions}
+Transcript: "{transcript}"
 """
+
+
+class LectureBuddyService:
+    async def analyze_transcript_chunk(
+        self,
+        transcript_chunk: str,
+        priority: Priority = Priority.interactive,
+        exclude_terms: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """
+        Analyze a transcript chunk and return lecture buddy insights.
+        Returns a list of cards with definitions and explanations.
+        Terms in exclude_terms were already explained and are skipped.
+        """
+        if not transcript_chunk or len(transcript_chunk.strip()) < 50:
+            return []
         
-        try:
-            response = await client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a helpful lecture buddy. Always respond with valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=500
+        exclusions = ""
+        if exclude_terms:
+            exclusions = (
+                "\nThese terms were already explained; do not include them: "
+                + ", ".join(exclude_terms) + "\n"
             )
+        
+        # Keep the most recent part of a chunk that is over the prompt budget
+        budget = input_budget(
+            MODEL, MAX_TOKENS, SYSTEM_PROMPT, PROMPT.format(exclusions=exclusions, transcript="")
+        )
+        fitted = await run_in_threadpool(fit_text, transcript_chunk, budget, MODEL, "tail")
+        report_usage("analyze_transcript_chunk", fitted)
+        prompt = PROMPT.format(exclusions=exclusions, transcript=fitted.text)
+        
+        try:
+            async with track_call("analyze_transcript_chunk"):
+                response = await llm_client.chat(
+                    priority=priority,
+                    model=MODEL,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.7,
+                    max_tokens=MAX_TOKENS
+                )
             
             content = response.choices[0].message.content.strip()
             
@@ -0,0 +1,136 @@
+import asyncio
+import weakref
+from typing import Awaitable, Callable, Dict, List, Optional
+from app.config import settings
+from app.services.lecture_buddy import lecture_buddy_service
+from app.services.glossary import glossary_service, LectureGlossary
+
+SendEvent = Callable[[Dict], Awaitable[None]]
+
+# The lecture buddy prompt asks for at most this many cards per chunk
+MAX_CARDS_PER_CHUNK = 3
+
+_active_analyzers: "weakref.WeakSet[LiveAnalyzer]" = weakref.WeakSet()
+
+
+def pending_analysis_chunks() -> int:
+    """Chunks waiting for analysis across all live sessions."""
+    return sum(analyzer.pending for analyzer in list(_active_analyzers))
+
+
+class LiveAnalyzer:
+    """
+    Per-session background lecture buddy analysis for the live WebSocket.
+    The receive loop submits transcript chunks without waiting; a single
+    task analyzes them and pushes ai_chunk events. When analysis falls
+    behind, pending chunks are coalesced into one request.
+    
+    Terms already explained in the lecture or its folder are excluded from
+    the prompt and duplicate cards are dropped. Terms explained in other
+    lectures are served from the glossary without calling the model.
+    """
+
+    def __init__(
+        self,
+        send: SendEvent,
+        lecture_id: str,
+        folder_id: Optional[str] = None,
+        max_pending: int = settings.live_analysis_queue_size
+    ):
+        self._send = send
+        self.lecture_id = lecture_id
+        self.folder_id = folder_id
+        self.glossary: Optional[LectureGlossary] = None
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_pending))
+        self._task: Optional[asyncio.Task] = None
+        self.insights: List[Dict] = []
+        _active_analyzers.add(self)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def _drain_pending(self) -> List[str]:
+        chunks = []
+        while not self._queue.empty():
+            chunks.append(self._queue.get_nowait())
+            self._queue.task_done()
+        return chunks
+
+    def submit(self, chunk: str):
+        """Queue a chunk for analysis. Never blocks the caller."""
+        if not chunk:
+            return
+        if self._queue.full():
+            # Fold everything still waiting into a single request
+            chunk = "".join(self._drain_pending() + [chunk])
+        self._queue.put_nowait(chunk)
+
+    async def _analyze(self, chunk: str) -> List[Dict]:
+        if self.glossary is None:
+            try:
+                self.glossary = await glossary_service.load(self.lecture_id, self.folder_id)
+            except Exception as e:
+                print(f"Error loading glossary for lecture {self.lecture_id}: {e}")
+                self.glossary = LectureGlossary(self.lecture_id, self.folder_id)
+
+        cards = glossary_service.match_cached(chunk, self.glossary, MAX_CARDS_PER_CHUNK)
+        if len(cards) < MAX_CARDS_PER_CHUNK:
+            insights = await lecture_buddy_service.analyze_transcript_chunk(
+                chunk, exclude_terms=self.glossary.exclusions()
+            )
+            cards += self.glossary.filter_new(insights)
+
+        try:
+            await glossary_service.record(self.lecture_id, cards)
+        except Exception as e:
+            print(f"Error recording glossary terms: {e}")
+        return cards
+
+    async def _run(self):
+        while True:
+            chunk = await self._queue.get()
+            pending = self._drain_pending()
+            if pending:
+                chunk = "".join([chunk] + pending)
+
+            try:
+                insights = await self._analyze(chunk)
+                self.insights.extend(insights)
+                for insight in insights:
+                    await self._send({
+                        "type": "ai_chunk",
+                        "subtype": insight["subtype"],
+                        "term": insight["term"],
+                        "text": insight["text"]
+                    })
+            except Exception as e:
+                # Socket may be gone; keep the insights for the lecture record
+                print(f"Error delivering live analysis: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def close(self, timeout: Optional[float] = None):
+        """
+        Stop the task. With a timeout, queued analysis gets that long to
+        finish first (the client is still there to receive the cards);
+        without one, queued chunks are dropped and any model call in
+        flight is cancelled.
+        """
+        if not self._task:
+            return
+        if timeout is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                print("Live analysis did not drain in time; dropping pending chunks")
+        self._drain_pending()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,295 @@
+import asyncio
+import enum
+import heapq
+import itertools
+import random
+import time
+from typing import Any, List, Optional, Tuple
+import httpx
+import openai
+from openai import AsyncOpenAI
+from app.config import settings
+from app.metrics import LLM_RETRIES
+from app.tracing import span
+
+
+class Priority(enum.IntEnum):
+    """Scheduling classes; lower values are admitted first."""
+    interactive = 0   # live lecture buddy
+    default = 1       # user-facing requests
+    background = 2    # batch transcription, bulk and pre-generation
+
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+class TokenBucket:
+    """Continuously refilling budget of `capacity` units per minute."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float):
+        """Take units; the level may go negative to settle a reconciliation."""
+        self._refill()
+        self.level -= amount
+
+
+class PriorityScheduler:
+    """
+    Admits LLM calls in priority order, subject to a concurrency limit and
+    to request/token budgets. Only the head of the queue may draw on the
+    buckets, so bulk work never starves interactive calls of budget.
+    """
+
+    def __init__(self, max_concurrency: int, requests_per_minute: int, tokens_per_minute: int):
+        self.free_slots = max_concurrency
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._waiters: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._changed: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _wake(self):
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        self._changed.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def acquire(self, priority: Priority, tokens: float):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._counter), tokens, future))
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as we were cancelled: give the slot back
+                self.release()
+            else:
+                self._wake()
+            raise
+
+    def release(self):
+        self.free_slots += 1
+        self._wake()
+
+    def reconcile(self, estimated: float, actual: float):
+        """Charge (or refund) the difference once real usage is known."""
+        self.tokens.consume(actual - estimated)
+
+    async def _dispatch(self):
+        while self._waiters:
+            self._changed.clear()
+            _, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+
+            delay = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if self.free_slots > 0 and delay == 0:
+                heapq.heappop(self._waiters)
+                self.free_slots -= 1
+                self.requests.consume(1)
+                self.tokens.consume(tokens)
+                future.set_result(None)
+                continue
+
+            # Re-check when budget refills, a slot frees, or a new waiter arrives
+            timeout = delay if self.free_slots > 0 else None
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+def estimate_tokens(messages: Optional[list], max_tokens: Optional[int]) -> float:
+    """Rough token estimate (~4 characters per token) used for budgeting."""
+    chars = sum(len(str(m.get("content", ""))) for m in messages or [])
+    return chars / 4 + (max_tokens or 0)
+
+
+def retry_delay(error: Exception, attempt: int) -> float:
+    """Retry-After when the API sends it, otherwise full-jitter exponential backoff."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), settings.llm_backoff_max)
+            except ValueError:
+                pass
+    ceiling = min(settings.llm_backoff_max, settings.llm_backoff_base * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+class ScheduledStream:
+    """
+    A streaming response that keeps its scheduler slot until the stream is
+    exhausted or closed, then settles the token estimate from the usage
+    reported in the final chunk. Use it with `async with` so an abandoned
+    stream is closed promptly.
+    """
+
+    def __init__(self, stream: Any, scheduler: PriorityScheduler, estimated: float):
+        self._stream = stream
+        self._scheduler = scheduler
+        self._estimated = estimated
+        self._usage: Optional[int] = None
+        self._closed = False
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._stream:
+                usage = getattr(chunk, "usage", None)
+                if usage is not None:
+                    self._usage = usage.total_tokens
+                yield chunk
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self._stream.close()
+        finally:
+            self._scheduler.release()
+            if self._usage is not None:
+                self._scheduler.reconcile(self._estimated, self._usage)
+
+    async def __aenter__(self) -> "ScheduledStream":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class LLMClient:
+    """Shared OpenAI client with pooled connections, rate limiting and retries."""
+
+    def __init__(self):
+        self.client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            max_retries=0,  # retries are handled here
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.llm_max_connections,
+                    max_keepalive_connections=settings.llm_max_connections
+                ),
+                timeout=httpx.Timeout(settings.llm_timeout, connect=10.0)
+            )
+        )
+        self.scheduler = PriorityScheduler(
+            settings.llm_max_concurrency,
+            settings.llm_requests_per_minute,
+            settings.llm_tokens_per_minute
+        )
+
+    async def _call(
+        self, create, priority: Priority, estimated: float, keep_slot: bool = False, **kwargs
+    ) -> Any:
+        """
+        Run create() once admitted, retrying transient errors. With
+        keep_slot the slot stays taken after a successful call and the
+        caller must release it.
+        """
+        attempt = 0
+        while True:
+            with span("llm.queue_wait", priority=priority.name):
+                await self.scheduler.acquire(priority, estimated)
+            try:
+                with span("llm.request", attempt=attempt, model=kwargs.get("model")):
+                    result = await create(**kwargs)
+            except RETRYABLE_ERRORS as e:
+                self.scheduler.release()
+                if attempt >= settings.llm_max_retries:
+                    raise
+                delay = retry_delay(e, attempt)
+                LLM_RETRIES.labels(type(e).__name__).inc()
+                print(f"LLM call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+            except BaseException:
+                self.scheduler.release()
+                raise
+            else:
+                if not keep_slot:
+                    self.scheduler.release()
+                return result
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def chat(self, priority: Priority = Priority.default, **kwargs) -> Any:
+        """
+        chat.completions.create with scheduling and retries. With stream=True
+        this returns a ScheduledStream that holds its slot until consumed.
+        """
+        estimated = estimate_tokens(kwargs.get("messages"), kwargs.get("max_tokens"))
+        if kwargs.get("stream"):
+            # Usage arrives in a final chunk with no choices
+            kwargs.setdefault("stream_options", {"include_usage": True})
+            stream = await self._call(
+                self.client.chat.completions.create, priority, estimated, keep_slot=True, **kwargs
+            )
+            return ScheduledStream(stream, self.scheduler, estimated)
+
+        response = await self._call(
+            self.client.chat.completions.create, priority, estimated, **kwargs
+        )
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.scheduler.reconcile(estimated, usage.total_tokens)
+        return response
+
+    async def embed(self, priority: Priority = Priority.background, **kwargs) -> Any:
+        """embeddings.create with scheduling and retries."""
+        inputs = kwargs.get("input")
+        texts = [inputs] if isinstance(inputs, str) else inputs or []
+        estimated = sum(len(t) for t in texts) / 4
+        response = await self._call(self.client.embeddings.create, priority, estimated, **kwargs)
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.scheduler.reconcile(estimated, usage.total_tokens)
+        return response
+
+    async def transcribe(self, priority: Priority = Priority.background, **kwargs) -> Any:
+        """audio.transcriptions.create with scheduling and retries."""
+        audio_file = kwargs.get("file")
+
+        async def create(**call_kwargs):
+            # Rewind so a retried upload sends the whole file again
+            if hasattr(audio_file, "seek"):
+                audio_file.seek(0)
+            return await self.client.audio.transcriptions.create(**call_kwargs)
+
+        return await self._call(create, priority, 0, **kwargs)
+
+
+llm_client = LLMClient()
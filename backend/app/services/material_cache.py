@@ -0,0 +1,71 @@
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.generated_material import GeneratedMaterial
+
+CacheKey = Tuple[str, str, str, str]
+
+
+def hash_text(text: str) -> str:
+    """Content hash used to key cached materials."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class MaterialCache:
+    """
+    Two-tier cache of generated study materials: an in-memory LRU in front
+    of the generated_materials table. Keys include the transcript hash and
+    prompt version, so edited transcripts or prompts simply miss.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._lru: "OrderedDict[CacheKey, str]" = OrderedDict()
+
+    def _remember(self, key: CacheKey, content: str):
+        self._lru[key] = content
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    async def get(self, db: AsyncSession, key: CacheKey) -> Optional[str]:
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            return self._lru[key]
+
+        content_hash, material_type, prompt_version, model = key
+        result = await db.execute(
+            select(GeneratedMaterial.content).where(
+                GeneratedMaterial.content_hash == content_hash,
+                GeneratedMaterial.material_type == material_type,
+                GeneratedMaterial.prompt_version == prompt_version,
+                GeneratedMaterial.model == model
+            )
+        )
+        content = result.scalar_one_or_none()
+        if content is not None:
+            self._remember(key, content)
+        return content
+
+    async def set(self, db: AsyncSession, key: CacheKey, content: str):
+        content_hash, material_type, prompt_version, model = key
+        self._remember(key, content)
+        db.add(GeneratedMaterial(
+            content_hash=content_hash,
+            material_type=material_type,
+            prompt_version=prompt_version,
+            model=model,
+            content=content
+        ))
+        try:
+            await db.commit()
+        except IntegrityError:
+            # A concurrent request stored the same material first
+            await db.rollback()
+
+
+material_cache = MaterialCache(settings.material_cache_size)
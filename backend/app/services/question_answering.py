@@ -0,0 +1,77 @@
+from typing import Dict, List, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.services.embedding_index import embedding_index, Passage
+from app.services.llm import llm_client, Priority
+from app.services.token_budget import input_budget
+from app.metrics import track_call
+
+MAX_TOKENS = 600
+TEMPERATURE = 0.2
+SYSTEM_PROMPT = "You are a helpful teaching assistant that answers questions about lectures."
+
+PROMPT = """Answer the student's question using only the lecture excerpts below.
+Cite the excerpts you used by number, like [1]. If the excerpts do not contain
+the answer, say so briefly instead of guessing.
+
+Excerpts:
+{passages}
+
+Question: {question}
+"""
+
+
+def format_passages(passages: List[Passage], titles: Dict[str, str]) -> str:
+    return "\n\n".join(
+        f"[{i}] ({titles.get(p.lecture_id, 'Lecture')}) {p.text}"
+        for i, p in enumerate(passages, start=1)
+    )
+
+
+class QuestionAnsweringService:
+    async def answer(
+        self,
+        db: AsyncSession,
+        question: str,
+        scope_key: str,
+        lectures: List[Tuple[str, str, str]],
+        top_k: int = settings.qa_top_k
+    ) -> Tuple[str, List[Passage]]:
+        """
+        Answer a question from the passages most similar to it among
+        (lecture_id, title, transcript). Only those passages are sent to
+        the model. Returns (answer, passages_used).
+        """
+        # Never send more passages than fit next to the prompt and answer
+        budget = input_budget(settings.generation_model, MAX_TOKENS, SYSTEM_PROMPT, PROMPT, question)
+        k = max(1, min(top_k, budget // (settings.embedding_chunk_tokens + 16)))
+
+        passages = await embedding_index.search(
+            db, scope_key, [(lecture_id, transcript) for lecture_id, _, transcript in lectures], question, k
+        )
+        if not passages:
+            return "These lectures have no transcript to answer from yet.", []
+
+        titles = {lecture_id: title for lecture_id, title, _ in lectures}
+        prompt = PROMPT.format(passages=format_passages(passages, titles), question=question)
+
+        try:
+            async with track_call("answer_question"):
+                response = await llm_client.chat(
+                    priority=Priority.interactive,
+                    model=settings.generation_model,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=TEMPERATURE,
+                    max_tokens=MAX_TOKENS
+                )
+        except Exception as e:
+            print(f"Error answering question: {e}")
+            raise
+
+        return (response.choices[0].message.content or "").strip(), passages
+
+
+qa_service = QuestionAnsweringService()
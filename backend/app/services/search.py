@@ -0,0 +1,148 @@
+import html
+import re
+from typing import Dict, List, Optional
+from sqlalchemy import text, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncConnection
+from app.database import engine
+from app.models.lecture import Lecture
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+# The snippet functions wrap matches in these private-use characters; they
+# become tags only after the transcript text around them is HTML-escaped
+MARK_START = "\ue000"
+MARK_END = "\ue001"
+
+# Postgres: expression GIN index, kept current by the database on every write
+PG_DOCUMENT = "to_tsvector('english', coalesce(l.title, '') || ' ' || coalesce(l.transcript, ''))"
+PG_INDEX = """
+CREATE INDEX IF NOT EXISTS ix_lectures_fulltext ON lectures USING GIN (
+    to_tsvector('english', coalesce(title, '') || ' ' || coalesce(transcript, ''))
+)
+"""
+
+# SQLite: FTS5 table maintained explicitly through index_lecture/remove_lecture
+SQLITE_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS lecture_fts USING fts5(
+    lecture_id UNINDEXED, title, transcript, tokenize = 'porter unicode61'
+)
+"""
+
+SQLITE_BACKFILL = """
+INSERT INTO lecture_fts (lecture_id, title, transcript)
+SELECT id, coalesce(title, ''), coalesce(transcript, '') FROM lectures
+"""
+
+
+def render_snippet(snippet: Optional[str]) -> Optional[str]:
+    """HTML-escape a snippet, then turn the match markers into <mark> tags."""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(MARK_START, HIGHLIGHT_START).replace(MARK_END, HIGHLIGHT_END)
+
+
+def _fts5_query(query: str) -> str:
+    """Turn free text into a safe FTS5 query: every word must match."""
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{w}"' for w in words)
+
+
+class SearchService:
+    """Full-text search over lecture titles and transcripts."""
+
+    def __init__(self, dialect: str):
+        self.dialect = dialect
+
+    async def init(self, conn: AsyncConnection):
+        """Create the inverted index for the current database."""
+        if self.dialect == "postgresql":
+            await conn.execute(text(PG_INDEX))
+        elif self.dialect == "sqlite":
+            existing = await conn.scalar(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'lecture_fts'")
+            )
+            await conn.execute(text(SQLITE_TABLE))
+            if not existing:
+                # Index the lectures created before search existed
+                await conn.execute(text(SQLITE_BACKFILL))
+
+    async def index_lecture(self, db: AsyncSession, lecture: Lecture):
+        """
+        Update the index entry for a lecture. Runs in the caller's
+        transaction; Postgres maintains its index itself.
+        """
+        if self.dialect != "sqlite":
+            return
+        await self.remove_lecture(db, lecture.id)
+        await db.execute(
+            text("INSERT INTO lecture_fts (lecture_id, title, transcript) VALUES (:id, :title, :transcript)"),
+            {"id": lecture.id, "title": lecture.title or "", "transcript": lecture.transcript or ""}
+        )
+
+    async def remove_lecture(self, db: AsyncSession, lecture_id: str):
+        if self.dialect != "sqlite":
+            return
+        await db.execute(text("DELETE FROM lecture_fts WHERE lecture_id = :id"), {"id": lecture_id})
+
+    async def remove_lectures(self, db: AsyncSession, lecture_ids: List[str]):
+        if self.dialect != "sqlite" or not lecture_ids:
+            return
+        await db.execute(
+            text("DELETE FROM lecture_fts WHERE lecture_id IN :ids").bindparams(
+                bindparam("ids", expanding=True)
+            ),
+            {"ids": list(lecture_ids)}
+        )
+
+    async def search(
+        self,
+        db: AsyncSession,
+        query: str,
+        folder_id: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> List[Dict]:
+        """
+        Return ranked hits with a highlighted transcript snippet. Snippets
+        are HTML: the transcript text is escaped and matches are wrapped
+        in <mark> tags.
+        """
+        params = {"q": query, "folder_id": folder_id, "limit": limit, "offset": offset}
+        folder_filter = "AND l.folder_id = :folder_id" if folder_id else ""
+
+        if self.dialect == "postgresql":
+            sql = f"""
+                SELECT l.id, l.title, l.folder_id, l.created_at,
+                       ts_rank({PG_DOCUMENT}, q) AS rank,
+                       ts_headline('english', coalesce(l.transcript, l.title), q,
+                                   'StartSel={MARK_START}, StopSel={MARK_END}, MaxFragments=2, MaxWords=25, MinWords=8') AS snippet
+                FROM lectures l, websearch_to_tsquery('english', :q) q
+                WHERE {PG_DOCUMENT} @@ q {folder_filter}
+                ORDER BY rank DESC, l.created_at DESC
+                LIMIT :limit OFFSET :offset
+            """
+        elif self.dialect == "sqlite":
+            params["q"] = _fts5_query(query)
+            if not params["q"]:
+                return []
+            sql = f"""
+                SELECT l.id, l.title, l.folder_id, l.created_at,
+                       -bm25(lecture_fts) AS rank,
+                       snippet(lecture_fts, 2, '{MARK_START}', '{MARK_END}', '…', 24) AS snippet
+                FROM lecture_fts
+                JOIN lectures l ON l.id = lecture_fts.lecture_id
+                WHERE lecture_fts MATCH :q {folder_filter}
+                ORDER BY rank DESC
+                LIMIT :limit OFFSET :offset
+            """
+        else:
+            raise RuntimeError(f"Full-text search is not supported on {self.dialect}")
+
+        result = await db.execute(text(sql), params)
+        return [
+            {**row, "snippet": render_snippet(row["snippet"])}
+            for row in result.mappings().all()
+        ]
+
+
+search_service = SearchService(engine.dialect.name)
@@ -1,28 +1,186 @@
+import asyncio
+import hashlib
 import os
+import time
 import uuid
+import weakref
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from pathlib import Path
+from typing import AsyncIterator, Iterable, List, Optional
 from fastapi import UploadFile
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.lecture import Lecture
+from app.metrics import UPLOAD_BYTES, UPLOAD_SECONDS, UPLOAD_THROUGHPUT
+from app.tracing import span
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured maximum size."""
+
+
+@dataclass
+class SavedAudio:
+    content_hash: str
+    size: int
+    extension: str
+    tmp_path: str
+    path: Optional[str] = None  # set by publish()
 
 
 class StorageService:
     def __init__(self):
         self.upload_dir = Path(settings.upload_dir)
         self.upload_dir.mkdir(parents=True, exist_ok=True)
+        self.derived_dir = self.upload_dir / "derived"
+        self.derived_dir.mkdir(exist_ok=True)
+        self.chunk_size = settings.upload_chunk_size
+        self.max_upload_bytes = settings.max_upload_bytes
+        # One lock per content hash, held while a blob is reused or deleted
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+    
+    def blob_lock(self, content_hash: str) -> asyncio.Lock:
+        lock = self._locks.get(content_hash)
+        if lock is None:
+            lock = self._locks[content_hash] = asyncio.Lock()
+        return lock
+    
+    def _hash_of(self, audio_path: str) -> str:
+        # Originals are <hash><ext> and derived variants <hash>.<variant><ext>
+        return Path(audio_path).name.split(".")[0]
     
-    async def save_audio_file(self, file: UploadFile) -> str:
-        """Save uploaded audio file and return the file path."""
-        # Generate unique filename
+    async def save_audio_file(self, file: UploadFile) -> SavedAudio:
+        with span("storage.save_audio_file", filename=file.filename):
+            return await self._save_audio_file(file)
+    
+    async def _save_audio_file(self, file: UploadFile) -> SavedAudio:
+        """
+        Stream an uploaded audio file to disk in fixed-size chunks.
+        The content is hashed while it is copied and the upload is rejected
+        once it grows past max_upload_bytes. Disk writes run off the event loop.
+        
+        The upload is left in a temporary file; publish() moves it into
+        place as a content-addressed blob.
+        """
         file_ext = Path(file.filename).suffix if file.filename else ".wav"
-        unique_filename = f"{uuid.uuid4()}{file_ext}"
-        file_path = self.upload_dir / unique_filename
+        tmp_path = self.upload_dir / f"{uuid.uuid4()}.part"
         
-        # Save file
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        hasher = hashlib.sha256()
+        size = 0
+        start = time.perf_counter()
+        f = await run_in_threadpool(open, tmp_path, "wb")
+        try:
+            while True:
+                chunk = await file.read(self.chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > self.max_upload_bytes:
+                    raise UploadTooLargeError(
+                        f"Upload exceeds maximum size of {self.max_upload_bytes} bytes"
+                    )
+                hasher.update(chunk)
+                await run_in_threadpool(f.write, chunk)
+            await run_in_threadpool(f.close)
+        except BaseException:
+            f.close()
+            self.delete_audio_file(str(tmp_path))
+            raise
         
-        return str(file_path)
+        elapsed = time.perf_counter() - start
+        UPLOAD_BYTES.inc(size)
+        UPLOAD_SECONDS.observe(elapsed)
+        if elapsed > 0:
+            UPLOAD_THROUGHPUT.observe(size / elapsed)
+        
+        return SavedAudio(
+            content_hash=hasher.hexdigest(), size=size, extension=file_ext, tmp_path=str(tmp_path)
+        )
+    
+    @asynccontextmanager
+    async def publish(self, saved: SavedAudio) -> AsyncIterator[str]:
+        """
+        Move a saved upload into place and yield its blob path. Audio is
+        content-addressed: the blob is stored as <sha256><ext> and an upload
+        whose content is already on disk reuses the existing copy.
+        
+        The caller commits the lecture that references the blob inside the
+        block. The blob's lock is held until then, so a concurrent
+        release_blob can't delete a blob that is being reused.
+        """
+        async with self.blob_lock(saved.content_hash):
+            existing = self.find_blob(saved.content_hash)
+            if existing:
+                # Duplicate upload: keep the copy we already have
+                await run_in_threadpool(self.delete_audio_file, saved.tmp_path)
+                saved.path = str(existing)
+            else:
+                file_path = self.upload_dir / f"{saved.content_hash}{saved.extension}"
+                await run_in_threadpool(os.replace, saved.tmp_path, file_path)
+                saved.path = str(file_path)
+            yield saved.path
+    
+    def find_blob(self, content_hash: str) -> Optional[Path]:
+        """Return the stored blob for a content hash, if any."""
+        for path in self.upload_dir.glob(f"{content_hash}*"):
+            if path.suffix != ".part":
+                return path
+        return None
+    
+    def derived_path(self, content_hash: str, suffix: str) -> Path:
+        """Path of a variant derived from the blob with this content hash."""
+        return self.derived_dir / f"{content_hash}{suffix}"
+    
+    async def unreferenced_blobs(self, db: AsyncSession, audio_paths: Iterable[str]) -> List[str]:
+        """The given blobs that no lecture references any more."""
+        paths = set(audio_paths) - {None}
+        if not paths:
+            return []
+        result = await db.execute(
+            select(Lecture.audio_path, Lecture.compact_audio_path).where(or_(
+                Lecture.audio_path.in_(paths),
+                Lecture.compact_audio_path.in_(paths)
+            ))
+        )
+        referenced = {path for row in result.all() for path in row}
+        return sorted(paths - referenced)
+    
+    async def release_blob(self, db: AsyncSession, audio_path: str):
+        """
+        Delete a stored audio blob if no lecture references it any more.
+        The check and the delete happen under the blob's lock (see publish).
+        """
+        async with self.blob_lock(self._hash_of(audio_path)):
+            for path in await self.unreferenced_blobs(db, [audio_path]):
+                await run_in_threadpool(self.delete_blob, path)
+    
+    async def release_blobs(self, audio_paths: Iterable[str]):
+        """release_blob for several blobs in a session of its own, e.g. after a response."""
+        async with AsyncSessionLocal() as db:
+            for audio_path in set(audio_paths) - {None}:
+                await self.release_blob(db, audio_path)
+                # End the read transaction so the next check sees fresh data
+                await db.rollback()
+    
+    def delete_blob(self, audio_path: str):
+        """Delete an audio blob, and its pipeline sidecar for derived variants."""
+        self.delete_audio_file(audio_path)
+        if Path(audio_path).parent == self.derived_dir:
+            self.delete_audio_file(str(Path(audio_path).with_suffix(".json")))
+    
+    async def retire_original(self, db: AsyncSession, lecture: Lecture):
+        """Serve the compact variant from now on and drop the original upload."""
+        if not lecture.compact_audio_path or lecture.audio_path == lecture.compact_audio_path:
+            return
+        original = lecture.audio_path
+        lecture.audio_path = lecture.compact_audio_path
+        await db.commit()
+        if original:
+            await self.release_blob(db, original)
     
     def delete_audio_file(self, file_path: str):
         """Delete audio file from storage."""
@@ -38,5 +196,3 @@ class StorageService:
 
 
 storage_service = StorageService()
-
-
@@ -0,0 +1,222 @@
+import asyncio
+import os
+import tempfile
+import time
+import wave
+from typing import Awaitable, Callable, List, Optional
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.metrics import LIVE_ASR_LATENCY, LIVE_ASR_DROPPED
+from app.services.llm import Priority
+from app.services.whisper import whisper_service
+
+OnText = Callable[[str], Awaitable[None]]
+
+# Sample rates accepted in the client's audio_config
+SUPPORTED_SAMPLE_RATES = (8000, 16000, 22050, 24000, 32000, 44100, 48000)
+
+# Speech must be this many times louder than the tracked noise floor
+NOISE_RATIO = 3.0
+NOISE_FLOOR_DECAY = 0.95
+
+
+class RingBuffer:
+    """Fixed-capacity int16 sample buffer addressed by absolute sample position."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.int16)
+        self.end = 0  # absolute position just past the newest sample
+
+    @property
+    def start(self) -> int:
+        """Oldest absolute position still held."""
+        return max(0, self.end - self.capacity)
+
+    def write(self, samples: np.ndarray):
+        n = len(samples)
+        if n > self.capacity:
+            self.end += n - self.capacity
+            samples = samples[-self.capacity:]
+            n = self.capacity
+        offset = self.end % self.capacity
+        first = min(n, self.capacity - offset)
+        self._data[offset:offset + first] = samples[:first]
+        self._data[:n - first] = samples[first:]
+        self.end += n
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        start, end = max(start, self.start), min(end, self.end)
+        if end <= start:
+            return np.zeros(0, dtype=np.int16)
+        return self._data[np.arange(start, end) % self.capacity]
+
+
+class VoiceActivitySegmenter:
+    """
+    Energy-based voice activity detection over fixed frames. An utterance
+    ends after end_silence of non-speech, or is cut at max_utterance so no
+    utterance (and no transcript latency) grows with the lecture.
+    """
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.frame = max(1, sample_rate * settings.live_asr_frame_ms // 1000)
+        self.preroll = sample_rate * settings.live_asr_preroll_ms // 1000
+        self.end_silence = sample_rate * settings.live_asr_end_silence_ms // 1000
+        self.min_speech = sample_rate * settings.live_asr_min_speech_ms // 1000
+        self.max_utterance = int(sample_rate * settings.live_asr_max_utterance_sec)
+        self.ring = RingBuffer(self.max_utterance + self.preroll + sample_rate)
+
+        self.noise_floor = 0.0
+        self._odd_byte = b""
+        self._partial = np.zeros(0, dtype=np.int16)  # samples short of a full frame
+        self._speech_start: Optional[int] = None
+        self._speech_samples = 0
+        self._silence_samples = 0
+        self._continued = False  # previous utterance was cut mid-speech
+
+    def feed(self, pcm: bytes) -> List[np.ndarray]:
+        """Add 16-bit little-endian mono PCM; return utterances that finished."""
+        pcm = self._odd_byte + pcm
+        usable = len(pcm) - len(pcm) % 2
+        self._odd_byte = pcm[usable:]
+        samples = np.frombuffer(pcm[:usable], dtype="<i2")
+        self.ring.write(samples)
+
+        pending = np.concatenate([self._partial, samples])
+        count = len(pending) // self.frame
+        frames = pending[:count * self.frame].reshape(count, self.frame).astype(np.float32)
+        self._partial = pending[count * self.frame:].copy()
+        levels = np.sqrt((frames ** 2).mean(axis=1)) if count else []
+
+        utterances = []
+        first_frame = self.ring.end - len(self._partial) - count * self.frame
+        for k, level in enumerate(levels):
+            frame_start = first_frame + k * self.frame
+            frame_end = frame_start + self.frame
+            threshold = max(settings.live_asr_energy_threshold, self.noise_floor * NOISE_RATIO)
+
+            if level > threshold:
+                if self._speech_start is None:
+                    preroll = 0 if self._continued else self.preroll
+                    self._speech_start = max(frame_start - preroll, self.ring.start)
+                self._speech_samples += self.frame
+                self._silence_samples = 0
+            else:
+                self.noise_floor = NOISE_FLOOR_DECAY * self.noise_floor + (1 - NOISE_FLOOR_DECAY) * level
+                self._continued = False
+                if self._speech_start is not None:
+                    self._silence_samples += self.frame
+
+            if self._speech_start is None:
+                continue
+            if self._silence_samples >= self.end_silence:
+                utterance = self._cut(frame_end - self._silence_samples + self.frame)
+            elif frame_end - self._speech_start >= self.max_utterance:
+                utterance = self._cut(frame_end)
+                self._continued = True
+            else:
+                continue
+            if utterance is not None:
+                utterances.append(utterance)
+
+        return utterances
+
+    def flush(self) -> Optional[np.ndarray]:
+        """The utterance in progress, if any, at the end of the stream."""
+        if self._speech_start is None:
+            return None
+        return self._cut(self.ring.end)
+
+    def _cut(self, end: int) -> Optional[np.ndarray]:
+        start, speech = self._speech_start, self._speech_samples
+        self._speech_start = None
+        self._speech_samples = 0
+        self._silence_samples = 0
+        if speech < self.min_speech:
+            return None  # a click or cough, not speech
+        return self.ring.read(start, end)
+
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int):
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.astype("<i2").tobytes())
+
+
+class StreamingTranscriber:
+    """
+    Server-side ASR for one live session. Binary PCM frames are segmented
+    by the VAD and finished utterances are transcribed one at a time, in
+    order, with the configured engine. Memory is bounded by the ring buffer
+    and the utterance queue: when transcription falls behind, the oldest
+    waiting utterance is dropped.
+    """
+
+    def __init__(self, on_text: OnText, sample_rate: int = settings.live_asr_sample_rate):
+        self.sample_rate = sample_rate
+        self.segmenter = VoiceActivitySegmenter(sample_rate)
+        self._on_text = on_text
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, settings.live_asr_queue_size))
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def feed(self, pcm: bytes):
+        """Add audio. Never blocks the receive loop."""
+        for utterance in self.segmenter.feed(pcm):
+            self._submit(utterance)
+
+    def _submit(self, utterance: np.ndarray):
+        if self._queue.full():
+            self._queue.get_nowait()
+            self._queue.task_done()
+            LIVE_ASR_DROPPED.inc()
+            print("Live transcription is behind; dropped the oldest utterance")
+        self._queue.put_nowait((utterance, time.perf_counter()))
+
+    async def _transcribe(self, samples: np.ndarray) -> str:
+        fd, path = tempfile.mkstemp(prefix="pyronotes-live-", suffix=".wav")
+        os.close(fd)
+        try:
+            await run_in_threadpool(write_wav, path, samples, self.sample_rate)
+            text = await whisper_service.engine.transcribe(path, priority=Priority.interactive)
+        finally:
+            await run_in_threadpool(os.remove, path)
+        return text.strip()
+
+    async def _run(self):
+        while True:
+            utterance, cut_at = await self._queue.get()
+            try:
+                text = await self._transcribe(utterance)
+                if text:
+                    await self._on_text(text)
+                LIVE_ASR_LATENCY.observe(time.perf_counter() - cut_at)
+            except Exception as e:
+                print(f"Error transcribing live audio: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def close(self, timeout: float = settings.live_asr_drain_timeout):
+        """Transcribe the utterance in progress and what is queued, then stop."""
+        tail = self.segmenter.flush()
+        if tail is not None:
+            self._submit(tail)
+        if not self._task:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print("Live transcription did not drain in time; dropping queued audio")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,184 @@
+import math
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Literal
+from app.config import settings
+from app.metrics import PROMPT_TOKENS, PROMPT_REDUCTIONS
+
+try:
+    import tiktoken
+except ImportError:  # fall back to a character estimate
+    tiktoken = None
+
+CHARS_PER_TOKEN = 4
+DEFAULT_CONTEXT = 8192
+
+# Context windows by model name prefix; the longest matching prefix wins
+CONTEXT_WINDOWS = {
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4-1106": 128000,
+    "gpt-4-0125": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-3.5-turbo": 16385,
+}
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+@dataclass
+class BudgetedText:
+    text: str
+    tokens: int  # tokens in text as it will be sent
+    original_tokens: int  # tokens before trimming or condensing
+    budget: int
+
+    @property
+    def over_budget(self) -> bool:
+        """The input had to be trimmed or condensed to fit."""
+        return self.original_tokens > self.budget
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # The BPE file could not be loaded (e.g. offline)
+        print(f"Tokenizer unavailable for {model}, estimating: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str, keep: Literal["head", "tail"] = "head") -> str:
+    """Cut text to max_tokens regardless of sentence boundaries."""
+    encoding = _encoding(model)
+    if encoding is None:
+        limit = max_tokens * CHARS_PER_TOKEN
+        return text[:limit] if keep == "head" else text[-limit:]
+    tokens = encoding.encode(text, disallowed_special=())
+    tokens = tokens[:max_tokens] if keep == "head" else tokens[-max_tokens:]
+    return encoding.decode(tokens)
+
+
+def context_window(model: str) -> int:
+    if settings.llm_context_tokens:
+        return settings.llm_context_tokens
+    matches = [prefix for prefix in CONTEXT_WINDOWS if model.startswith(prefix)]
+    if not matches:
+        return DEFAULT_CONTEXT
+    return CONTEXT_WINDOWS[max(matches, key=len)]
+
+
+def input_budget(model: str, max_tokens: int, *prompt_parts: str) -> int:
+    """Tokens left for the transcript once the prompt and the reply are reserved."""
+    reserved = max_tokens + settings.llm_context_margin
+    reserved += sum(count_tokens(part, model) for part in prompt_parts)
+    return max(context_window(model) - reserved, 1)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s for s in SENTENCE_END.split(text.strip()) if s]
+
+
+def _split_long_sentence(sentence: str, max_tokens: int, model: str) -> List[str]:
+    pieces, current, used = [], [], 0
+    for word in sentence.split():
+        n = count_tokens(" " + word, model)
+        if n > max_tokens:
+            # A single "word" over budget (e.g. a URL or unspaced text)
+            if current:
+                pieces.append(" ".join(current))
+                current, used = [], 0
+            pieces.append(truncate_tokens(word, max_tokens, model))
+            continue
+        if current and used + n > max_tokens:
+            pieces.append(" ".join(current))
+            current, used = [], 0
+        current.append(word)
+        used += n
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def chunk_text(text: str, max_tokens: int, model: str) -> List[str]:
+    """Split text into chunks of at most max_tokens, on sentence boundaries."""
+    if count_tokens(text, model) <= max_tokens:
+        return [text]
+
+    chunks, current, used = [], [], 0
+    for sentence in split_sentences(text):
+        n = count_tokens(" " + sentence, model)
+        if n > max_tokens:
+            if current:
+                chunks.append(" ".join(current))
+                current, used = [], 0
+            chunks.extend(_split_long_sentence(sentence, max_tokens, model))
+            continue
+        if current and used + n > max_tokens:
+            chunks.append(" ".join(current))
+            current, used = [], 0
+        current.append(sentence)
+        used += n
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def fit_text(text: str, max_tokens: int, model: str, keep: Literal["head", "tail"] = "head") -> BudgetedText:
+    """
+    Measure text and, if it is over budget, trim it to whole sentences
+    from the start (head) or the end (tail).
+    """
+    tokens = count_tokens(text, model)
+    if tokens <= max_tokens:
+        return BudgetedText(text=text, tokens=tokens, original_tokens=tokens, budget=max_tokens)
+
+    sentences = split_sentences(text)
+    if keep == "tail":
+        sentences.reverse()
+
+    kept, used = [], 0
+    for sentence in sentences:
+        n = count_tokens(" " + sentence, model)
+        if used + n > max_tokens:
+            break
+        kept.append(sentence)
+        used += n
+
+    if not kept:
+        kept = [truncate_tokens(sentences[0], max_tokens, model, keep)]
+    if keep == "tail":
+        kept.reverse()
+
+    trimmed = " ".join(kept)
+    return BudgetedText(
+        text=trimmed,
+        tokens=count_tokens(trimmed, model),
+        original_tokens=tokens,
+        budget=max_tokens
+    )
+
+
+def report_usage(operation: str, budgeted: BudgetedText):
+    PROMPT_TOKENS.labels(operation).observe(budgeted.tokens)
+    if budgeted.over_budget:
+        PROMPT_REDUCTIONS.labels(operation).inc()
+        print(
+            f"{operation}: input of {budgeted.original_tokens} tokens reduced to "
+            f"{budgeted.tokens} (budget {budgeted.budget})"
+        )
@@ -0,0 +1,169 @@
+import asyncio
+from typing import List, Optional, Tuple
+from sqlalchemy import select
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.lecture import Lecture, LectureStatus
+from app.models.transcript_chunk import TranscriptChunk
+from app.services.search import search_service
+
+
+class TranscriptCheckpointer:
+    """
+    Append-only live transcript for one lecture.
+    Chunks are numbered by seq and written to transcript_chunks in small
+    batches every live_checkpoint_interval_sec seconds or once
+    live_checkpoint_chars characters are pending, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        lecture_id: str,
+        interval: float = settings.live_checkpoint_interval_sec,
+        max_chars: int = settings.live_checkpoint_chars
+    ):
+        self.lecture_id = lecture_id
+        self.interval = interval
+        self.max_chars = max_chars
+        self.chunks: List[Tuple[int, str]] = []
+        self.last_seq = 0
+        self.durable_seq = 0
+        self._unflushed: List[Tuple[int, str]] = []
+        self._unflushed_chars = 0
+        # A failed flush may still have committed; the retry skips stored seqs
+        self._maybe_written = False
+        self._lock = asyncio.Lock()
+        self._flush_requested = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def load(self):
+        """Load chunks checkpointed by earlier connections to this lecture."""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(TranscriptChunk.seq, TranscriptChunk.text)
+                .where(TranscriptChunk.lecture_id == self.lecture_id)
+                .order_by(TranscriptChunk.seq)
+            )
+            self.chunks = [(seq, text) for seq, text in result.all()]
+
+        if self.chunks:
+            self.last_seq = self.durable_seq = self.chunks[-1][0]
+
+    @property
+    def text(self) -> str:
+        return "".join(text for _, text in self.chunks)
+
+    def chunks_after(self, seq: int) -> List[Tuple[int, str]]:
+        return [(s, text) for s, text in self.chunks if s > seq]
+
+    def append(self, text: str, seq: Optional[int] = None) -> Optional[int]:
+        """
+        Append a chunk and return its seq, or None if seq was already seen
+        (a client re-sending after reconnect).
+        """
+        if seq is None:
+            seq = self.last_seq + 1
+        elif seq <= self.last_seq:
+            return None
+
+        self.last_seq = seq
+        self.chunks.append((seq, text))
+        self._unflushed.append((seq, text))
+        self._unflushed_chars += len(text)
+        if self._unflushed_chars >= self.max_chars:
+            self._flush_requested.set()
+        return seq
+
+    async def flush(self):
+        """Write pending chunks in one small transaction."""
+        async with self._lock:
+            if not self._unflushed:
+                return
+            batch = self._unflushed
+            self._unflushed = []
+            self._unflushed_chars = 0
+
+            try:
+                async with AsyncSessionLocal() as db:
+                    pending = batch
+                    if self._maybe_written:
+                        result = await db.execute(
+                            select(TranscriptChunk.seq).where(
+                                TranscriptChunk.lecture_id == self.lecture_id,
+                                TranscriptChunk.seq >= batch[0][0]
+                            )
+                        )
+                        stored = set(result.scalars().all())
+                        pending = [(seq, text) for seq, text in batch if seq not in stored]
+                    db.add_all([
+                        TranscriptChunk(lecture_id=self.lecture_id, seq=seq, text=text)
+                        for seq, text in pending
+                    ])
+                    await db.commit()
+            except BaseException:
+                # Keep the batch for the next attempt (also on cancellation)
+                self._maybe_written = True
+                self._unflushed = batch + self._unflushed
+                self._unflushed_chars = sum(len(text) for _, text in self._unflushed)
+                raise
+
+            self._maybe_written = False
+            self.durable_seq = batch[-1][0]
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error checkpointing transcript for lecture {self.lecture_id}: {e}")
+
+    async def close(self):
+        """Stop periodic checkpointing and write whatever is still pending."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+async def recover_interrupted_recordings() -> List[str]:
+    """
+    Fold the checkpointed chunks of live sessions cut off by a server
+    restart into their lectures, as the end of a session would. A client
+    that reconnects later resumes the session as usual. Returns the ids of
+    the recovered lectures.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Lecture).where(Lecture.status == LectureStatus.recording)
+        )
+        recovered = []
+        for lecture in result.scalars().all():
+            chunks = await db.execute(
+                select(TranscriptChunk.text)
+                .where(TranscriptChunk.lecture_id == lecture.id)
+                .order_by(TranscriptChunk.seq)
+            )
+            texts = chunks.scalars().all()
+            if not texts:
+                continue
+            lecture.transcript = "".join(texts)
+            lecture.status = LectureStatus.ready
+            await search_service.index_lecture(db, lecture)
+            recovered.append(lecture.id)
+        await db.commit()
+
+    if recovered:
+        print(f"Recovered {len(recovered)} interrupted live recording(s)")
+    return recovered
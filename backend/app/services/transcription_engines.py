@@ -0,0 +1,143 @@
+import asyncio
+import importlib.util
+import multiprocessing
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+from app.config import settings
+from app.services.llm import llm_client, Priority
+from app.tracing import span
+
+
+class TranscriptionEngine(ABC):
+    """Turns one audio file into text. WhisperService handles segmenting and retries."""
+
+    name: str
+    # Segments transcribed at once
+    max_concurrency: int
+    # Largest file the engine accepts; None when there is no limit
+    max_file_bytes: Optional[int] = None
+
+    @abstractmethod
+    async def transcribe(self, audio_path: str, priority: Priority = Priority.background) -> str:
+        ...
+
+    def shutdown(self):
+        pass
+
+
+class OpenAIWhisperEngine(TranscriptionEngine):
+    """Hosted whisper-1 through the shared rate-limited client."""
+
+    name = "openai"
+
+    def __init__(self):
+        self.max_concurrency = settings.whisper_max_concurrency
+        self.max_file_bytes = settings.whisper_max_file_bytes
+
+    async def transcribe(self, audio_path: str, priority: Priority = Priority.background) -> str:
+        with open(audio_path, "rb") as audio_file:
+            transcript = await llm_client.transcribe(
+                priority=priority,
+                model="whisper-1",
+                file=audio_file,
+                response_format="text"
+            )
+
+        return transcript if isinstance(transcript, str) else transcript.text
+
+
+# Loaded once per worker process by _init_local_worker
+_local_model = None
+
+
+def _init_local_worker(model_size: str, compute_type: str, cpu_threads: int):
+    global _local_model
+    from faster_whisper import WhisperModel
+
+    _local_model = WhisperModel(
+        model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads
+    )
+
+
+def _local_transcribe(audio_path: str, beam_size: int, language: Optional[str]) -> str:
+    segments, _ = _local_model.transcribe(
+        audio_path, beam_size=beam_size, language=language, vad_filter=True
+    )
+    return " ".join(segment.text.strip() for segment in segments)
+
+
+class LocalWhisperEngine(TranscriptionEngine):
+    """
+    Quantized Whisper (faster-whisper / CTranslate2) on the CPU. Each
+    worker process loads the model once and transcribes one file at a time.
+    Interactive work (live utterances) runs on workers of its own, so it
+    never queues behind long batch segments.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        model_size: str,
+        compute_type: str,
+        workers: int,
+        cpu_threads: int = 0,
+        beam_size: int = 1,
+        language: Optional[str] = None,
+        interactive_workers: int = 1
+    ):
+        if importlib.util.find_spec("faster_whisper") is None:
+            raise RuntimeError(
+                "TRANSCRIPTION_ENGINE=local needs faster-whisper "
+                "(pip install -r requirements-local.txt)"
+            )
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.max_concurrency = max(1, workers)
+        self.cpu_threads = cpu_threads or max(1, (os.cpu_count() or 1) // self.max_concurrency)
+        self.beam_size = beam_size
+        self.language = language or None
+        self.interactive_workers = max(1, interactive_workers)
+        self._executors: Dict[bool, ProcessPoolExecutor] = {}
+
+    def _pool(self, interactive: bool) -> ProcessPoolExecutor:
+        if interactive not in self._executors:
+            # spawn: the model runtime does not survive a fork of a threaded process
+            self._executors[interactive] = ProcessPoolExecutor(
+                max_workers=self.interactive_workers if interactive else self.max_concurrency,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_local_worker,
+                initargs=(self.model_size, self.compute_type, self.cpu_threads),
+            )
+        return self._executors[interactive]
+
+    async def transcribe(self, audio_path: str, priority: Priority = Priority.background) -> str:
+        interactive = priority == Priority.interactive
+        loop = asyncio.get_running_loop()
+        with span("transcription.local", model=self.model_size, interactive=interactive):
+            return await loop.run_in_executor(
+                self._pool(interactive), _local_transcribe, audio_path, self.beam_size, self.language
+            )
+
+    def shutdown(self):
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._executors = {}
+
+
+def create_engine(name: str) -> TranscriptionEngine:
+    if name == "openai":
+        return OpenAIWhisperEngine()
+    if name == "local":
+        return LocalWhisperEngine(
+            model_size=settings.local_whisper_model,
+            compute_type=settings.local_whisper_compute_type,
+            workers=settings.local_whisper_workers,
+            cpu_threads=settings.local_whisper_cpu_threads,
+            beam_size=settings.local_whisper_beam_size,
+            language=settings.local_whisper_language,
+            interactive_workers=settings.local_whisper_interactive_workers,
+        )
+    raise ValueError(f"Unknown transcription engine: {name}")
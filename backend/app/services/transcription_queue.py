@@ -0,0 +1,218 @@
+import asyncio
+from typing import Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.lecture import Lecture, LectureStatus
+from app.models.transcript_cache import TranscriptCache
+from app.models.transcription_job import TranscriptionJob, JobStatus
+from app.services.whisper import whisper_service
+from app.services.lecture_buddy import lecture_buddy_service
+from app.services.search import search_service
+from app.services.llm import Priority
+from app.services.glossary import glossary_service
+from app.services.audio_pipeline import audio_pipeline
+from app.services.generation import generation_service
+from app.services.embedding_index import embedding_index
+
+
+ACTIVE_STATUSES = (JobStatus.queued, JobStatus.running)
+
+
+class TranscriptionQueue:
+    """
+    In-process worker pool for batch transcription.
+    Jobs are persisted in the transcription_jobs table so queued or
+    interrupted work is picked up again on startup.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = max(1, concurrency)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._stopping = False
+
+    async def start(self):
+        """Recover persisted jobs and start the workers."""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(TranscriptionJob)
+                .where(TranscriptionJob.status.in_(ACTIVE_STATUSES))
+                .order_by(TranscriptionJob.created_at)
+            )
+            jobs = result.scalars().all()
+            for job in jobs:
+                job.status = JobStatus.queued
+            await db.commit()
+
+        for job in jobs:
+            self._queue.put_nowait(job.id)
+
+        for _ in range(self.concurrency):
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        """Stop the workers. Interrupted jobs stay queued/running in the DB."""
+        self._stopping = True
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def enqueue(self, db: AsyncSession, lecture_id: str) -> TranscriptionJob:
+        """Persist a new job for a lecture and schedule it."""
+        job = TranscriptionJob(lecture_id=lecture_id, status=JobStatus.queued)
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def get_latest_job(self, db: AsyncSession, lecture_id: str) -> Optional[TranscriptionJob]:
+        result = await db.execute(
+            select(TranscriptionJob)
+            .where(TranscriptionJob.lecture_id == lecture_id)
+            .order_by(TranscriptionJob.created_at.desc())
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    async def cancel(self, db: AsyncSession, job: TranscriptionJob):
+        """Cancel a queued or running job and mark its lecture as errored."""
+        job.status = JobStatus.cancelled
+        job.error = "Cancelled"
+        lecture = await db.get(Lecture, job.lecture_id)
+        if lecture:
+            lecture.status = LectureStatus.error
+        await db.commit()
+
+        task = self._running.get(job.id)
+        if task:
+            task.cancel()
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            task = asyncio.create_task(self._process(job_id))
+            self._running[job_id] = task
+            try:
+                await task
+            except asyncio.CancelledError:
+                # Job cancelled; only propagate if the worker itself is stopping
+                if self._stopping:
+                    raise
+            except Exception as e:
+                print(f"Transcription job {job_id} crashed: {e}")
+            finally:
+                self._running.pop(job_id, None)
+                self._queue.task_done()
+
+    async def _set_progress(self, db: AsyncSession, job: TranscriptionJob, progress: int):
+        job.progress = progress
+        await db.commit()
+
+    async def _process(self, job_id: str):
+        async with AsyncSessionLocal() as db:
+            job = await db.get(TranscriptionJob, job_id)
+            if not job or job.status != JobStatus.queued:
+                return
+
+            lecture = await db.get(Lecture, job.lecture_id)
+            if not lecture or not lecture.audio_path:
+                job.status = JobStatus.error
+                job.error = "Lecture or audio file not found"
+                await db.commit()
+                return
+
+            lecture_id = lecture.id
+            job.status = JobStatus.running
+            job.attempts += 1
+            job.error = None
+            job.progress = 0
+            lecture.status = LectureStatus.processing
+            await db.commit()
+
+            try:
+                # Another upload of the same audio may have finished first
+                cached = None
+                if lecture.audio_hash:
+                    cached = await db.get(TranscriptCache, lecture.audio_hash)
+
+                if cached:
+                    transcript = cached.transcript
+                    ai_insights = cached.ai_insights or []
+                else:
+                    async def on_segment_progress(done: int, total: int):
+                        # Whisper covers the 10-70% band of the job
+                        await self._set_progress(db, job, 10 + (60 * done) // max(total, 1))
+
+                    # Whisper gets the compact variant: smaller uploads, no dead air
+                    audio_path = lecture.audio_path
+                    source_key = lecture.audio_hash
+                    try:
+                        compact = await audio_pipeline.process_lecture(db, lecture)
+                    except Exception as e:
+                        print(f"Audio pipeline failed for lecture {lecture_id}: {e}")
+                        compact = None
+                    if compact:
+                        audio_path = compact["path"]
+                        source_key = f"{lecture.audio_hash}:speech"
+
+                    await self._set_progress(db, job, 10)
+                    transcript = await whisper_service.transcribe_audio_file(
+                        audio_path,
+                        source_key=source_key,
+                        on_progress=on_segment_progress
+                    )
+                    await self._set_progress(db, job, 70)
+                    ai_insights = await lecture_buddy_service.analyze_transcript_chunk(
+                        transcript, priority=Priority.background
+                    )
+                    await self._set_progress(db, job, 90)
+
+                    if lecture.audio_hash:
+                        await db.merge(TranscriptCache(
+                            content_hash=lecture.audio_hash,
+                            transcript=transcript,
+                            ai_insights=ai_insights
+                        ))
+
+                lecture.transcript = transcript
+                lecture.ai_insights = ai_insights
+                lecture.status = LectureStatus.ready
+                job.status = JobStatus.done
+                job.progress = 100
+                await search_service.index_lecture(db, lecture)
+                await db.commit()
+
+                try:
+                    await glossary_service.record(lecture_id, ai_insights)
+                except Exception as e:
+                    print(f"Error recording glossary terms: {e}")
+                
+                generation_service.schedule_pregeneration(transcript)
+                embedding_index.schedule(lecture_id, transcript)
+
+            except asyncio.CancelledError:
+                # cancel() already recorded the new state
+                raise
+
+            except Exception as e:
+                print(f"Transcription job {job_id} failed: {e}")
+                await db.rollback()
+                job = await db.get(TranscriptionJob, job_id)
+                lecture = await db.get(Lecture, lecture_id)
+                if job:
+                    job.status = JobStatus.error
+                    job.error = str(e)
+                if lecture:
+                    lecture.status = LectureStatus.error
+                await db.commit()
+
+
+transcription_queue = TranscriptionQueue(settings.transcription_workers)
@@ -1,31 +1,259 @@
-from openai import AsyncOpenAI
+import asyncio
+import difflib
+import math
+import os
+import re
+import shutil
+import tempfile
+from sqlalchemy import select, delete
+from starlette.concurrency import run_in_threadpool
 from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.transcript_segment import TranscriptSegment
+from app.services.transcription_engines import TranscriptionEngine, create_engine
+from app.metrics import track_call
 from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
-client = AsyncOpenAI(api_key=settings.openai_api_key)
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+# Upper end of lecture speech rate; sizes the words compared at a segment boundary
+WORDS_PER_SECOND = 3.0
+MIN_OVERLAP_MATCH_WORDS = 3
+# Words Whisper may cut or garble where a segment starts or ends
+SEAM_SLACK_WORDS = 2
+
+
+async def probe_duration(audio_path: str) -> Optional[float]:
+    """Return the duration of an audio file in seconds using ffprobe."""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "ffprobe", "-v", "error",
+            "-show_entries", "format=duration",
+            "-of", "default=noprint_wrappers=1:nokey=1",
+            audio_path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+    except FileNotFoundError:
+        return None
+
+    out, _ = await proc.communicate()
+    try:
+        return float(out.strip())
+    except ValueError:
+        return None
+
+
+async def extract_segment(audio_path: str, start: float, length: float, out_path: str):
+    """Cut [start, start + length) out of an audio file as mono speech-quality Opus."""
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-y", "-v", "error",
+        "-ss", f"{start:.3f}", "-t", f"{length:.3f}",
+        "-i", audio_path,
+        "-ac", "1", "-ar", "16000", "-c:a", "libopus", "-b:a", "32k",
+        out_path,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    _, err = await proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {err.decode(errors='ignore').strip()}")
+
+
+def plan_segments(duration: float, segment_sec: float, overlap_sec: float) -> List[Tuple[float, float]]:
+    """Split [0, duration) into overlapping (start, end) windows."""
+    step = max(segment_sec - overlap_sec, 1)
+    segments = []
+    start = 0.0
+    while True:
+        end = min(start + segment_sec, duration)
+        segments.append((start, end))
+        if end >= duration:
+            break
+        start += step
+    return segments
+
+
+def _normalize_word(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def stitch_segments(texts: List[str], overlap_sec: float) -> str:
+    """
+    Join ordered segment transcripts, dropping the words that were
+    transcribed twice in the overlap between neighbouring segments.
+    Only the words that fit in the overlap are compared, and a match
+    counts only where it lines up with the seam: the words of the earlier
+    segment after it and of the later segment before it, plus the match
+    itself, must fit in the overlap too.
+    """
+    window = max(MIN_OVERLAP_MATCH_WORDS, math.ceil(overlap_sec * WORDS_PER_SECOND))
+    words: List[str] = []
+    for text in texts:
+        next_words = text.split()
+        if not words:
+            words = next_words
+            continue
+
+        tail = words[-window:]
+        head = next_words[:window]
+        matcher = difflib.SequenceMatcher(
+            None,
+            [_normalize_word(w) for w in tail],
+            [_normalize_word(w) for w in head],
+            autojunk=False,
+        )
+        match = matcher.find_longest_match(0, len(tail), 0, len(head))
+
+        outside = (len(tail) - match.a - match.size) + match.b
+        if match.size >= MIN_OVERLAP_MATCH_WORDS and match.size + outside <= window + SEAM_SLACK_WORDS:
+            keep = len(words) - len(tail) + match.a + match.size
+            words = words[:keep] + next_words[match.b + match.size:]
+        else:
+            words = words + next_words
+
+    return " ".join(words)
 
 
 class WhisperService:
-    async def transcribe_audio_file(self, audio_path: str) -> str:
+    def __init__(self, engine: TranscriptionEngine):
+        self.engine = engine
+        self.segment_sec = settings.whisper_segment_sec
+        self.overlap_sec = settings.whisper_segment_overlap_sec
+        self.max_concurrency = engine.max_concurrency
+        self.max_file_bytes = engine.max_file_bytes
+
+    async def _transcribe_file(self, audio_path: str) -> str:
+        """Transcribe a single file with the configured engine."""
+        return await self.engine.transcribe(audio_path)
+
+    def shutdown(self):
+        self.engine.shutdown()
+
+    async def transcribe_audio_file(
+        self,
+        audio_path: str,
+        source_key: Optional[str] = None,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> str:
         """
-        Transcribe an audio file using OpenAI Whisper API.
+        Transcribe an audio file with the configured engine.
         Returns the full transcript.
+
+        Long recordings (or files over the API upload limit) are split into
+        overlapping segments that are transcribed concurrently and stitched
+        back together. Finished segments are saved under source_key so a
+        retry only redoes the segments that failed.
         """
         try:
-            with open(audio_path, "rb") as audio_file:
-                transcript = await client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="text"
+            async with track_call("transcribe_audio_file"):
+                duration = await probe_duration(audio_path)
+                too_big = (
+                    self.max_file_bytes is not None
+                    and os.path.getsize(audio_path) > self.max_file_bytes
+                )
+
+                if duration is None or (duration <= self.segment_sec and not too_big):
+                    return await self._transcribe_file(audio_path)
+
+                return await self._transcribe_segmented(
+                    audio_path, duration, source_key or audio_path, on_progress
                 )
-            
-            return transcript if isinstance(transcript, str) else transcript.text
-        
+
         except Exception as e:
             print(f"Error transcribing audio: {e}")
             raise
 
+    async def _transcribe_segmented(
+        self,
+        audio_path: str,
+        duration: float,
+        source_key: str,
+        on_progress: Optional[ProgressCallback]
+    ) -> str:
+        plan = plan_segments(duration, self.segment_sec, self.overlap_sec)
+        texts: Dict[int, str] = await self._load_segments(source_key, plan)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        progress_lock = asyncio.Lock()
+        tmp_dir = tempfile.mkdtemp(prefix="pyronotes-segments-")
+
+        async def report():
+            if on_progress:
+                async with progress_lock:
+                    await on_progress(len(texts), len(plan))
+
+        async def run(index: int, start: float, end: float):
+            async with semaphore:
+                out_path = str(Path(tmp_dir) / f"{index:04d}.ogg")
+                await extract_segment(audio_path, start, end - start, out_path)
+                text = await self._transcribe_file(out_path)
+                await run_in_threadpool(os.remove, out_path)
+
+            await self._save_segment(source_key, index, start, end, text)
+            texts[index] = text
+            await report()
+
+        try:
+            await report()
+            results = await asyncio.gather(
+                *(run(i, start, end) for i, (start, end) in enumerate(plan) if i not in texts),
+                return_exceptions=True
+            )
+            if any(isinstance(r, asyncio.CancelledError) for r in results):
+                raise asyncio.CancelledError()
+            errors = [r for r in results if isinstance(r, BaseException)]
+            if errors:
+                raise RuntimeError(
+                    f"{len(errors)} of {len(plan)} segments failed: {errors[0]}"
+                ) from errors[0]
+        finally:
+            await run_in_threadpool(shutil.rmtree, tmp_dir, True)
+
+        transcript = stitch_segments([texts[i] for i in range(len(plan))], self.overlap_sec)
+        await self._clear_segments(source_key)
+        return transcript
+
+    async def _load_segments(self, source_key: str, plan: List[Tuple[float, float]]) -> Dict[int, str]:
+        """Load previously finished segments that match the current plan."""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(TranscriptSegment).where(TranscriptSegment.source_key == source_key)
+            )
+            segments = result.scalars().all()
+
+        done = {}
+        for segment in segments:
+            if segment.segment_index < len(plan):
+                start, end = plan[segment.segment_index]
+                if abs(segment.start_sec - start) < 0.01 and abs(segment.end_sec - end) < 0.01:
+                    done[segment.segment_index] = segment.text
+        return done
+
+    async def _save_segment(self, source_key: str, index: int, start: float, end: float, text: str):
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                delete(TranscriptSegment).where(
+                    TranscriptSegment.source_key == source_key,
+                    TranscriptSegment.segment_index == index
+                )
+            )
+            db.add(TranscriptSegment(
+                source_key=source_key,
+                segment_index=index,
+                start_sec=start,
+                end_sec=end,
+                text=text
+            ))
+            await db.commit()
 
-whisper_service = WhisperService()
+    async def _clear_segments(self, source_key: str):
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                delete(TranscriptSegment).where(TranscriptSegment.source_key == source_key)
+            )
+            await db.commit()
 
 
+whisper_service = WhisperService(create_engine(settings.transcription_engine))
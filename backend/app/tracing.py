@@ -0,0 +1,257 @@
+import asyncio
+import collections
+import contextvars
+import json
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Coroutine, Deque, Dict, List, Optional, Tuple
+from app.config import settings
+
+# Client-supplied trace ids are accepted only as hex or a UUID; they end up in file names
+TRACE_ID_PATTERN = re.compile(r"[0-9a-fA-F]{8,64}|[0-9a-fA-F]{8}(-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}")
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    end: Optional[float] = None
+    task: str = "main"
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Trace:
+    trace_id: str
+    name: str
+    start: float
+    spans: List[Span] = field(default_factory=list)
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("span", default=None)
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def _task_name() -> str:
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return task.get_name() if task else threading.current_thread().name
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Record a span under the current trace and make it the parent of spans
+    opened inside it. Tasks created inside inherit it as their parent.
+    A no-op outside of a trace.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = Span(
+        name=name,
+        span_id=_new_id(),
+        parent_id=parent.span_id if parent else None,
+        start=time.perf_counter(),
+        task=_task_name(),
+        attrs=attrs,
+    )
+    trace.spans.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def add_span(name: str, start: float, end: float, **attrs):
+    """Record an already-finished span without changing the active span."""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    parent = _current_span.get()
+    trace.spans.append(Span(
+        name=name,
+        span_id=_new_id(),
+        parent_id=parent.span_id if parent else None,
+        start=start,
+        end=end,
+        task=_task_name(),
+        attrs=attrs,
+    ))
+
+
+@contextmanager
+def start_trace(name: str, trace_id: Optional[str] = None):
+    """Open a root span for a request; yields the Trace. Invalid trace ids are replaced."""
+    if not trace_id or not TRACE_ID_PATTERN.fullmatch(trace_id):
+        trace_id = uuid.uuid4().hex
+    trace = Trace(trace_id=trace_id, name=name, start=time.perf_counter())
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        with span(name):
+            yield trace
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+async def _untraced(coro: Coroutine) -> Any:
+    # The task runs in a copy of the spawning context; clearing it here
+    # leaves the request's own context untouched
+    _current_trace.set(None)
+    _current_span.set(None)
+    return await coro
+
+
+def create_detached_task(coro: Coroutine) -> asyncio.Task:
+    """
+    asyncio.create_task for work that may outlive the current request.
+    The task starts outside any trace, so it doesn't keep appending spans
+    to a request trace that has already finished.
+    """
+    return asyncio.create_task(_untraced(coro))
+
+
+class StackSampler:
+    """
+    Sampling profiler for the event loop thread. A daemon thread records
+    the loop thread's stack every interval into a bounded ring buffer;
+    slow-request dumps fold the samples that fall inside the request.
+    """
+
+    def __init__(self, interval: float, max_samples: int = 20000):
+        self.interval = interval
+        self.samples: Deque[Tuple[float, str]] = collections.deque(maxlen=max_samples)
+        self._target: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            folded = ";".join(f"{f.name} ({os.path.basename(f.filename)}:{f.lineno})" for f in stack)
+            self.samples.append((time.perf_counter(), folded))
+
+    def folded(self, start: float, end: float) -> Dict[str, int]:
+        """Collapsed stacks (flamegraph input) for samples in [start, end]."""
+        counts: Dict[str, int] = collections.Counter()
+        for ts, stack in list(self.samples):
+            if start <= ts <= end:
+                counts[stack] += 1
+        return dict(counts)
+
+
+sampler: Optional[StackSampler] = None
+
+
+def start_profiler():
+    global sampler
+    if settings.trace_profile_enabled and sampler is None:
+        sampler = StackSampler(settings.trace_profile_interval_ms / 1000)
+        sampler.start()
+
+
+def stop_profiler():
+    global sampler
+    if sampler:
+        sampler.stop()
+        sampler = None
+
+
+def to_chrome_trace(trace: Trace) -> Dict:
+    """Export in Chrome Trace Event format (chrome://tracing, Perfetto)."""
+    events = []
+    for s in trace.spans:
+        end = s.end if s.end is not None else time.perf_counter()
+        events.append({
+            "name": s.name,
+            "cat": s.name.split(".")[0],
+            "ph": "X",
+            "ts": round((s.start - trace.start) * 1e6, 1),
+            "dur": round((end - s.start) * 1e6, 1),
+            "pid": 1,
+            "tid": s.task,
+            "args": {"span_id": s.span_id, "parent_id": s.parent_id, **s.attrs},
+        })
+    return {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {"trace_id": trace.trace_id, "name": trace.name},
+    }
+
+
+def format_span_tree(trace: Trace) -> str:
+    children: Dict[Optional[str], List[Span]] = collections.defaultdict(list)
+    for s in trace.spans:
+        children[s.parent_id].append(s)
+
+    lines = []
+
+    def walk(parent_id: Optional[str], depth: int):
+        for s in sorted(children.get(parent_id, []), key=lambda s: s.start):
+            end = s.end if s.end is not None else time.perf_counter()
+            offset = (s.start - trace.start) * 1000
+            lines.append(f"{'  ' * depth}{s.name} +{offset:.1f}ms {(end - s.start) * 1000:.1f}ms")
+            walk(s.span_id, depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def dump_slow_trace(trace: Trace, duration: float):
+    """Write the trace (and profiler samples, if enabled) to trace_dir."""
+    out_dir = Path(settings.trace_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    data = to_chrome_trace(trace)
+    data["otherData"]["duration_ms"] = round(duration * 1000, 1)
+    if sampler:
+        data["otherData"]["profile"] = sampler.folded(trace.start, trace.start + duration)
+
+    path = out_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{trace.trace_id}.json"
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+    print(f"Slow request {trace.name} took {duration * 1000:.0f}ms (trace {path})\n{format_span_tree(trace)}")
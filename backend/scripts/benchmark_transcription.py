@@ -0,0 +1,68 @@
+"""
+Compare transcription engines on the same recordings.
+
+    cd backend
+    python -m scripts.benchmark_transcription lecture1.mp3 lecture2.m4a --engines openai local
+
+Reports wall time, real-time factor (wall / audio duration) and word count
+per engine, plus how closely each engine's transcript matches the first one.
+The local engine's first file includes model load time; use --warmup to
+exclude it.
+"""
+import argparse
+import asyncio
+import difflib
+import time
+from typing import Dict, List
+from app.services.transcription_engines import create_engine
+from app.services.whisper import probe_duration
+
+
+def similarity(a: str, b: str) -> float:
+    return difflib.SequenceMatcher(None, a.lower().split(), b.lower().split(), autojunk=False).ratio()
+
+
+async def run(files: List[str], engines: List[str], warmup: bool):
+    durations = {path: await probe_duration(path) for path in files}
+    transcripts: Dict[str, Dict[str, str]] = {path: {} for path in files}
+
+    print(f"{'engine':<8} {'file':<32} {'audio s':>8} {'wall s':>8} {'RTF':>6} {'words':>6}")
+    for name in engines:
+        engine = create_engine(name)
+        try:
+            if warmup:
+                await engine.transcribe(files[0])
+
+            for path in files:
+                start = time.perf_counter()
+                text = await engine.transcribe(path)
+                wall = time.perf_counter() - start
+                transcripts[path][name] = text
+
+                duration = durations[path]
+                rtf = f"{wall / duration:6.3f}" if duration else f"{'-':>6}"
+                audio = f"{duration:8.1f}" if duration else f"{'-':>8}"
+                print(f"{name:<8} {path[-32:]:<32} {audio} {wall:8.1f} {rtf} {len(text.split()):6d}")
+        finally:
+            engine.shutdown()
+
+    if len(engines) > 1:
+        reference = engines[0]
+        print(f"\nWord-level agreement with {reference}:")
+        for path in files:
+            for name in engines[1:]:
+                ratio = similarity(transcripts[path][reference], transcripts[path][name])
+                print(f"  {name:<8} {path[-32:]:<32} {ratio:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="audio files to transcribe")
+    parser.add_argument("--engines", nargs="+", default=["openai", "local"], choices=["openai", "local"])
+    parser.add_argument("--warmup", action="store_true", help="transcribe the first file once before timing")
+    args = parser.parse_args()
+    asyncio.run(run(args.files, args.engines, args.warmup))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import pytest
+
+# Settings are read on import, so this runs before any app module loads.
+# Tests never reach the API, and they keep their database, uploads and
+# traces in a scratch directory instead of the working tree.
+SCRATCH_DIR = tempfile.mkdtemp(prefix="pyronotes-tests-")
+os.environ["OPENAI_API_KEY"] = "test-key"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{SCRATCH_DIR}/test.db"
+os.environ["UPLOAD_DIR"] = os.path.join(SCRATCH_DIR, "uploads")
+os.environ["TRACE_DIR"] = os.path.join(SCRATCH_DIR, "traces")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def loop():
+    # One loop for the session: pooled database connections are bound to it
+    loop = asyncio.new_event_loop()
+    yield loop
+    if "app.database" in sys.modules:
+        loop.run_until_complete(sys.modules["app.database"].engine.dispose())
+    loop.close()
+
+
+@pytest.fixture
+def run(loop):
+    """Run a coroutine to completion on the session loop."""
+    return loop.run_until_complete
+
+
+@pytest.fixture
+def database(run):
+    """Create the schema and search index; empty every table afterwards."""
+    from sqlalchemy import text
+    import app.models  # noqa: F401 (registers every table)
+    from app.database import Base, engine, init_db
+    from app.services.search import search_service
+
+    async def setup():
+        await init_db()
+        async with engine.begin() as conn:
+            await search_service.init(conn)
+
+    async def clear():
+        async with engine.begin() as conn:
+            for table in reversed(Base.metadata.sorted_tables):
+                await conn.execute(table.delete())
+            await conn.execute(text("DELETE FROM lecture_fts"))
+
+    run(setup())
+    yield
+    run(clear())
@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import delete
+from app.database import AsyncSessionLocal
+from app.models.lecture import Lecture
+from app.services.audio_pipeline import audio_pipeline
+from app.services.storage import storage_service
+
+
+@pytest.fixture
+def compact(monkeypatch):
+    """A transcode result whose variant exists on disk, without running ffmpeg."""
+    path = storage_service.derived_path("feedface", ".speech.ogg")
+    path.write_bytes(b"opus")
+    sidecar = storage_service.derived_path("feedface", ".speech.json")
+    sidecar.write_text("{}")
+    result = {"path": str(path), "duration": 61.6, "speech_duration": 50.0, "time_map": []}
+
+    async def process(audio_path, content_hash):
+        return result
+
+    monkeypatch.setattr(audio_pipeline, "process", process)
+    return result
+
+
+async def create_lecture() -> str:
+    async with AsyncSessionLocal() as db:
+        lecture = Lecture(title="Lecture", audio_path="/audio/feedface.webm", audio_hash="feedface")
+        db.add(lecture)
+        await db.commit()
+        return lecture.id
+
+
+def test_process_lecture_records_the_compact_variant(database, run, compact):
+    lecture_id = run(create_lecture())
+
+    async def main():
+        async with AsyncSessionLocal() as db:
+            lecture = await db.get(Lecture, lecture_id)
+            assert await audio_pipeline.process_lecture(db, lecture) == compact
+        async with AsyncSessionLocal() as db:
+            return await db.get(Lecture, lecture_id)
+
+    lecture = run(main())
+    assert lecture.compact_audio_path == compact["path"]
+    assert lecture.duration_sec == 62
+
+
+def test_lecture_deleted_during_processing_leaves_no_variant(database, run, compact):
+    lecture_id = run(create_lecture())
+
+    async def main():
+        async with AsyncSessionLocal() as db:
+            lecture = await db.get(Lecture, lecture_id)
+            async with AsyncSessionLocal() as other:
+                await other.execute(delete(Lecture).where(Lecture.id == lecture_id))
+                await other.commit()
+            return await audio_pipeline.process_lecture(db, lecture)
+
+    assert run(main()) is None
+    path = storage_service.derived_path("feedface", ".speech.ogg")
+    assert not path.exists() and not path.with_suffix(".json").exists()
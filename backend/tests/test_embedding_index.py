@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+import numpy as np
+from app.services.embedding_index import build_index, normalize_rows, top_k
+
+
+def stored(lecture_id: str, passages, vectors) -> SimpleNamespace:
+    """A LectureEmbedding row as it comes back from the database."""
+    matrix = normalize_rows(np.asarray(vectors, dtype=np.float32))
+    return SimpleNamespace(
+        lecture_id=lecture_id,
+        passages=passages,
+        dimensions=matrix.shape[1],
+        vectors=matrix.tobytes()
+    )
+
+
+def test_normalize_rows():
+    rows = normalize_rows(np.array([[3.0, 4.0], [0.0, 0.0]]))
+    assert rows.dtype == np.float32
+    assert np.allclose(rows, [[0.6, 0.8], [0.0, 0.0]])
+
+
+def test_top_k_matches_a_full_sort():
+    rng = np.random.default_rng(0)
+    matrix = normalize_rows(rng.normal(size=(500, 32)))
+    query = normalize_rows(rng.normal(size=(1, 32)))[0]
+    rows, scores = top_k(matrix, query, 10)
+    expected = np.argsort(-(matrix @ query))[:10]
+    assert rows.tolist() == expected.tolist()
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_top_k_with_k_beyond_the_rows():
+    matrix = normalize_rows(np.eye(3))
+    rows, scores = top_k(matrix, matrix[1], 10)
+    assert rows[0] == 1 and len(rows) == 3
+    assert np.isclose(scores[0], 1.0)
+
+
+def test_top_k_on_an_empty_matrix():
+    rows, scores = top_k(np.zeros((0, 4), dtype=np.float32), np.ones(4, dtype=np.float32), 5)
+    assert len(rows) == len(scores) == 0
+
+
+def test_index_search_maps_rows_back_to_lectures():
+    index = build_index(
+        (("a", "h1"), ("b", "h2")),
+        [
+            stored("a", ["cells", "atoms"], [[1, 0, 0], [0, 1, 0]]),
+            stored("b", ["stars"], [[0, 0, 1]]),
+        ]
+    )
+    assert index.matrix.shape == (3, 3)
+    results = index.search(np.array([0.1, 0.2, 0.9], dtype=np.float32), 2)
+    assert [(p.lecture_id, p.text) for p in results] == [("b", "stars"), ("a", "atoms")]
+    assert results[0].score > results[1].score
+
+
+def test_empty_index():
+    index = build_index((), [])
+    assert index.passages == []
+    assert index.matrix.shape[0] == len(index.owners) == 0
@@ -0,0 +1,247 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+import pytest
+from app.database import AsyncSessionLocal
+from app.services import generation as generation_module
+from app.services.generation import FORMAT_ERROR_CONTENT, GenerationService, cache_key
+from app.services.material_cache import material_cache
+
+
+class FakeModel:
+    """Stands in for _complete: counts calls and holds them until released."""
+
+    def __init__(self, content: str = "# Notes"):
+        self.content = content
+        self.calls = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self, transcript, material_type, priority):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return self.content
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = GenerationService()
+    model = FakeModel()
+    monkeypatch.setattr(service, "_complete", model)
+    service.model = model
+    return service
+
+
+def transcript() -> str:
+    # Unique per test: the in-memory material cache outlives each test
+    return f"Lecture {uuid.uuid4()}. Heat flows from hot to cold."
+
+
+async def generate(service, text, material_type="notes"):
+    async with AsyncSessionLocal() as db:
+        return await service.generate_cached(db, text, material_type)
+
+
+async def settle():
+    await asyncio.sleep(0.01)
+
+
+def test_second_request_is_served_from_the_cache(database, run, service):
+    text = transcript()
+    service.model.release.set()
+    content, cached, _ = run(generate(service, text))
+    assert (content, cached) == ("# Notes", False)
+
+    content, cached, _ = run(generate(service, text))
+    assert (content, cached) == ("# Notes", True)
+    assert service.model.calls == 1
+
+
+def test_concurrent_identical_requests_share_one_call(database, run, service):
+    text = transcript()
+
+    async def main():
+        first = asyncio.create_task(generate(service, text))
+        second = asyncio.create_task(generate(service, text))
+        other_type = asyncio.create_task(generate(service, text, "quiz"))
+        await settle()
+        assert service.model.calls == 2  # notes once, quiz once
+        service.model.release.set()
+        return await asyncio.gather(first, second, other_type)
+
+    (a, a_cached, _), (b, b_cached, _), _ = run(main())
+    assert a == b == "# Notes" and not a_cached and not b_cached
+    assert service.model.calls == 2
+    assert not service._inflight
+
+
+def test_format_errors_are_not_cached(database, run, service):
+    text = transcript()
+    service.model.content = FORMAT_ERROR_CONTENT
+    service.model.release.set()
+    run(generate(service, text, "flashcards"))
+    content, cached, _ = run(generate(service, text, "flashcards"))
+    assert content == FORMAT_ERROR_CONTENT and not cached
+    assert service.model.calls == 2
+
+
+def test_leaving_waiter_does_not_cancel_shared_generation(database, run, service):
+    text = transcript()
+
+    async def main():
+        leaving = asyncio.create_task(generate(service, text))
+        staying = asyncio.create_task(generate(service, text))
+        await settle()
+        leaving.cancel()
+        await settle()
+        assert service.model.cancelled == 0
+        service.model.release.set()
+        return await staying
+
+    content, _, _ = run(main())
+    assert content == "# Notes"
+    assert service.model.calls == 1
+
+
+def test_generation_stops_when_every_waiter_leaves(database, run, service):
+    text = transcript()
+
+    async def main():
+        waiters = [asyncio.create_task(generate(service, text)) for _ in range(2)]
+        await settle()
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await settle()
+
+    run(main())
+    assert service.model.cancelled == 1
+    assert not service._inflight and not service._waiters
+
+    # The next request starts afresh instead of attaching to the cancelled task
+    service.model.release.set()
+    content, cached, _ = run(generate(service, text))
+    assert (content, cached) == ("# Notes", False)
+    assert service.model.calls == 2
+
+
+class FakeStream:
+    """A streaming chat completion that sends one delta per allow()."""
+
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self._allowed = asyncio.Semaphore(0)
+        self.closed = False
+
+    def allow(self):
+        self._allowed.release()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.closed = True
+
+    async def __aiter__(self):
+        for delta in self.deltas:
+            await self._allowed.acquire()
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    calls = []
+
+    async def chat(**kwargs):
+        calls.append(kwargs)
+        return stream
+
+    stream = FakeStream([])
+    monkeypatch.setattr(generation_module.llm_client, "chat", chat)
+    return SimpleNamespace(calls=calls, use=lambda deltas: setattr(stream, "deltas", deltas), stream=stream)
+
+
+async def until_called(llm):
+    while not llm.calls:
+        await asyncio.sleep(0.01)
+
+
+async def collect(service, task, broadcast):
+    return [piece async for piece in service.follow(task, broadcast)]
+
+
+def test_identical_streams_share_one_call_and_late_followers_catch_up(database, run, llm):
+    service = GenerationService()
+    text = transcript()
+    key = cache_key(text, "notes")
+    llm.use(["Heat ", "flows."])
+
+    async def main():
+        task, broadcast = service.start_stream(key, text, "notes")
+        first = asyncio.create_task(collect(service, task, broadcast))
+        await until_called(llm)
+        llm.stream.allow()
+        await settle()
+
+        # Joins after the first delta was sent
+        same_task, same_broadcast = service.start_stream(key, text, "notes")
+        assert same_task is task
+        second = asyncio.create_task(collect(service, same_task, same_broadcast))
+        llm.stream.allow()
+        pieces = await asyncio.gather(first, second)
+
+        # /generate attaches to the same generation
+        async with AsyncSessionLocal() as db:
+            cached = await service.generate_cached(db, text, "notes")
+        return pieces, task.result(), cached
+
+    pieces, (content, _), (cached_content, cached, _) = run(main())
+    assert pieces == [["Heat ", "flows."], ["Heat ", "flows."]]
+    assert content == cached_content == "Heat flows."
+    assert cached and len(llm.calls) == 1
+
+
+def test_stream_without_valid_items_is_a_format_error(database, run, llm):
+    service = GenerationService()
+    text = transcript()
+    key = cache_key(text, "flashcards")
+    llm.use(['[{"nonsense": true}]'])
+
+    async def main():
+        task, broadcast = service.start_stream(key, text, "flashcards")
+        follower = asyncio.create_task(collect(service, task, broadcast))
+        await until_called(llm)
+        llm.stream.allow()
+        return await follower, task.result()
+
+    pieces, (content, _) = run(main())
+    assert pieces == [] and content == FORMAT_ERROR_CONTENT
+
+    async def lookup():
+        async with AsyncSessionLocal() as db:
+            return await material_cache.get(db, key)
+
+    assert run(lookup()) is None
+
+
+def test_stream_stops_when_every_follower_leaves(database, run, llm):
+    service = GenerationService()
+    text = transcript()
+    llm.use(["never ", "sent"])
+
+    async def main():
+        task, broadcast = service.start_stream(cache_key(text, "notes"), text, "notes")
+        follower = asyncio.create_task(collect(service, task, broadcast))
+        await until_called(llm)
+        follower.cancel()
+        await asyncio.gather(follower, return_exceptions=True)
+        await settle()
+        return task
+
+    task = run(main())
+    assert task.cancelled() and llm.stream.closed
+    assert not service._inflight and not service._waiters
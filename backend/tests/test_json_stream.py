@@ -0,0 +1,53 @@
+from app.services.json_stream import JSONArrayStreamParser
+
+
+def feed_all(parser, pieces):
+    items = []
+    for piece in pieces:
+        items.extend(parser.feed(piece))
+    return items
+
+
+def test_items_are_returned_as_soon_as_they_close():
+    parser = JSONArrayStreamParser()
+    assert parser.feed('[{"question": "Q1", ') == []
+    assert parser.feed('"answer": "A1"}, {"quest') == [{"question": "Q1", "answer": "A1"}]
+    assert parser.feed('ion": "Q2", "answer": "A2"}]') == [{"question": "Q2", "answer": "A2"}]
+    assert parser.done
+
+
+def test_one_character_at_a_time():
+    text = '[{"a": 1}, {"b": [1, 2, {"c": 3}]}]'
+    assert feed_all(JSONArrayStreamParser(), text) == [{"a": 1}, {"b": [1, 2, {"c": 3}]}]
+
+
+def test_code_fence_before_the_array_is_skipped():
+    text = '```json\n[{"a": 1}]\n```'
+    assert JSONArrayStreamParser().feed(text) == [{"a": 1}]
+
+
+def test_brackets_and_escaped_quotes_inside_strings():
+    text = r'[{"q": "What is a[0] or {x}?", "a": "say \"]\" here"}]'
+    assert JSONArrayStreamParser().feed(text) == [{"q": "What is a[0] or {x}?", "a": 'say "]" here'}]
+
+
+def test_scalar_elements_are_ignored():
+    text = '["skip ] me", 42, {"a": 1}, null]'
+    assert JSONArrayStreamParser().feed(text) == [{"a": 1}]
+
+
+def test_malformed_element_is_dropped_and_parsing_continues():
+    text = '[{"a": }, {"b": 2}]'
+    assert JSONArrayStreamParser().feed(text) == [{"b": 2}]
+
+
+def test_text_after_the_array_is_ignored():
+    parser = JSONArrayStreamParser()
+    assert parser.feed('[{"a": 1}] trailing [{"b": 2}]') == [{"a": 1}]
+    assert parser.feed('{"c": 3}') == []
+
+
+def test_truncated_stream_returns_only_complete_items():
+    parser = JSONArrayStreamParser()
+    assert parser.feed('[{"a": 1}, {"b": ') == [{"a": 1}]
+    assert not parser.done
@@ -0,0 +1,30 @@
+import base64
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from app.api.lectures import encode_cursor, decode_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 3, 1, 9, 30, 15, 123456, tzinfo=timezone.utc)
+    lecture = SimpleNamespace(created_at=created_at, id="6f1c2d3e-aaaa-bbbb-cccc-1234567890ab")
+    assert decode_cursor(encode_cursor(lecture)) == (created_at, lecture.id)
+
+
+def test_cursor_is_url_safe():
+    lecture = SimpleNamespace(created_at=datetime(2024, 3, 1), id="id/with+chars?")
+    cursor = encode_cursor(lecture)
+    assert all(c.isalnum() or c in "-_=" for c in cursor)
+    assert decode_cursor(cursor)[1] == "id/with+chars?"
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"no separator").decode(),
+    base64.urlsafe_b64encode(b"yesterday|some-id").decode(),
+])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
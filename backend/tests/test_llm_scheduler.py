@@ -0,0 +1,149 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from app.services.llm import Priority, PriorityScheduler, ScheduledStream, TokenBucket
+
+UNLIMITED = 10 ** 9
+
+
+async def settle():
+    """Let the dispatcher and the admitted callers run."""
+    await asyncio.sleep(0.01)
+
+
+def test_higher_priority_is_admitted_first():
+    async def main():
+        scheduler = PriorityScheduler(1, UNLIMITED, UNLIMITED)
+        await scheduler.acquire(Priority.default, 1)
+        order = []
+
+        async def call(name, priority):
+            await scheduler.acquire(priority, 1)
+            order.append(name)
+
+        tasks = [
+            asyncio.create_task(call("bulk", Priority.background)),
+            asyncio.create_task(call("live", Priority.interactive)),
+            asyncio.create_task(call("user", Priority.default)),
+        ]
+        await settle()
+        assert order == [] and scheduler.queue_depth == 3
+
+        for expected in (["live"], ["live", "user"], ["live", "user", "bulk"]):
+            scheduler.release()
+            await settle()
+            assert order == expected
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+
+
+def test_same_priority_is_first_come_first_served():
+    async def main():
+        scheduler = PriorityScheduler(1, UNLIMITED, UNLIMITED)
+        await scheduler.acquire(Priority.default, 1)
+        order = []
+
+        async def call(name):
+            await scheduler.acquire(Priority.default, 1)
+            order.append(name)
+
+        tasks = []
+        for name in ("a", "b", "c"):
+            tasks.append(asyncio.create_task(call(name)))
+            await settle()
+        for _ in tasks:
+            scheduler.release()
+            await settle()
+        assert order == ["a", "b", "c"]
+
+    asyncio.run(main())
+
+
+def test_concurrency_limit():
+    async def main():
+        scheduler = PriorityScheduler(2, UNLIMITED, UNLIMITED)
+        tasks = [asyncio.create_task(scheduler.acquire(Priority.default, 1)) for _ in range(3)]
+        await settle()
+        assert [t.done() for t in tasks] == [True, True, False]
+        assert scheduler.free_slots == 0
+
+        scheduler.release()
+        await settle()
+        assert tasks[2].done()
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_gives_up_its_turn():
+    async def main():
+        scheduler = PriorityScheduler(1, UNLIMITED, UNLIMITED)
+        await scheduler.acquire(Priority.default, 1)
+        first = asyncio.create_task(scheduler.acquire(Priority.interactive, 1))
+        second = asyncio.create_task(scheduler.acquire(Priority.background, 1))
+        await settle()
+
+        first.cancel()
+        await settle()
+        scheduler.release()
+        await settle()
+        assert first.cancelled()
+        assert second.done() and not second.cancelled()
+        assert scheduler.free_slots == 0 and scheduler.queue_depth == 0
+
+    asyncio.run(main())
+
+
+def test_token_bucket_refills_over_a_minute():
+    bucket = TokenBucket(60)
+    assert bucket.wait_time(60) == 0
+    bucket.consume(60)
+    assert bucket.wait_time(30) == pytest.approx(30, abs=0.5)
+    # Reconciliation may take the level below zero
+    bucket.consume(60)
+    assert bucket.wait_time(1) == pytest.approx(61, abs=0.5)
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def close(self):
+        self.closed = True
+
+
+def test_stream_keeps_its_slot_until_closed_then_reconciles():
+    async def main():
+        scheduler = PriorityScheduler(1, UNLIMITED, 1000)
+        await scheduler.acquire(Priority.default, 100)
+        stream = FakeStream([
+            SimpleNamespace(usage=None),
+            SimpleNamespace(usage=SimpleNamespace(total_tokens=40)),
+        ])
+        scheduled = ScheduledStream(stream, scheduler, 100)
+        async with scheduled:
+            async for _ in scheduled:
+                assert scheduler.free_slots == 0
+        assert stream.closed and scheduler.free_slots == 1
+        # 100 estimated, 40 used: 60 refunded
+        assert scheduler.tokens.level == pytest.approx(1000 - 40, abs=1)
+
+    asyncio.run(main())
+
+
+def test_abandoned_stream_releases_its_slot():
+    async def main():
+        scheduler = PriorityScheduler(1, UNLIMITED, UNLIMITED)
+        await scheduler.acquire(Priority.default, 1)
+        stream = FakeStream([SimpleNamespace(usage=None)] * 3)
+        async with ScheduledStream(stream, scheduler, 1) as scheduled:
+            async for _ in scheduled:
+                break
+        assert stream.closed and scheduler.free_slots == 1
+
+    asyncio.run(main())
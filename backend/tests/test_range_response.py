@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+from app.responses import RangeFileResponse, detect_audio_type, parse_range
+
+DATA = bytes(range(256)) * 1024  # 256 KiB, larger than one chunk
+
+
+@pytest.fixture
+def audio(tmp_path):
+    path = tmp_path / "lecture.webm"
+    path.write_bytes(b"\x1a\x45\xdf\xa3" + DATA[4:])
+    return str(path)
+
+
+def serve(response: RangeFileResponse):
+    """Run the response and return (start message, body, body messages)."""
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(response({"type": "http"}, None, send))
+    start, chunks = messages[0], messages[1:]
+    assert chunks[-1]["more_body"] is False
+    return start, b"".join(m["body"] for m in chunks), chunks
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-5000", (990, 999)),
+    (" Bytes = 5 - 9 ", (5, 9)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=0-1,5-9", "items=0-9", "bytes=a-b", "bytes=-", "bytes=5"])
+def test_parse_range_ignores_what_it_cannot_serve(header):
+    assert parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=20-10", "bytes=-0"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+def test_detect_audio_type(tmp_path, audio):
+    assert detect_audio_type(audio) == "audio/webm"
+    wav = tmp_path / "a.bin"
+    wav.write_bytes(b"RIFF\x00\x00\x00\x00WAVEfmt ")
+    assert detect_audio_type(str(wav)) == "audio/wav"
+    unknown = tmp_path / "a.mp3"
+    unknown.write_bytes(b"\x00" * 16)
+    assert detect_audio_type(str(unknown)) == "audio/mpeg"
+
+
+def test_full_response(audio):
+    response = RangeFileResponse(audio, {})
+    start, body, chunks = serve(response)
+    assert start["status"] == 200
+    assert response.headers["content-length"] == str(len(DATA))
+    assert response.headers["accept-ranges"] == "bytes"
+    assert body == open(audio, "rb").read()
+    assert len(chunks) > 1
+
+
+def test_partial_response(audio):
+    response = RangeFileResponse(audio, {"range": "bytes=100-199"})
+    start, body, _ = serve(response)
+    assert start["status"] == 206
+    assert response.headers["content-range"] == f"bytes 100-199/{len(DATA)}"
+    assert response.headers["content-length"] == "100"
+    assert body == DATA[100:200]
+
+
+def test_unsatisfiable_range(audio):
+    response = RangeFileResponse(audio, {"range": f"bytes={len(DATA)}-"})
+    start, body, _ = serve(response)
+    assert start["status"] == 416
+    assert response.headers["content-range"] == f"bytes */{len(DATA)}"
+    assert body == b""
+
+
+def test_etag_revalidation(audio):
+    etag = RangeFileResponse(audio, {}).etag
+    response = RangeFileResponse(audio, {"if-none-match": f"W/{etag}"})
+    start, body, _ = serve(response)
+    assert start["status"] == 304
+    assert "content-length" not in response.headers
+    assert body == b""
+
+
+def test_if_range_with_stale_etag_serves_the_whole_file(audio):
+    response = RangeFileResponse(audio, {"range": "bytes=0-9", "if-range": '"stale"'})
+    assert response.status_code == 200
+    response = RangeFileResponse(audio, {"range": "bytes=0-9", "if-range": response.etag})
+    assert response.status_code == 206
+
+
+def test_head_sends_headers_only(audio):
+    response = RangeFileResponse(audio, {}, method="HEAD")
+    start, body, _ = serve(response)
+    assert start["status"] == 200
+    assert response.headers["content-length"] == str(len(DATA))
+    assert body == b""
+
+
+def test_file_that_shrinks_still_ends_the_body(audio):
+    response = RangeFileResponse(audio, {})
+    with open(audio, "r+b") as f:
+        f.truncate(1000)
+    _, body, _ = serve(response)
+    assert len(body) == 1000
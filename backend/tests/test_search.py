@@ -0,0 +1,32 @@
+from app.database import AsyncSessionLocal
+from app.models.lecture import Lecture, LectureStatus
+from app.services.search import MARK_END, MARK_START, render_snippet, search_service
+
+
+def test_render_snippet_escapes_text_but_keeps_highlights():
+    snippet = "Entropy <img src=x onerror=alert(1)> & more"
+    assert render_snippet(snippet) == (
+        "<mark>Entropy</mark> &lt;img src=x onerror=alert(1)&gt; &amp; more"
+    )
+    assert render_snippet(None) is None
+
+
+def test_search_returns_escaped_highlighted_snippets(database, run):
+    async def main():
+        async with AsyncSessionLocal() as db:
+            lecture = Lecture(
+                title="Thermodynamics",
+                transcript='Entropy always grows. <script>alert("x")</script> Entropy again.',
+                status=LectureStatus.ready
+            )
+            db.add(lecture)
+            await db.flush()
+            await search_service.index_lecture(db, lecture)
+            await db.commit()
+            return await search_service.search(db, "entropy")
+
+    hits = run(main())
+    assert len(hits) == 1
+    snippet = hits[0]["snippet"]
+    assert "<mark>Entropy</mark>" in snippet
+    assert "<script>" not in snippet and "&lt;script&gt;" in snippet
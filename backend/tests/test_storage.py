@@ -0,0 +1,94 @@
+import asyncio
+import io
+import os
+from pathlib import Path
+from sqlalchemy import delete
+from app.database import AsyncSessionLocal
+from app.models.lecture import Lecture
+from app.services.storage import storage_service
+
+
+class Upload:
+    """The part of UploadFile the storage service reads."""
+
+    def __init__(self, data: bytes, filename: str = "lecture.webm"):
+        self.filename = filename
+        self._data = io.BytesIO(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._data.read(size)
+
+
+async def upload_lecture(data: bytes, **columns) -> Lecture:
+    """Store an upload and commit a lecture referencing it, as POST /transcriptions does."""
+    saved = await storage_service.save_audio_file(Upload(data))
+    async with storage_service.publish(saved) as audio_path:
+        async with AsyncSessionLocal() as db:
+            lecture = Lecture(title="Upload", audio_path=audio_path, audio_hash=saved.content_hash, **columns)
+            db.add(lecture)
+            await db.commit()
+    return lecture
+
+
+async def delete_and_release(lecture: Lecture):
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Lecture).where(Lecture.id == lecture.id))
+        await db.commit()
+        await storage_service.release_blob(db, lecture.audio_path)
+
+
+def test_duplicate_uploads_share_one_blob(database, run):
+    first = run(upload_lecture(b"same audio"))
+    second = run(upload_lecture(b"same audio"))
+    assert first.audio_path == second.audio_path
+    assert Path(first.audio_path).name.startswith(first.audio_hash)
+    assert not list(storage_service.upload_dir.glob("*.part"))
+
+
+def test_blob_is_deleted_with_its_last_reference(database, run):
+    first = run(upload_lecture(b"shared audio"))
+    second = run(upload_lecture(b"shared audio"))
+
+    run(delete_and_release(first))
+    assert os.path.exists(second.audio_path)
+
+    run(delete_and_release(second))
+    assert not os.path.exists(second.audio_path)
+
+
+def test_compact_variant_counts_as_a_reference(database, run):
+    compact = storage_service.derived_path("c0ffee", ".speech.ogg")
+    compact.write_bytes(b"opus")
+    sidecar = compact.with_suffix(".json")
+    sidecar.write_text("{}")
+    lecture = run(upload_lecture(b"original audio", compact_audio_path=str(compact)))
+
+    async def release(path):
+        async with AsyncSessionLocal() as db:
+            await storage_service.release_blob(db, path)
+
+    run(release(str(compact)))
+    assert compact.exists() and sidecar.exists()
+
+    run(delete_and_release(lecture))
+    run(release(str(compact)))
+    assert not compact.exists() and not sidecar.exists()
+
+
+def test_release_waits_for_a_blob_being_reused(database, run):
+    first = run(upload_lecture(b"reused audio"))
+
+    async def main():
+        saved = await storage_service.save_audio_file(Upload(b"reused audio"))
+        async with storage_service.publish(saved) as audio_path:
+            # The old lecture goes away while a new one is about to reuse the blob
+            release = asyncio.create_task(delete_and_release(first))
+            await asyncio.sleep(0.05)
+            assert not release.done()
+            async with AsyncSessionLocal() as db:
+                db.add(Lecture(title="Reuse", audio_path=audio_path, audio_hash=saved.content_hash))
+                await db.commit()
+        await release
+
+    run(main())
+    assert os.path.exists(first.audio_path)
@@ -0,0 +1,89 @@
+import numpy as np
+from app.config import settings
+from app.services.streaming_asr import RingBuffer, VoiceActivitySegmenter
+
+RATE = 16000
+
+
+def tone(seconds: float, amplitude: int = 8000) -> np.ndarray:
+    t = np.arange(int(RATE * seconds)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+
+
+def silence(seconds: float) -> np.ndarray:
+    return np.zeros(int(RATE * seconds), dtype=np.int16)
+
+
+def pcm(*parts: np.ndarray) -> bytes:
+    return np.concatenate(parts).astype("<i2").tobytes()
+
+
+def feed_frames(segmenter: VoiceActivitySegmenter, audio: bytes, frame_bytes: int = 3200):
+    """Feed audio in 100 ms messages, as a live client sends it."""
+    utterances = []
+    for offset in range(0, len(audio), frame_bytes):
+        utterances += segmenter.feed(audio[offset:offset + frame_bytes])
+    return utterances
+
+
+def test_ring_buffer_wraps_and_keeps_the_newest_samples():
+    ring = RingBuffer(10)
+    ring.write(np.arange(7, dtype=np.int16))
+    ring.write(np.arange(7, 14, dtype=np.int16))
+    assert (ring.start, ring.end) == (4, 14)
+    assert ring.read(0, 14).tolist() == list(range(4, 14))
+    assert ring.read(6, 9).tolist() == [6, 7, 8]
+    assert len(ring.read(20, 30)) == 0
+
+
+def test_ring_buffer_write_larger_than_capacity():
+    ring = RingBuffer(4)
+    ring.write(np.arange(10, dtype=np.int16))
+    assert ring.end == 10
+    assert ring.read(ring.start, ring.end).tolist() == [6, 7, 8, 9]
+
+
+def test_silence_yields_nothing():
+    segmenter = VoiceActivitySegmenter(RATE)
+    assert segmenter.feed(pcm(silence(3))) == []
+    assert segmenter.flush() is None
+
+
+def test_utterance_ends_after_trailing_silence():
+    segmenter = VoiceActivitySegmenter(RATE)
+    utterances = segmenter.feed(pcm(silence(1), tone(1), silence(1)))
+    assert len(utterances) == 1
+    preroll = RATE * settings.live_asr_preroll_ms // 1000
+    assert RATE <= len(utterances[0]) <= RATE + preroll + 2 * segmenter.frame
+
+
+def test_short_click_is_not_speech():
+    segmenter = VoiceActivitySegmenter(RATE)
+    assert segmenter.feed(pcm(silence(1), tone(0.06), silence(1))) == []
+
+
+def test_long_speech_is_cut_at_max_utterance():
+    segmenter = VoiceActivitySegmenter(RATE)
+    audio = tone(2.5 * settings.live_asr_max_utterance_sec)
+    utterances = feed_frames(segmenter, pcm(audio))
+    tail = segmenter.flush()
+    assert len(utterances) == 2
+    assert all(len(u) <= segmenter.max_utterance for u in utterances)
+    # Cut pieces follow each other without losing or repeating audio
+    assert np.array_equal(np.concatenate(utterances + [tail]), audio)
+
+
+def test_frames_split_at_odd_byte_boundaries():
+    audio = pcm(silence(0.5), tone(1), silence(1))
+    whole = VoiceActivitySegmenter(RATE).feed(audio)
+
+    pieces = feed_frames(VoiceActivitySegmenter(RATE), audio, frame_bytes=333)
+    assert len(pieces) == len(whole) == 1
+    assert np.array_equal(pieces[0], whole[0])
+
+
+def test_flush_returns_the_utterance_in_progress():
+    segmenter = VoiceActivitySegmenter(RATE)
+    assert segmenter.feed(pcm(silence(0.5), tone(1))) == []
+    assert len(segmenter.flush()) >= RATE
+    assert segmenter.flush() is None
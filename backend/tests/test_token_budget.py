@@ -0,0 +1,69 @@
+from app.services.token_budget import chunk_text, count_tokens, fit_text, input_budget, split_sentences
+
+MODEL = "gpt-4o-mini"
+TEXT = " ".join(f"Sentence number {i} explains one more idea." for i in range(200))
+
+
+def test_short_text_is_one_chunk():
+    assert chunk_text("One sentence. Two sentences.", 100, MODEL) == ["One sentence. Two sentences."]
+
+
+def test_chunks_fit_and_keep_every_sentence():
+    chunks = chunk_text(TEXT, 50, MODEL)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk, MODEL) <= 50 for chunk in chunks)
+    assert " ".join(chunks) == TEXT
+    # Split on sentence boundaries only
+    assert all(chunk.endswith(".") for chunk in chunks)
+
+
+def test_sentence_over_budget_is_split_on_words():
+    sentence = " ".join(["word"] * 300) + "."
+    chunks = chunk_text(sentence, 40, MODEL)
+    assert all(count_tokens(chunk, MODEL) <= 40 for chunk in chunks)
+    assert " ".join(chunks) == sentence
+
+
+def test_unspaced_text_over_budget_is_truncated():
+    chunks = chunk_text("x" * 5000, 40, MODEL)
+    assert all(count_tokens(chunk, MODEL) <= 40 for chunk in chunks)
+
+
+def test_fit_text_under_budget_is_unchanged():
+    fitted = fit_text("Short text.", 100, MODEL)
+    assert fitted.text == "Short text."
+    assert fitted.tokens == fitted.original_tokens
+    assert not fitted.over_budget
+
+
+def test_fit_text_keeps_whole_sentences_from_the_head():
+    fitted = fit_text(TEXT, 100, MODEL)
+    assert fitted.over_budget
+    assert fitted.tokens <= 100
+    assert fitted.original_tokens == count_tokens(TEXT, MODEL)
+    assert TEXT.startswith(fitted.text)
+    assert fitted.text.endswith(".")
+
+
+def test_fit_text_keeps_the_tail():
+    fitted = fit_text(TEXT, 100, MODEL, keep="tail")
+    assert fitted.tokens <= 100
+    assert TEXT.endswith(fitted.text)
+    assert fitted.text.startswith("Sentence number")
+
+
+def test_fit_text_truncates_a_single_oversize_sentence():
+    fitted = fit_text(" ".join(["word"] * 500), 20, MODEL)
+    assert 0 < fitted.tokens <= 20
+
+
+def test_split_sentences():
+    assert split_sentences(" One. Two?  Three!\nFour ") == ["One.", "Two?", "Three!", "Four"]
+
+
+def test_input_budget_reserves_prompt_and_reply():
+    prompt = "Summarize this transcript:\n"
+    budget = input_budget(MODEL, 2000, prompt)
+    assert budget < input_budget(MODEL, 1000, prompt)
+    assert budget < input_budget(MODEL, 2000)
+    assert input_budget(MODEL, 10 ** 9, prompt) == 1
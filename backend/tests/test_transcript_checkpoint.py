@@ -0,0 +1,140 @@
+import pytest
+from sqlalchemy import select
+from app.database import AsyncSessionLocal
+from app.models.lecture import Lecture, LectureStatus
+from app.models.transcript_chunk import TranscriptChunk
+from app.services import transcript_checkpoint
+from app.services.transcript_checkpoint import TranscriptCheckpointer, recover_interrupted_recordings
+
+
+async def create_lecture(status: LectureStatus = LectureStatus.recording) -> str:
+    async with AsyncSessionLocal() as db:
+        lecture = Lecture(title="Thermodynamics", status=status)
+        db.add(lecture)
+        await db.commit()
+        return lecture.id
+
+
+async def stored_chunks(lecture_id: str):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(TranscriptChunk.seq, TranscriptChunk.text)
+            .where(TranscriptChunk.lecture_id == lecture_id)
+            .order_by(TranscriptChunk.seq)
+        )
+        return result.all()
+
+
+class FailingCommits:
+    """Session factory whose first commit fails, before or after it reaches the database."""
+
+    def __init__(self, after_commit: bool):
+        self.after_commit = after_commit
+        self.failed = False
+
+    def __call__(self):
+        session = AsyncSessionLocal()
+        commit = session.commit
+
+        async def failing_commit():
+            if self.failed:
+                return await commit()
+            self.failed = True
+            if self.after_commit:
+                await commit()
+            raise ConnectionError("connection lost")
+
+        session.commit = failing_commit
+        return session
+
+
+def test_chunks_are_numbered_and_flushed_in_one_batch(database, run):
+    lecture_id = run(create_lecture())
+    checkpointer = TranscriptCheckpointer(lecture_id, interval=60, max_chars=1000)
+    assert checkpointer.append("Hello ") == 1
+    assert checkpointer.append("world.") == 2
+    assert run(stored_chunks(lecture_id)) == []
+
+    run(checkpointer.flush())
+    assert run(stored_chunks(lecture_id)) == [(1, "Hello "), (2, "world.")]
+    assert checkpointer.durable_seq == 2
+    assert checkpointer.text == "Hello world."
+
+
+def test_resume_skips_chunks_already_stored(database, run):
+    lecture_id = run(create_lecture())
+    first = TranscriptCheckpointer(lecture_id, interval=60, max_chars=1000)
+    first.append("one ", 1)
+    first.append("two ", 2)
+    run(first.close())
+
+    # A reconnecting client resends what it is unsure about
+    resumed = TranscriptCheckpointer(lecture_id, interval=60, max_chars=1000)
+    run(resumed.load())
+    assert resumed.durable_seq == resumed.last_seq == 2
+    assert resumed.chunks_after(1) == [(2, "two ")]
+    assert resumed.append("two ", 2) is None
+    assert resumed.append("three", 3) == 3
+    run(resumed.close())
+    assert run(stored_chunks(lecture_id)) == [(1, "one "), (2, "two "), (3, "three")]
+
+
+def test_failed_flush_is_retried_with_the_next_batch(database, run, monkeypatch):
+    lecture_id = run(create_lecture())
+    monkeypatch.setattr(transcript_checkpoint, "AsyncSessionLocal", FailingCommits(after_commit=False))
+    checkpointer = TranscriptCheckpointer(lecture_id, interval=60, max_chars=1000)
+    checkpointer.append("a ")
+    with pytest.raises(ConnectionError):
+        run(checkpointer.flush())
+    assert checkpointer.durable_seq == 0
+
+    checkpointer.append("b")
+    run(checkpointer.flush())
+    assert run(stored_chunks(lecture_id)) == [(1, "a "), (2, "b")]
+    assert checkpointer.durable_seq == 2
+
+
+def test_retry_after_an_unacknowledged_commit_writes_no_duplicates(database, run, monkeypatch):
+    lecture_id = run(create_lecture())
+    monkeypatch.setattr(transcript_checkpoint, "AsyncSessionLocal", FailingCommits(after_commit=True))
+    checkpointer = TranscriptCheckpointer(lecture_id, interval=60, max_chars=1000)
+    checkpointer.append("a ")
+    checkpointer.append("b ")
+    with pytest.raises(ConnectionError):
+        run(checkpointer.flush())
+
+    # The rows are stored; the retry must not trip the (lecture_id, seq) constraint
+    checkpointer.append("c")
+    run(checkpointer.flush())
+    assert run(stored_chunks(lecture_id)) == [(1, "a "), (2, "b "), (3, "c")]
+    assert checkpointer.durable_seq == 3
+
+
+def test_pending_characters_request_an_early_flush(database, run):
+    lecture_id = run(create_lecture())
+    checkpointer = TranscriptCheckpointer(lecture_id, interval=60, max_chars=10)
+    checkpointer.append("short")
+    assert not checkpointer._flush_requested.is_set()
+    checkpointer.append("enough text")
+    assert checkpointer._flush_requested.is_set()
+
+
+def test_recover_interrupted_recordings(database, run):
+    interrupted = run(create_lecture())
+    checkpointer = TranscriptCheckpointer(interrupted, interval=60, max_chars=1000)
+    checkpointer.append("Recovered ")
+    checkpointer.append("transcript.")
+    run(checkpointer.flush())
+    empty = run(create_lecture())
+
+    assert run(recover_interrupted_recordings()) == [interrupted]
+
+    async def load(lecture_id):
+        async with AsyncSessionLocal() as db:
+            return await db.get(Lecture, lecture_id)
+
+    lecture = run(load(interrupted))
+    assert lecture.status == LectureStatus.ready
+    assert lecture.transcript == "Recovered transcript."
+    # Nothing was checkpointed, so the session is left to resume
+    assert run(load(empty)).status == LectureStatus.recording
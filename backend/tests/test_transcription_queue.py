@@ -0,0 +1,160 @@
+import asyncio
+import pytest
+from app.database import AsyncSessionLocal
+from app.models.lecture import Lecture, LectureStatus
+from app.models.transcription_job import TranscriptionJob, JobStatus
+from app.services import transcription_queue as queue_module
+from app.services.transcription_queue import TranscriptionQueue
+
+
+class FakeWhisper:
+    """Transcribes instantly, or holds calls until released when gated."""
+
+    def __init__(self, gated: bool = False):
+        self.release = asyncio.Event()
+        if not gated:
+            self.release.set()
+        self.started = 0
+        self.cancelled = 0
+
+    async def __call__(self, audio_path, source_key=None, on_progress=None):
+        self.started += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return f"Transcript of {audio_path}"
+
+
+@pytest.fixture
+def whisper(monkeypatch):
+    async def no_compact(db, lecture):
+        return None
+
+    async def no_insights(transcript, priority=None):
+        return []
+
+    async def record(lecture_id, insights):
+        pass
+
+    whisper = FakeWhisper()
+    monkeypatch.setattr(queue_module.whisper_service, "transcribe_audio_file", whisper)
+    monkeypatch.setattr(queue_module.audio_pipeline, "process_lecture", no_compact)
+    monkeypatch.setattr(queue_module.lecture_buddy_service, "analyze_transcript_chunk", no_insights)
+    monkeypatch.setattr(queue_module.glossary_service, "record", record)
+    monkeypatch.setattr(queue_module.generation_service, "schedule_pregeneration", lambda transcript: None)
+    monkeypatch.setattr(queue_module.embedding_index, "schedule", lambda lecture_id, transcript: None)
+    return whisper
+
+
+async def create_job(status: JobStatus = JobStatus.queued) -> TranscriptionJob:
+    async with AsyncSessionLocal() as db:
+        lecture = Lecture(title="Lecture", audio_path="/audio/lecture.webm", status=LectureStatus.processing)
+        db.add(lecture)
+        await db.flush()
+        job = TranscriptionJob(lecture_id=lecture.id, status=status)
+        db.add(job)
+        await db.commit()
+        return job
+
+
+async def load(job_id: str):
+    async with AsyncSessionLocal() as db:
+        job = await db.get(TranscriptionJob, job_id)
+        return job, await db.get(Lecture, job.lecture_id)
+
+
+async def wait_until(predicate, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+async def job_status(job_id: str) -> JobStatus:
+    job, _ = await load(job_id)
+    return job.status
+
+
+def test_start_recovers_queued_and_interrupted_jobs(database, run, whisper):
+    queued = run(create_job(JobStatus.queued))
+    interrupted = run(create_job(JobStatus.running))
+    finished = run(create_job(JobStatus.done))
+    queue = TranscriptionQueue(1)
+
+    async def main():
+        await queue.start()
+        await asyncio.wait_for(queue._queue.join(), 2)
+        await queue.stop()
+
+    run(main())
+    for job_id in (queued.id, interrupted.id):
+        job, lecture = run(load(job_id))
+        assert job.status == JobStatus.done and job.progress == 100 and job.attempts == 1
+        assert lecture.status == LectureStatus.ready
+        assert lecture.transcript == "Transcript of /audio/lecture.webm"
+    assert whisper.started == 2
+    assert run(job_status(finished.id)) == JobStatus.done
+
+
+def test_cancel_stops_a_running_job_and_the_worker_carries_on(database, run, whisper):
+    whisper.release.clear()
+    running = run(create_job())
+    queue = TranscriptionQueue(1)
+
+    async def main():
+        await queue.start()
+        await wait_until(lambda: _started(whisper))
+        async with AsyncSessionLocal() as db:
+            job = await queue.get_latest_job(db, running.lecture_id)
+            await queue.cancel(db, job)
+        await wait_until(lambda: _cancelled(whisper))
+
+        # The worker survives a cancelled job and runs the next one
+        whisper.release.set()
+        next_job = await create_job()
+        async with AsyncSessionLocal() as db:
+            enqueued = await queue.enqueue(db, next_job.lecture_id)
+        await wait_until(lambda: _is_done(enqueued.id))
+        await queue.stop()
+        return job.id
+
+    cancelled_id = run(main())
+    job, lecture = run(load(cancelled_id))
+    assert job.status == JobStatus.cancelled
+    assert lecture.status == LectureStatus.error
+
+
+def test_cancelled_job_is_skipped_when_dequeued(database, run, whisper):
+    whisper.release.clear()
+    blocking = run(create_job())
+    waiting = run(create_job())
+    queue = TranscriptionQueue(1)
+
+    async def main():
+        # Concurrency 1: the second job waits behind the first
+        await queue.start()
+        await wait_until(lambda: _started(whisper))
+        async with AsyncSessionLocal() as db:
+            await queue.cancel(db, await db.get(TranscriptionJob, waiting.id))
+        whisper.release.set()
+        await asyncio.wait_for(queue._queue.join(), 2)
+        await queue.stop()
+
+    run(main())
+    assert whisper.started == 1
+    assert run(job_status(blocking.id)) == JobStatus.done
+    assert run(job_status(waiting.id)) == JobStatus.cancelled
+
+
+async def _started(whisper: FakeWhisper) -> bool:
+    return whisper.started > 0
+
+
+async def _cancelled(whisper: FakeWhisper) -> bool:
+    return whisper.cancelled > 0
+
+
+async def _is_done(job_id: str) -> bool:
+    return await job_status(job_id) == JobStatus.done
@@ -0,0 +1,74 @@
+from app.services.whisper import plan_segments, stitch_segments
+
+OVERLAP = 5.0  # seconds shared by neighbouring segments
+
+
+def test_plan_segments_short_file_is_one_segment():
+    assert plan_segments(90.0, 600, 5) == [(0.0, 90.0)]
+
+
+def test_plan_segments_overlap_and_cover_the_file():
+    segments = plan_segments(1500.0, 600, 5)
+    assert segments == [(0.0, 600.0), (595.0, 1195.0), (1190.0, 1500.0)]
+    for (_, end), (start, _) in zip(segments, segments[1:]):
+        assert end - start == 5
+
+
+def test_plan_segments_never_steps_backwards():
+    # Overlap at least as long as the segment still advances
+    segments = plan_segments(3.0, 2, 5)
+    assert segments == [(0.0, 2.0), (1.0, 3.0)]
+
+
+def test_stitch_drops_words_repeated_in_the_overlap():
+    texts = [
+        "the mitochondria is the powerhouse of the cell",
+        "powerhouse of the cell and it makes ATP",
+    ]
+    assert stitch_segments(texts, OVERLAP) == "the mitochondria is the powerhouse of the cell and it makes ATP"
+
+
+def test_stitch_matches_across_case_and_punctuation():
+    texts = ["we now turn to Entropy, which measures", "entropy which measures disorder."]
+    assert stitch_segments(texts, OVERLAP) == "we now turn to Entropy, which measures disorder."
+
+
+def test_stitch_concatenates_when_the_overlap_does_not_match():
+    assert stitch_segments(["first part here", "second part there"], OVERLAP) == "first part here second part there"
+
+
+def test_stitch_ignores_short_accidental_matches():
+    # Two common words are not enough evidence of an overlap
+    assert stitch_segments(["this is it", "it is done"], OVERLAP) == "this is it it is done"
+
+
+def test_stitch_only_accepts_matches_at_the_seam():
+    # "one of the other letters" repeats far from the boundary; "sigma tau"
+    # at the seam is too short to be trusted, so nothing may be dropped
+    first = (
+        "alpha beta gamma one of the other letters delta epsilon zeta eta theta iota "
+        "kappa lambda mu nu xi omicron pi rho omega and then sigma tau"
+    )
+    second = "sigma tau upsilon phi chi psi and one of the other letters"
+    assert stitch_segments([first, second], OVERLAP) == first + " " + second
+
+
+def test_stitch_rejects_a_match_that_does_not_line_up_in_time():
+    first = "we said one of the things that matters here is energy conservation in closed systems"
+    second = "systems matter moves but in the end it is one of the"
+    assert stitch_segments([first, second], OVERLAP) == first + " " + second
+
+
+def test_stitch_tolerates_a_word_cut_at_the_boundary():
+    texts = [
+        "we talk about the heat equation in one dimen",
+        "dimension the heat equation in one dimension is a partial differential equation",
+    ]
+    assert stitch_segments(texts, OVERLAP) == (
+        "we talk about the heat equation in one dimension is a partial differential equation"
+    )
+
+
+def test_stitch_empty_input():
+    assert stitch_segments([], OVERLAP) == ""
+    assert stitch_segments(["", "hello world"], OVERLAP) == "hello world"
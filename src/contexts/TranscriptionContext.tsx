@@ -14,6 +14,22 @@ interface TranscriptionContextType {
   saveRecording: (title: string, folderId?: string) => Promise<void>;
 }
 
+// A background upload transcription is polled with backoff until it finishes
+const UPLOAD_POLL_INTERVAL_MS = 2000;
+const UPLOAD_POLL_MAX_INTERVAL_MS = 15000;
+// Give up waiting after this long; the job itself keeps running on the backend
+const UPLOAD_POLL_TIMEOUT_MS = 60 * 60 * 1000;
+
+// Resolve after ms, or reject as soon as the signal aborts
+const delay = (ms: number, signal: AbortSignal) =>
+  new Promise<void>((resolve, reject) => {
+    const timer = setTimeout(resolve, ms);
+    signal.addEventListener('abort', () => {
+      clearTimeout(timer);
+      reject(signal.reason);
+    }, { once: true });
+  });
+
 const TranscriptionContext = createContext<TranscriptionContextType | undefined>(undefined);
 
 export function TranscriptionProvider({ children }: { children: ReactNode }) {
@@ -26,10 +42,12 @@ export function TranscriptionProvider({ children }: { children: ReactNode }) {
   const audioContextRef = useRef<AudioContext | null>(null);
   const analyserRef = useRef<AnalyserNode | null>(null);
   const animationFrameRef = useRef<number | null>(null);
+  const uploadPollRef = useRef<AbortController | null>(null);
 
-  // Cleanup audio level monitoring on unmount
+  // Cleanup audio level monitoring and upload polling on unmount
   useEffect(() => {
     return () => {
+      uploadPollRef.current?.abort();
       if (animationFrameRef.current) {
         cancelAnimationFrame(animationFrameRef.current);
       }
@@ -320,6 +338,11 @@ export function TranscriptionProvider({ children }: { children: ReactNode }) {
   };
 
   const uploadAudio = async (file: File) => {
+    // Stop polling for an earlier upload
+    uploadPollRef.current?.abort();
+    const poll = new AbortController();
+    uploadPollRef.current = poll;
+
     const newSession: TranscriptionSession = {
       id: `upload-${Date.now()}`,
       status: 'uploading',
@@ -332,21 +355,54 @@ export function TranscriptionProvider({ children }: { children: ReactNode }) {
     try {
       // Upload to backend
       const result = await api.uploadAudioFile(file);
-      
-      // Update session with results
+      if (poll.signal.aborted) return;
+
+      // A recording transcribed before comes back finished
+      if (result.status === 'ready' && result.transcript != null) {
+        setSession({
+          id: result.id,
+          status: 'done',
+          transcript: result.transcript,
+          aiInsights: (result.ai_insights ?? []) as any[],
+          durationSec: 0,
+        });
+        return;
+      }
+
+      // Otherwise transcription runs on the backend worker pool: poll until it finishes
+      setSession((prev) => prev ? { ...prev, id: result.id, status: 'transcribing' } : prev);
+      const deadline = Date.now() + UPLOAD_POLL_TIMEOUT_MS;
+      let interval = UPLOAD_POLL_INTERVAL_MS;
+      for (;;) {
+        if (Date.now() + interval > deadline) {
+          throw new Error('Transcription is taking too long. It continues in the background; check the lecture later.');
+        }
+        await delay(interval, poll.signal);
+        const status = await api.getTranscriptionStatus(result.id, poll.signal);
+        if (status.status === 'error') {
+          throw new Error(status.error || 'Transcription failed');
+        }
+        if (status.status === 'ready') break;
+        interval = Math.min(interval * 1.5, UPLOAD_POLL_MAX_INTERVAL_MS);
+      }
+
+      const lecture = await api.getLectureTranscript(result.id, poll.signal);
       setSession({
         id: result.id,
         status: 'done',
-        transcript: result.transcript,
-        aiInsights: result.ai_insights as any[],
-        durationSec: 0, // Backend should return this
+        transcript: lecture.transcript,
+        aiInsights: lecture.ai_insights as any[],
+        durationSec: lecture.duration_sec ?? 0,
       });
     } catch (error) {
+      // Unmounted, reset or superseded by another upload: nothing to report
+      if (poll.signal.aborted) return;
       console.error('Failed to upload audio:', error);
-      setSession((prev) => prev ? { ...prev, status: 'error' } : prev);
+      const message = error instanceof Error ? error.message : 'Failed to upload audio';
+      setSession((prev) => prev ? { ...prev, status: 'error', error: message } : prev);
       handleStreamEvent({ 
         type: 'error', 
-        message: error instanceof Error ? error.message : 'Failed to upload audio' 
+        message 
       });
     }
   };
@@ -378,6 +434,8 @@ export function TranscriptionProvider({ children }: { children: ReactNode }) {
   };
 
   const resetSession = () => {
+    uploadPollRef.current?.abort();
+    uploadPollRef.current = null;
     setSession(null);
     setAudioLevel(0);
   };
@@ -146,8 +146,12 @@ export function TranscriptionStream() {
               />
             </svg>
             <span>
-              We hit a problem with real-time transcription. Your existing transcript and lecture
-              buddy cards are preserved, but new audio may not be processed.
+              {session.error ?? (
+                <>
+                  We hit a problem with real-time transcription. Your existing transcript and lecture
+                  buddy cards are preserved, but new audio may not be processed.
+                </>
+              )}
             </span>
           </div>
         </div>
@@ -60,7 +60,15 @@ export const api = {
     return response.json();
   },
 
-  async uploadAudioFile(file: File): Promise<{ id: string; transcript: string; ai_insights: unknown[] }> {
+  // transcript/ai_insights are only set when the recording was transcribed before;
+  // otherwise the job runs in the background (see getTranscriptionStatus)
+  async uploadAudioFile(file: File): Promise<{
+    id: string;
+    status: string;
+    job_id?: string | null;
+    transcript?: string | null;
+    ai_insights?: unknown[] | null;
+  }> {
     const formData = new FormData();
     formData.append('file', file);
     
@@ -72,6 +80,33 @@ export const api = {
     return response.json();
   },
 
+  async getTranscriptionStatus(id: string, signal?: AbortSignal): Promise<{
+    id: string;
+    status: string;
+    job_status?: string | null;
+    progress: number;
+    error?: string | null;
+  }> {
+    const response = await fetch(`${API_BASE_URL}/transcriptions/${id}/status`, { signal });
+    if (!response.ok) throw new Error('Failed to fetch transcription status');
+    return response.json();
+  },
+
+  async getLectureTranscript(id: string, signal?: AbortSignal): Promise<{
+    transcript: string;
+    ai_insights: unknown[];
+    duration_sec?: number | null;
+  }> {
+    const response = await fetch(`${API_BASE_URL}/lectures/${id}`, { signal });
+    if (!response.ok) throw new Error('Failed to fetch lecture');
+    const json = await response.json();
+    return {
+      transcript: json.transcript ?? '',
+      ai_insights: json.ai_insights ?? [],
+      duration_sec: json.duration_sec,
+    };
+  },
+
   async finalizeTranscription(): Promise<void> {
     // Not needed anymore - handled by WebSocket close
     return Promise.resolve();
@@ -151,16 +186,42 @@ export const api = {
     return response.json();
   },
 
+  async ask(
+    question: string,
+    scope: 'lecture' | 'folder',
+    id: string
+  ): Promise<{ answer: string; sources: { lecture_id: string; title: string; text: string; score: number }[] }> {
+    const response = await fetch(`${API_BASE_URL}/ask`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ question, scope, id }),
+    });
+    if (!response.ok) throw new Error('Failed to answer question');
+    return response.json();
+  },
+
   // Library endpoints
   async getLectures(folderId?: string): Promise<Lecture[]> {
-    const url = folderId 
-      ? `${API_BASE_URL}/lectures?folder_id=${folderId}`
-      : `${API_BASE_URL}/lectures`;
-    
-    const response = await fetch(url);
-    if (!response.ok) throw new Error('Failed to fetch lectures');
-    const data: LectureApi[] = await response.json();
-    return data.map(mapLectureFromApi);
+    const lectures: Lecture[] = [];
+    let cursor: string | null = null;
+
+    // The backend pages results; follow X-Next-Cursor until exhausted
+    do {
+      const params = new URLSearchParams();
+      if (folderId) params.set('folder_id', folderId);
+      if (cursor) params.set('cursor', cursor);
+      const query = params.toString();
+
+      const response = await fetch(`${API_BASE_URL}/lectures${query ? `?${query}` : ''}`);
+      if (!response.ok) throw new Error('Failed to fetch lectures');
+      const data: LectureApi[] = await response.json();
+      lectures.push(...data.map(mapLectureFromApi));
+      cursor = response.headers.get('X-Next-Cursor');
+    } while (cursor);
+
+    return lectures;
   },
 
   async createLecture(data: Omit<Lecture, 'id' | 'createdAt'>): Promise<Lecture> {
@@ -196,6 +257,32 @@ export const api = {
     if (!response.ok) throw new Error('Failed to delete lecture');
   },
 
+  async moveLectures(ids: string[], folderId: string | null): Promise<number> {
+    const response = await fetch(`${API_BASE_URL}/lectures/bulk/move`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ lecture_ids: ids, folder_id: folderId }),
+    });
+    if (!response.ok) throw new Error('Failed to move lectures');
+    const json: { count: number } = await response.json();
+    return json.count;
+  },
+
+  async deleteLectures(ids: string[]): Promise<number> {
+    const response = await fetch(`${API_BASE_URL}/lectures/bulk/delete`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ lecture_ids: ids }),
+    });
+    if (!response.ok) throw new Error('Failed to delete lectures');
+    const json: { count: number } = await response.json();
+    return json.count;
+  },
+
   // Folder endpoints
   async getFolders(): Promise<Folder[]> {
     const response = await fetch(`${API_BASE_URL}/folders`);
@@ -33,6 +33,7 @@ export interface TranscriptionSession {
   aiInsights: LectureBuddyCard[];
   durationSec: number;
   startTime?: number;
+  error?: string;
 }
 
 export type GenerateType = 'notes' | 'flashcards' | 'quiz';